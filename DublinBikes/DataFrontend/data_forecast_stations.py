@@ -0,0 +1,83 @@
+import datetime
+from DublinBikes.Utils.params import FORECAST_ALL_SLOT_MINUTES, FORECAST_ALL_CACHE_MINUTES
+from DublinBikes.Utils.ttl_cache import TTLCache
+from DublinBikes.DataFrontend.data_loader_SQL import get_all_stations_data_SQL, get_stations_bike_stands
+from DublinBikes.DataFrontend.data_realtime_weather import get_forecast_weather_data
+
+"""
+Module: data_forecast_stations
+------------------------------
+This module provides the predicted availability of every station at a future time, for the
+future-availability layer of the map.
+
+Script Logic:
+- Round the requested time down to its time slot (FORECAST_ALL_SLOT_MINUTES in params.py).
+- If the slot was computed in the last FORECAST_ALL_CACHE_MINUTES, return the cached result.
+- Otherwise, get the forecast weather of the slot (from the weather cache or the OpenWeather API),
+  predict all the stations in a single pass and cache the result for the slot.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Computed forecasts keyed by model version and time slot (room for every slot of the 5-day weather forecast).
+_forecast_cache = TTLCache(5 * 24 * 60 // FORECAST_ALL_SLOT_MINUTES, FORECAST_ALL_CACHE_MINUTES * 60)
+
+
+def get_forecast_slot(at: datetime.datetime) -> datetime.datetime:
+    """
+    Round a time down to the start of its forecast time slot.
+
+    Parameters:
+        at (datetime.datetime): The requested time.
+
+    Returns:
+        datetime.datetime: The start of the slot (naive, local time).
+    """
+    if at.tzinfo is not None:
+        at = at.astimezone().replace(tzinfo=None)
+    minutes = (at.hour * 60 + at.minute) // FORECAST_ALL_SLOT_MINUTES * FORECAST_ALL_SLOT_MINUTES
+    return at.replace(hour=minutes // 60, minute=minutes % 60, second=0, microsecond=0)
+
+
+def get_forecast_all_stations(at: datetime.datetime) -> dict:
+    """
+    Retrieve the predicted availability of all the stations at a future time.
+
+    Parameters:
+        at (datetime.datetime): The requested time.
+
+    Returns:
+        dict: The slot ("at"), the forecast "temperature" and "humidity", and a "stations" list with
+              station_id, available_bikes and available_bike_stands (None for stations without model),
+              or an error message if the weather forecast is not available.
+    """
+    # Imported here so that importing the Flask app does not load the machine learning libraries.
+    from DublinBikes.MachineLearning.predict_availability import get_prediction_model_version, predict_all_stations
+
+    slot = get_forecast_slot(at)
+    key = (get_prediction_model_version(), slot)
+    cached = _forecast_cache.get(key)
+    if cached is not None:
+        logger.info(f"Stations forecast for {slot} found in cache.")
+        return cached
+
+    weather = get_forecast_weather_data("hourly", slot.isoformat())
+    if "error" in weather:
+        return weather
+
+    # The capacities of the latest bikes fetch, as for the batch and curve predictions; the static
+    # station table is only used for the stations missing from it.
+    bike_stands = {station["station_id"]: station["bike_stands"] for station in get_all_stations_data_SQL()}
+    bike_stands.update(get_stations_bike_stands(bike_stands.keys()))
+    result = {
+        "at": slot.isoformat(),
+        "temperature": weather["temp"],
+        "humidity": weather["humidity"],
+        "stations": predict_all_stations(slot, weather["temp"], weather["humidity"], bike_stands),
+    }
+
+    _forecast_cache.set(key, result)
+    return result
@@ -1,11 +1,11 @@
 from sqlalchemy import text
-from DublinBikes.SqlCode.sql_utils import get_sql_engine
+from DublinBikes.SqlCode.sql_utils import get_connection
 
 """
 Module: data_loader_SQL
 ------------------------
 This module provides functions for retrieving bike station data from a SQL database.
-These functions query tables such as 'FetchedBikesData', 'station', and 'availability' to 
+These functions query tables such as 'FetchedBikesData', 'FetchedStationData', 'station', and 'availability' to 
 retrieve station details and daily availability records.
 Note: Although these functions are not currently used, they are kept for future reference.
 """
@@ -15,7 +15,8 @@ def get_station_data(station_id: int) -> dict:
     """
     Retrieve the latest available data for a specific station.
 
-    This function queries the 'FetchedBikesData' table to obtain a single record for the specified station.
+    This function queries the 'FetchedBikesData' table, joined with the static station data of
+    'FetchedStationData', to obtain a single record for the specified station.
     It sorts the results by 'last_update' in descending order and returns the most recent record as a dictionary.
 
     Parameters:
@@ -26,23 +27,21 @@ def get_station_data(station_id: int) -> dict:
               name, position coordinates, last update time, available bikes, available bike stands, and status.
     """
     query = """
-        SELECT station_id, address, banking, bonus, bike_stands, name,
-               position_lat, position_lng,
-               last_update, available_bikes, available_bike_stands, status
-        FROM FetchedBikesData 
-        WHERE station_id = :station_id
-        Order By last_update DESC
+        SELECT s.station_id, s.address, s.banking, s.bonus, s.bike_stands, s.name,
+               s.position_lat, s.position_lng,
+               b.last_update, b.available_bikes, b.available_bike_stands, b.status
+        FROM FetchedBikesData b
+        JOIN FetchedStationData s ON s.station_id = b.station_id
+        WHERE b.station_id = :station_id
+        Order By b.last_update DESC
         LIMIT 1;
     """
-    conn = get_sql_engine()
-    try:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(query, {"station_id": station_id})
         rows = cursor.fetchall()
         stations = [dict(row) for row in rows]
         return stations
-    finally:
-        conn.close()
 
 
 def get_all_stations_data_SQL() -> list:
@@ -56,8 +55,7 @@ def get_all_stations_data_SQL() -> list:
         list: A list of dictionaries, each representing a bike station with details such as station_id,
               address, banking, bonus, bike stands, name, and position coordinates.
     """
-    conn = get_sql_engine()
-    try:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM station")
         rows = cursor.fetchall()
@@ -74,8 +72,6 @@ def get_all_stations_data_SQL() -> list:
             }
             stations.append(station)
         return stations
-    finally:
-        conn.close()
 
 
 def get_one_station_data(station_id: int) -> dict:
@@ -91,8 +87,7 @@ def get_one_station_data(station_id: int) -> dict:
     Returns:
         dict: A dictionary containing the station's data, or an empty dictionary if not found.
     """
-    conn = get_sql_engine()
-    try:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "SELECT * FROM station WHERE station_id = :station_id",
@@ -100,8 +95,6 @@ def get_one_station_data(station_id: int) -> dict:
         )
         row = cursor.fetchone()
         return dict(row) if row is not None else {}
-    finally:
-        conn.close()
 
 
 def get_station_availability_daily(station_id: int) -> list:
@@ -122,14 +115,39 @@ def get_station_availability_daily(station_id: int) -> list:
         SELECT last_update, available_bikes, available_bike_stands
         FROM availability
         WHERE station_id = :station_id
-            AND DATE(last_update) = '2025-03-03'
+            AND last_update >= '2025-03-03' AND last_update < '2025-03-04'
         ORDER BY last_update ASC;
     """
-    conn = get_sql_engine()
-    try:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(query, {"station_id": station_id})
         rows = cursor.fetchall()
         return [dict(row) for row in rows]
-    finally:
-        conn.close()
+
+
+def get_stations_bike_stands(station_ids: list) -> dict:
+    """
+    Retrieve the total number of bike stands of several stations in a single query.
+
+    This function queries the 'FetchedStationData' table, which holds the static data of the
+    stations returned by the latest fetches of the bikes API.
+
+    Parameters:
+        station_ids (list): The unique identifiers of the stations.
+
+    Returns:
+        dict: The number of bike stands keyed by station_id. Stations without data are left out.
+    """
+    station_ids = list(station_ids)
+    if not station_ids:
+        return {}
+    placeholders = ", ".join("?" for _ in station_ids)
+    query = f"""
+        SELECT station_id, bike_stands
+        FROM FetchedStationData
+        WHERE station_id IN ({placeholders});
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, station_ids)
+        return {row["station_id"]: row["bike_stands"] for row in cursor.fetchall()}
@@ -1,6 +1,21 @@
 import datetime
+import gzip
+import hashlib
 import json
-from DublinBikes.SqlCode.sql_utils import get_sql_engine
+import threading
+from collections import deque
+from typing import NamedTuple, Optional
+from werkzeug.http import http_date
+from DublinBikes.Utils.params import (
+    BIKES_CACHE_MINUTES,
+    BIKES_REFRESH_MINUTES,
+    BIKES_SNAPSHOT_HISTORY,
+    BIKES_STREAM_MAX_CLIENTS,
+    BIKES_STREAM_QUEUE_SIZE,
+)
+from DublinBikes.Utils.pubsub import PubSub
+from DublinBikes.Utils.single_flight import get_single_flight
+from DublinBikes.SqlCode.sql_utils import get_connection
 from DublinBikes.DataMining.scrapper_jc_decaux import get_data_from_jcdecaux
 from DublinBikes.DataFrontend.manage_cache import clean_cache
 
@@ -10,6 +25,24 @@ Module: data_realtime_bikes
 This module provides functions for handling real-time bike data.
 It includes functionality for saving bike data to the cache database and retrieving current bike data,
 either from the cache or directly from the bikes API.
+
+The latest station list is also kept in memory by each process (snapshot with its fetch time), so
+that /api/current_bikes does not query and parse the cache table on every request. The cache
+database remains the persistent copy shared with the other processes.
+
+The snapshot is serialized to JSON (and gzip) once, when it is replaced, together with an ETag
+computed from the JSON body (see BikesPayload): /api/current_bikes serves these bytes as they are,
+and answers 304 Not Modified to the clients that already have them.
+
+The ETag also identifies the snapshot (snapshot id). The availability of the last
+BIKES_SNAPSHOT_HISTORY snapshots is kept in a ring buffer, so that a client sending the id of the
+snapshot it displays only receives the stations that changed since then (see get_bikes_delta).
+The same delta is published to the subscribers of the bikes events (see get_bikes_events) each
+time a new snapshot is stored, for the /api/stream/bikes event stream.
+
+The snapshot is also stored as a struct of arrays (one list of values per field, see
+build_bikes_columns), from which the columnar format and the field projections of
+/api/current_bikes are serialized, once per snapshot and variant (see get_bikes_payload).
 """
 
 import logging
@@ -17,13 +50,60 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+class BikesPayload(NamedTuple):
+    """
+    The station list of a fetch serialized for /api/current_bikes.
+    """
+    body: bytes  # JSON body, as returned by jsonify.
+    gzip_body: bytes  # Gzip compressed JSON body.
+    etag: str  # Hash of the JSON body.
+
+
+# Fields of the station records that can be requested. In the columnar form, "position" is stored
+# as the two columns position_lat and position_lng.
+BIKES_FIELDS = (
+    "time_requested", "station_id", "available_bikes", "available_bike_stands", "status", "last_update",
+    "address", "banking", "bonus", "bike_stands", "name", "position",
+)
+
+# Response formats of /api/current_bikes: a list of station records, or one list per field.
+BIKES_FORMATS = ("rows", "columnar")
+
+# Maximum number of serialized variants (format and fields) kept per snapshot.
+_MAX_PAYLOAD_VARIANTS = 16
+
+
+class BikesSnapshot(NamedTuple):
+    """
+    The latest station list of this process, in its different forms.
+    """
+    fetched_at: datetime.datetime  # time_requested of the fetch.
+    stations: list  # Station records (list of dictionaries).
+    columns: dict  # Struct of arrays: field -> list of values (see build_bikes_columns).
+    payload: BikesPayload  # Full list of station records, serialized.
+    variants: dict  # (format, fields) -> BikesPayload, serialized on first request.
+
+
+# Latest station list of this process (BikesSnapshot).
+_bikes_snapshot = None
+_bikes_snapshot_lock = threading.Lock()
+
+# Ring buffer of the recent snapshots: (snapshot id, {station_id: (bikes, stands, status)}).
+_bikes_history = deque(maxlen=BIKES_SNAPSHOT_HISTORY)
+
+# Subscribers of the new snapshots of this process: each event is a (snapshot id, JSON delta) tuple.
+_bikes_events = PubSub(BIKES_STREAM_MAX_CLIENTS, BIKES_STREAM_QUEUE_SIZE)
+
+
 def save_bikes_data_to_cache_db(bikes_data: list, return_rows: bool = True) -> list:
     """
     Save bike station data to the cache database.
 
-    This function inserts bike station data obtained from the bikes API into the 'FetchedBikesData' table.
-    All records are inserted with a single timestamp (time_requested). Optionally, the inserted records can
-    be returned as a list of dictionaries.
+    The static data of the stations (address, banking, bonus, bike stands, name and position) is
+    kept once per station in the 'FetchedStationData' table, and only rewritten when it changes. The
+    dynamic data of the fetch is inserted into the 'FetchedBikesData' table with a single timestamp
+    (time_requested). Both tables are written with one executemany each, in a single transaction.
+    Optionally, the inserted records can be returned as a list of dictionaries.
 
     Parameters:
         bikes_data (list): A list of dictionaries representing bike station data from the API.
@@ -34,146 +114,492 @@ def save_bikes_data_to_cache_db(bikes_data: list, return_rows: bool = True) -> l
     """
     # Clean outdated cache records before saving new data.
     clean_cache()
-    
-    conn = get_sql_engine()
-    inserted_records = []
+
+    time_requested = datetime.datetime.now()
+    station_rows, bikes_rows, inserted_records = [], [], []
+    for station in bikes_data:
+        last_update_ms = station.get("last_update")
+        last_update = (
+            datetime.datetime.fromtimestamp(last_update_ms / 1000)
+            if last_update_ms
+            else None
+        )
+        position = station.get("position", {})
+        station_row = (
+            station.get("number"),
+            station.get("address"),
+            station.get("banking"),
+            station.get("bonus"),
+            station.get("bike_stands"),
+            station.get("name"),
+            position.get("lat"),
+            position.get("lng"),
+        )
+        bikes_row = (
+            time_requested,
+            station.get("number"),
+            station.get("available_bikes"),
+            station.get("available_bike_stands"),
+            station.get("status"),
+            last_update,
+        )
+        station_rows.append(station_row)
+        bikes_rows.append(bikes_row)
+        if return_rows:
+            inserted_records.append(_build_bikes_record(bikes_row + station_row[1:]))
+
+    upsert_stations_query = """
+    INSERT INTO FetchedStationData (
+        station_id, address, banking, bonus, bike_stands, name, position_lat, position_lng
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (station_id) DO UPDATE SET
+        address = excluded.address, banking = excluded.banking, bonus = excluded.bonus,
+        bike_stands = excluded.bike_stands, name = excluded.name,
+        position_lat = excluded.position_lat, position_lng = excluded.position_lng
+    WHERE (address, banking, bonus, bike_stands, name, position_lat, position_lng)
+        IS NOT (excluded.address, excluded.banking, excluded.bonus, excluded.bike_stands,
+                excluded.name, excluded.position_lat, excluded.position_lng);
+    """
+    insert_bikes_query = """
+    INSERT INTO FetchedBikesData (
+        time_requested, station_id, available_bikes, available_bike_stands, status, last_update
+    ) VALUES (?, ?, ?, ?, ?, ?);
+    """
+    with get_connection() as conn:
+        conn.executemany(upsert_stations_query, station_rows)
+        conn.executemany(insert_bikes_query, bikes_rows)
+    logger.info("Bike data saved to cache database successfully.")
+    return inserted_records
+
+
+def _build_bikes_record(row) -> dict:
+    """
+    Build a station record from the columns of the cache tables.
+
+    Parameters:
+        row: time_requested, station_id, available_bikes, available_bike_stands, status, last_update,
+             address, banking, bonus, bike_stands, name, position_lat and position_lng.
+
+    Returns:
+        dict: The station record, with the position coordinates grouped in a dictionary.
+    """
+    return {
+        "time_requested": row[0],
+        "station_id": row[1],
+        "available_bikes": row[2],
+        "available_bike_stands": row[3],
+        "status": row[4],
+        "last_update": row[5],
+        "address": row[6],
+        "banking": row[7],
+        "bonus": row[8],
+        "bike_stands": row[9],
+        "name": row[10],
+        "position": {"lat": row[11], "lng": row[12]},
+    }
+
+
+def _to_datetime(value):
+    """Helper to convert a value to datetime if it's a string."""
+    if isinstance(value, datetime.datetime):
+        return value
     try:
-        time_requested = datetime.datetime.now()
+        return datetime.datetime.fromisoformat(value)
+    except Exception:
+        return value  # If conversion fails, return as-is
+
+
+def _json_default(value):
+    """Serialize the datetimes of the station records as jsonify does (HTTP date format)."""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return http_date(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def build_bikes_payload(data) -> BikesPayload:
+    """
+    Serialize data to the JSON body (identical to jsonify) and gzip body of /api/current_bikes.
+
+    Parameters:
+        data: The station records of one fetch, or one of their variants (see get_bikes_payload).
+
+    Returns:
+        BikesPayload: The JSON body, the gzip body and the ETag of the data.
+    """
+    body = (json.dumps(data, default=_json_default, sort_keys=True, separators=(",", ":")) + "\n").encode("utf-8")
+    return BikesPayload(
+        body=body,
+        gzip_body=gzip.compress(body, mtime=0),
+        etag=hashlib.sha256(body).hexdigest()[:32],
+    )
+
+
+def build_bikes_columns(stations: list) -> dict:
+    """
+    Convert station records to a struct of arrays.
+
+    Parameters:
+        stations (list): The station records of one fetch.
+
+    Returns:
+        dict: One list of values per field of BIKES_FIELDS, in the order of the stations ("position"
+              is split into the position_lat and position_lng lists).
+    """
+    columns = {field: [station.get(field) for station in stations] for field in BIKES_FIELDS if field != "position"}
+    positions = [station.get("position") or {} for station in stations]
+    columns["position_lat"] = [position.get("lat") for position in positions]
+    columns["position_lng"] = [position.get("lng") for position in positions]
+    return columns
+
+
+def parse_bikes_fields(fields: Optional[str]) -> Optional[tuple]:
+    """
+    Parse the fields requested from /api/current_bikes.
+
+    Parameters:
+        fields (Optional[str]): Comma separated field names (e.g., "station_id,available_bikes").
+
+    Returns:
+        Optional[tuple]: The requested fields in the order of BIKES_FIELDS, or None for all the fields.
+
+    Raises:
+        ValueError: If a field is unknown.
+    """
+    if not fields:
+        return None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(BIKES_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(field for field in BIKES_FIELDS if field in requested)
+
+
+def _project_columns(columns: dict, fmt: str, fields: tuple):
+    """Build the station list (rows format) or the parallel arrays (columnar format) of some fields."""
+    if fmt == "columnar":
+        projected = {}
+        for field in fields:
+            if field == "position":
+                projected["position_lat"] = columns["position_lat"]
+                projected["position_lng"] = columns["position_lng"]
+            else:
+                projected[field] = columns[field]
+        return projected
+    values = [
+        [{"lat": lat, "lng": lng} for lat, lng in zip(columns["position_lat"], columns["position_lng"])]
+        if field == "position" else columns[field]
+        for field in fields
+    ]
+    return [dict(zip(fields, row)) for row in zip(*values)]
+
+
+def get_bikes_payload(stations: list, fmt: str = "rows", fields: Optional[tuple] = None) -> BikesPayload:
+    """
+    Return the serialized payload of a station list returned by get_current_bikes_data().
+
+    Parameters:
+        stations (list): The station records.
+        fmt (str): "rows" for a list of station records, or "columnar" for an object holding one
+                   list of values per field.
+        fields (Optional[tuple]): The fields to return (see parse_bikes_fields), or None for all the
+                                  fields.
+
+    Returns:
+        BikesPayload: The payload serialized once per snapshot and variant, or a new payload if the
+                      station list is not the snapshot of this process.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if fmt not in BIKES_FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    with _bikes_snapshot_lock:
+        snapshot = _bikes_snapshot
+    if snapshot is None or snapshot.stations is not stations:
+        if fmt == "rows" and fields is None:
+            return build_bikes_payload(stations)
+        return build_bikes_payload(_project_columns(build_bikes_columns(stations), fmt, fields or BIKES_FIELDS))
+
+    if fmt == "rows" and fields is None:
+        return snapshot.payload
+    key = (fmt, fields)
+    payload = snapshot.variants.get(key)
+    if payload is None:
+        payload = build_bikes_payload(_project_columns(snapshot.columns, fmt, fields or BIKES_FIELDS))
+        # Concurrent requests may serialize the same variant twice: both results are identical.
+        if len(snapshot.variants) < _MAX_PAYLOAD_VARIANTS:
+            snapshot.variants[key] = payload
+    return payload
+
+
+def _availability_state(stations: list) -> dict:
+    """Map each station to the fields compared by the deltas: bikes, stands and status."""
+    return {
+        station["station_id"]: (station.get("available_bikes"), station.get("available_bike_stands"), station.get("status"))
+        for station in stations
+    }
+
+
+def get_bikes_delta(stations: list, since: str, fields: Optional[tuple] = None) -> Optional[dict]:
+    """
+    Compute the changes of a station list since a previous snapshot.
+
+    Parameters:
+        stations (list): The current station records (returned by get_current_bikes_data()).
+        since (str): The id of the snapshot known by the client (ETag of its payload).
+        fields (Optional[tuple]): The fields to keep in the changed records (see parse_bikes_fields);
+                                  station_id is always kept. None keeps all the dynamic fields.
+
+    Returns:
+        Optional[dict]: The delta, or None if the snapshot is not in the history of this process
+                        (the client must then download the full station list). The delta holds:
+                        - snapshot_id: the id of the current snapshot.
+                        - since: the id of the previous snapshot.
+                        - changed: the dynamic fields (station_id, available_bikes,
+                          available_bike_stands, status, last_update) of the stations whose bikes,
+                          stands or status changed, or which are new.
+                        - removed: the ids of the stations missing from the current list.
+    """
+    with _bikes_snapshot_lock:
+        previous = next((state for snapshot_id, state in _bikes_history if snapshot_id == since), None)
+    if previous is None:
+        return None
+    delta = _build_delta(previous, stations, get_bikes_payload(stations).etag, since)
+    if fields is not None:
+        kept = {"station_id"} | set(fields)
+        delta["changed"] = [
+            {field: value for field, value in station.items() if field in kept} for station in delta["changed"]
+        ]
+    return delta
+
+
+def _build_delta(previous: dict, stations: list, snapshot_id: str, since: str) -> dict:
+    """Build the delta of a station list from the availability state of a previous snapshot."""
+    current = _availability_state(stations)
+    changed = [
+        {
+            "station_id": station["station_id"],
+            "available_bikes": station.get("available_bikes"),
+            "available_bike_stands": station.get("available_bike_stands"),
+            "status": station.get("status"),
+            "last_update": station.get("last_update"),
+        }
+        for station in stations
+        if previous.get(station["station_id"]) != current[station["station_id"]]
+    ]
+    return {
+        "snapshot_id": snapshot_id,
+        "since": since,
+        "changed": changed,
+        "removed": sorted(station_id for station_id in previous if station_id not in current),
+    }
+
+
+def get_bikes_events() -> PubSub:
+    """
+    Return the channel publishing the delta of each new bikes snapshot of this process.
+
+    Returns:
+        PubSub: The channel. Its events are (snapshot id, JSON delta) tuples, the JSON delta being
+                the serialized result of get_bikes_delta() since the previous snapshot.
+    """
+    return _bikes_events
+
+
+def get_bikes_snapshot_id() -> Optional[str]:
+    """
+    Return the id of the snapshot of this process (ETag of its payload), even if it expired.
+
+    Returns:
+        Optional[str]: The snapshot id, or None if there is no snapshot.
+    """
+    with _bikes_snapshot_lock:
+        snapshot = _bikes_snapshot
+    return snapshot.payload.etag if snapshot is not None else None
+
+
+def get_bikes_snapshot(max_age_minutes: float = BIKES_CACHE_MINUTES) -> Optional[list]:
+    """
+    Return the station list kept in memory by this process if it is still fresh.
+
+    Parameters:
+        max_age_minutes (float): The maximum age of the snapshot. Defaults to BIKES_CACHE_MINUTES.
+
+    Returns:
+        Optional[list]: The station records of the latest fetch, or None if there is no snapshot or
+                        if it was fetched more than max_age_minutes ago.
+    """
+    with _bikes_snapshot_lock:
+        snapshot = _bikes_snapshot
+    if snapshot is None:
+        return None
+    if datetime.datetime.now() - snapshot.fetched_at >= datetime.timedelta(minutes=max_age_minutes):
+        return None
+    return snapshot.stations
+
+
+def set_bikes_snapshot(stations: list) -> None:
+    """
+    Replace the in-memory station list of this process, convert it to a struct of arrays and
+    serialize it for /api/current_bikes.
+
+    Parameters:
+        stations (list): The station records of one fetch (all with the same time_requested).
+
+    Returns:
+        None
+    """
+    global _bikes_snapshot
+    if not stations:
+        return
+    fetched_at = stations[0]["time_requested"]
+    if not isinstance(fetched_at, datetime.datetime):
+        return
+    with _bikes_snapshot_lock:
+        if _bikes_snapshot is not None and _bikes_snapshot.fetched_at > fetched_at:
+            return
+    # Serialized outside of the lock: the readers keep using the previous snapshot meanwhile.
+    payload = build_bikes_payload(stations)
+    snapshot = BikesSnapshot(fetched_at, stations, build_bikes_columns(stations), payload, {})
+    previous = None
+    with _bikes_snapshot_lock:
+        # Keep the most recent fetch if another thread stored a newer one in the meantime.
+        if _bikes_snapshot is not None and _bikes_snapshot.fetched_at > fetched_at:
+            return
+        _bikes_snapshot = snapshot
+        if _bikes_history and _bikes_history[-1][0] == payload.etag:
+            return
+        if _bikes_history:
+            previous = _bikes_history[-1]
+        _bikes_history.append((payload.etag, _availability_state(stations)))
+
+    # New snapshot: push its changes to the event stream clients.
+    if previous is not None:
+        delta = _build_delta(previous[1], stations, payload.etag, previous[0])
+        _bikes_events.publish((payload.etag, json.dumps(delta, default=_json_default, separators=(",", ":"))))
+
+
+def clear_bikes_snapshot() -> None:
+    """
+    Drop the in-memory station list of this process and its snapshot history (the next call reads
+    the cache database).
+
+    Returns:
+        None
+    """
+    global _bikes_snapshot
+    with _bikes_snapshot_lock:
+        _bikes_snapshot = None
+        _bikes_history.clear()
+
+
+def read_cached_bikes_data(max_age_minutes: float = BIKES_CACHE_MINUTES) -> list:
+    """
+    Read the latest fetch stored in the cache database, if it is less than max_age_minutes old.
+
+    Parameters:
+        max_age_minutes (float): The maximum age of the fetch. Defaults to BIKES_CACHE_MINUTES.
+
+    Returns:
+        list: The station records of the latest fetch (empty if the cache is empty or outdated).
+    """
+    with get_connection() as conn:
+        oldest = datetime.datetime.now() - datetime.timedelta(minutes=max_age_minutes)
         cursor = conn.cursor()
-        for station in bikes_data:
-            station_id = station.get("number")
-            available_bikes = station.get("available_bikes")
-            available_bike_stands = station.get("available_bike_stands")
-            status = station.get("status")
-            last_update_ms = station.get("last_update")
-            last_update = (
-                datetime.datetime.fromtimestamp(last_update_ms / 1000)
-                if last_update_ms
-                else None
-            )
-            address = station.get("address")
-            banking = station.get("banking")
-            bonus = station.get("bonus")
-            bike_stands = station.get("bike_stands")
-            name = station.get("name")
-            position = station.get("position", {})
-            position_lat = position.get("lat")
-            position_lng = position.get("lng")
-            insert_query = """
-            INSERT INTO FetchedBikesData (
-                time_requested, station_id, available_bikes, available_bike_stands, status, last_update,
-                address, banking, bonus, bike_stands, name, position_lat, position_lng
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
-            """
-            cursor.execute(
-                insert_query,
-                (
-                    time_requested,
-                    station_id,
-                    available_bikes,
-                    available_bike_stands,
-                    status,
-                    last_update,
-                    address,
-                    banking,
-                    bonus,
-                    bike_stands,
-                    name,
-                    position_lat,
-                    position_lng,
-                ),
-            )
-            if return_rows:
-                inserted_records.append(
-                    {
-                        "time_requested": time_requested,
-                        "station_id": station_id,
-                        "available_bikes": available_bikes,
-                        "available_bike_stands": available_bike_stands,
-                        "status": status,
-                        "last_update": last_update,
-                        "address": address,
-                        "banking": banking,
-                        "bonus": bonus,
-                        "bike_stands": bike_stands,
-                        "name": name,
-                        "position": {"lat": position_lat, "lng": position_lng},
-                    }
-                )
-        conn.commit()
-        logger.info("Bike data saved to cache database successfully.")
-        return inserted_records
-    finally:
-        conn.close()
+        query = """
+        SELECT b.time_requested, b.station_id, b.available_bikes, b.available_bike_stands, b.status,
+               b.last_update, s.address, s.banking, s.bonus, s.bike_stands, s.name,
+               s.position_lat, s.position_lng
+        FROM FetchedBikesData b
+        LEFT JOIN FetchedStationData s ON s.station_id = b.station_id
+        WHERE b.time_requested = (SELECT MAX(time_requested) FROM FetchedBikesData)
+          AND b.time_requested >= ?;
+        """
+        cursor.execute(query, (oldest,))
+        rows = cursor.fetchall()
+
+    bikes_data = []
+    for row in rows:
+        record = _build_bikes_record(row)
+        # Convert the time_requested and last_update values explicitly to datetime
+        record["time_requested"] = _to_datetime(record["time_requested"])
+        record["last_update"] = _to_datetime(record["last_update"])
+        bikes_data.append(record)
+    return bikes_data
 
 
 def get_current_bikes_data():
     """
     Retrieve current bike station data.
 
-    This function checks if bike data is available in the cache (i.e., data requested within the last 5 minutes).
-    If cached data is available, it returns the data as a list of dictionaries. Otherwise, it fetches new data from
-    the bikes API, saves it to the cache, and returns the newly inserted records.
+    The latest station list is kept in memory (see get_bikes_snapshot), so that most calls are a
+    memory read. When the snapshot is older than BIKES_CACHE_MINUTES, the latest fetch stored in the
+    cache database is used (it may have been fetched by another process). If it is outdated too, new
+    data is fetched from the bikes API and saved to the cache, by a single request at a time (see
+    Utils/single_flight.py). The returned list is shared by all
+    the callers and must not be modified.
 
     Returns:
         list or dict: A list of dictionaries containing bike station data if successful,
                       or a dictionary with an error message if the API data cannot be fetched.
     """
-    conn = get_sql_engine()
-    try:
-        five_minutes_ago = datetime.datetime.now() - datetime.timedelta(minutes=5)
-        cursor = conn.cursor()
-        query = """
-        SELECT * FROM FetchedBikesData
-        WHERE time_requested >= ?
-        ORDER BY time_requested DESC;
-        """
-        cursor.execute(query, (five_minutes_ago,))
-        rows = cursor.fetchall()
-    finally:
-        conn.close()
-
-    def _to_datetime(value):
-        """Helper to convert a value to datetime if it's a string."""
-        if isinstance(value, datetime.datetime):
-            return value
-        try:
-            return datetime.datetime.fromisoformat(value)
-        except Exception:
-            return value  # If conversion fails, return as-is
-
-    if rows:
+    bikes_data = get_bikes_snapshot()
+    if bikes_data is not None:
+        return bikes_data
+
+    # A refresh is running (usually in the background refresher): serve the previous data meanwhile.
+    if get_single_flight().in_flight("bikes"):
+        bikes_data = get_bikes_snapshot(2 * BIKES_CACHE_MINUTES)
+        if bikes_data is not None:
+            return bikes_data
+
+    bikes_data = read_cached_bikes_data()
+    if bikes_data:
         logger.info("\n\nUsing cached data\n\n")
-        bikes_data = []
-        for row in rows:
-            # Convert the time_requested and last_update values explicitly to datetime
-            time_requested_val = _to_datetime(row[0])
-            last_update_val = _to_datetime(row[5])
-            bikes_data.append(
-                {
-                    "time_requested": time_requested_val,
-                    "station_id": row[1],
-                    "available_bikes": row[2],
-                    "available_bike_stands": row[3],
-                    "status": row[4],
-                    "last_update": last_update_val,
-                    "address": row[6],
-                    "banking": row[7],
-                    "bonus": row[8],
-                    "bike_stands": row[9],
-                    "name": row[10],
-                    "position": {"lat": row[11], "lng": row[12]},
-                }
-            )
+        set_bikes_snapshot(bikes_data)
         return bikes_data
-    else:
-        logger.info("\n\nFetching new data from API\n\n")
-        bikes_text = get_data_from_jcdecaux()
-        if bikes_text:
-            bikes_data = json.loads(bikes_text)
-            inserted_records = save_bikes_data_to_cache_db(bikes_data, return_rows=True)
-            return inserted_records
-        else:
-            logger.error("Unable to fetch bikes data from API.")
-            return {"error": "Unable to fetch bikes data"}
 
+    # Only one request (of all the threads and processes) calls the API, the others share its data.
+    bikes_data = get_single_flight().do("bikes", fetch_bikes_data, recheck_fn=read_cached_bikes_data)
+    if isinstance(bikes_data, list):
+        set_bikes_snapshot(bikes_data)
+    return bikes_data
+
+
+def refresh_bikes_data() -> bool:
+    """
+    Fetch new bikes data ahead of the expiry of the snapshot, if it is BIKES_REFRESH_MINUTES old.
+
+    Called by the background refresher. If another process refreshed the cache database in the
+    meantime, its data is used instead of calling the API.
+
+    Returns:
+        bool: True if the snapshot was refreshed.
+    """
+    if get_bikes_snapshot(BIKES_REFRESH_MINUTES) is not None:
+        return False
+    bikes_data = get_single_flight().do(
+        "bikes", fetch_bikes_data, recheck_fn=lambda: read_cached_bikes_data(BIKES_REFRESH_MINUTES)
+    )
+    if not isinstance(bikes_data, list):
+        return False
+    set_bikes_snapshot(bikes_data)
+    return True
+
+
+def fetch_bikes_data():
+    """
+    Fetch the bike station data from the bikes API and save it to the cache database.
+
+    Returns:
+        list or dict: The inserted station records, or a dictionary with an error message if the
+                      API data cannot be fetched.
+    """
+    logger.info("\n\nFetching new data from API\n\n")
+    bikes_text = get_data_from_jcdecaux()
+    if bikes_text:
+        bikes_data = json.loads(bikes_text)
+        return save_bikes_data_to_cache_db(bikes_data, return_rows=True)
+    else:
+        logger.error("Unable to fetch bikes data from API.")
+        return {"error": "Unable to fetch bikes data"}
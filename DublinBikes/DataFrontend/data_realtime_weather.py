@@ -1,6 +1,16 @@
 import datetime
 import json
-from DublinBikes.SqlCode.sql_utils import get_sql_engine
+import threading
+from typing import Dict, NamedTuple, Optional
+import numpy as np
+from DublinBikes.Utils.params import (
+    FORECAST_REFRESH_MINUTES,
+    FORECAST_TIMELINE_MINUTES,
+    WEATHER_CACHE_MINUTES,
+    WEATHER_REFRESH_MINUTES,
+)
+from DublinBikes.Utils.single_flight import get_single_flight
+from DublinBikes.SqlCode.sql_utils import get_connection
 from DublinBikes.DataMining.scrapper_open_weather import get_data_from_openweather
 
 """
@@ -15,6 +25,15 @@ Script Logic:
 - If available, return cached data.
 - Otherwise, fetch new data from the OpenWeather API, save it to the cache, and return the data.
 - The cache is cleaned daily to remove outdated records.
+
+The forecasts are cached per API fetch: each fetch is stored once (table 'ForecastFetches', with
+its generation id fetch_id and its validity window) together with its entries (table
+'ForecastWeatherData'), and every target time is answered from the latest valid fetch. The latest
+forecast of each type is also kept in memory by each process, as a timeline sorted by time (see
+ForecastTimeline): a forecast at any target time is found by binary search and linearly
+interpolated between the two surrounding 3-hour entries, without querying the cache database. The
+forecast is fetched from the API at most once per FORECAST_TIMELINE_MINUTES, usually ahead of its
+expiry by the background refresher (see refresh_forecast).
 """
 
 import logging
@@ -22,14 +41,158 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+# Columns of the 'FetchedWeatherData' table, in the order of the rows built by _build_weather_row.
+WEATHER_COLUMNS = (
+    "timestamp_requested", "timestamp_weatherinfo", "forecast_type", "target_datetime",
+    "feels_like", "humidity", "pressure", "sunrise", "sunset", "temp", "uvi", "weather_id",
+    "wind_gust", "wind_speed", "rain_1h", "snow_1h",
+)
+
+
+def _build_weather_row(
+    data: dict, forecast_type: str, target_datetime, timestamp_requested: datetime.datetime
+) -> tuple:
+    """
+    Extract the columns of the 'FetchedWeatherData' table from a current or forecast API entry.
+
+    The datetimes are formatted as they are stored in the database ('YYYY-MM-DD HH:MM:SS'), so that
+    the row can be returned without reading it back.
+
+    Parameters:
+        data (dict): The weather data parsed from the API response.
+        forecast_type (str): The type of forecast ('current', 'hourly', or 'daily').
+        target_datetime: The target datetime for the weather forecast.
+        timestamp_requested (datetime.datetime): The time of the API request.
+
+    Returns:
+        tuple: The values of WEATHER_COLUMNS.
+    """
+    main = data.get("main", {})
+    sunrise = None # No info for forecast
+    sunset = None # No info for forecast
+    if forecast_type == "current":
+        sys_data = data.get("sys", {})
+        sunrise = (
+            datetime.datetime.fromtimestamp(sys_data.get("sunrise"))
+            if sys_data.get("sunrise")
+            else None
+        )
+        sunset = (
+            datetime.datetime.fromtimestamp(sys_data.get("sunset"))
+            if sys_data.get("sunset")
+            else None
+        )
+    wind = data.get("wind", {})
+    if forecast_type == "current":
+        rain_1h = data.get("rain", {}).get("1h")
+        snow_1h = None
+    else:
+        rain_1h = data.get("rain", {}).get("3h")
+        snow_1h = data.get("snow", {}).get("3h")
+    weather_list = data.get("weather", [])
+    row = (
+        timestamp_requested,
+        datetime.datetime.fromtimestamp(data.get("dt")),
+        forecast_type,
+        target_datetime,
+        main.get("feels_like"),
+        main.get("humidity"),
+        main.get("pressure"),
+        sunrise,
+        sunset,
+        main.get("temp"),
+        None,  # uvi
+        weather_list[0].get("icon") if weather_list else None,
+        wind.get("gust"),
+        wind.get("speed"),
+        rain_1h,
+        snow_1h,
+    )
+    return tuple(value.isoformat(" ") if isinstance(value, datetime.datetime) else value for value in row)
+
+
+# Columns of the 'ForecastWeatherData' table (besides fetch_id), in the order of the rows built by
+# _build_forecast_row.
+FORECAST_COLUMNS = (
+    "timestamp_weatherinfo", "feels_like", "humidity", "pressure", "temp", "weather_id",
+    "wind_gust", "wind_speed", "rain_3h", "snow_3h",
+)
+
+# Numeric columns of the forecast interpolated linearly between two entries.
+FORECAST_INTERPOLATED_COLUMNS = ("temp", "feels_like", "humidity", "pressure", "wind_speed", "wind_gust")
+
+# A target time further than this from the first or last forecast entry has no forecast. The API
+# gives an entry every 3 hours: 1.5 hours (5400 seconds), with a small margin.
+FORECAST_MATCH_SECONDS = 5470
+
+# Error message of a target time outside the forecast (a client error, unlike an unavailable forecast).
+FORECAST_NOT_FOUND_ERROR = "No forecast found for the selected time."
+
+
+class ForecastTimeline(NamedTuple):
+    """
+    The latest forecast of a type (one fetch), sorted by time.
+    """
+    fetch_id: int  # Generation of the forecast (ForecastFetches.fetch_id).
+    forecast_type: str
+    fetched_at: datetime.datetime  # Time of the API request.
+    valid_until: datetime.datetime  # The forecast is fetched again after this time.
+    seconds: np.ndarray  # POSIX timestamps of the entries (timestamp_weatherinfo), in increasing order.
+    values: Dict[str, np.ndarray]  # FORECAST_INTERPOLATED_COLUMNS -> values of the entries (NaN if missing).
+    rows: list  # The entries, as cached rows (dictionaries with the FORECAST_COLUMNS).
+
+
+# Latest forecast timeline of this process, per forecast type.
+_forecast_timelines: Dict[str, ForecastTimeline] = {}
+_forecast_timelines_lock = threading.Lock()
+
+
+_INSERT_WEATHER_QUERY = f"""
+    INSERT INTO FetchedWeatherData ({", ".join(WEATHER_COLUMNS)})
+    VALUES ({", ".join("?" for _ in WEATHER_COLUMNS)});
+"""
+
+_INSERT_FORECAST_QUERY = f"""
+    INSERT INTO ForecastWeatherData (fetch_id, {", ".join(FORECAST_COLUMNS)})
+    VALUES (?, {", ".join("?" for _ in FORECAST_COLUMNS)});
+"""
+
+
+def _build_forecast_row(data: dict) -> tuple:
+    """
+    Extract the columns of the 'ForecastWeatherData' table from a forecast API entry.
+
+    Parameters:
+        data (dict): A forecast entry of the API response.
+
+    Returns:
+        tuple: The values of FORECAST_COLUMNS (timestamp_weatherinfo formatted as stored in the database).
+    """
+    main = data.get("main", {})
+    wind = data.get("wind", {})
+    weather_list = data.get("weather", [])
+    return (
+        datetime.datetime.fromtimestamp(data.get("dt")).isoformat(" "),
+        main.get("feels_like"),
+        main.get("humidity"),
+        main.get("pressure"),
+        main.get("temp"),
+        weather_list[0].get("icon") if weather_list else None,
+        wind.get("gust"),
+        wind.get("speed"),
+        data.get("rain", {}).get("3h"),
+        data.get("snow", {}).get("3h"),
+    )
+
+
 def save_weather_data_to_cache_db(
     data: dict, forecast_type: str, target_datetime: datetime.datetime, return_row: bool
 ) -> None:
     """
     Save weather data to the cache database.
 
-    This function saves both current and forecast weather data into the 'FetchedWeatherData' table.
-    Before inserting new data, it cleans the cache to remove outdated records.
+    This function saves current weather data into the 'FetchedWeatherData' table (the forecasts
+    are saved once per fetch by save_forecast_data_to_cache_db).
     Depending on the forecast type, it extracts relevant fields from the provided data dictionary.
     If 'return_row' is True, the function returns the newly inserted row as a dictionary.
 
@@ -42,136 +205,370 @@ def save_weather_data_to_cache_db(
     Returns:
         dict: The inserted weather data row as a dictionary if return_row is True; otherwise, None.
     """
-    conn = get_sql_engine()
-    try:
-        timestamp_requested = datetime.datetime.now()
-        timestamp_weatherinfo = datetime.datetime.fromtimestamp(data.get("dt"))
-        main = data.get("main", {})
-        feels_like = main.get("feels_like")
-        humidity = main.get("humidity")
-        pressure = main.get("pressure")
-        temp = main.get("temp")
-        sunrise = None # No info for forecast
-        sunset = None # No info for forecast
-        if forecast_type == "current":
-            sys_data = data.get("sys", {})
-            sunrise = (
-                datetime.datetime.fromtimestamp(sys_data.get("sunrise"))
-                if sys_data.get("sunrise")
-                else None
-            )
-            sunset = (
-                datetime.datetime.fromtimestamp(sys_data.get("sunset"))
-                if sys_data.get("sunset")
-                else None
-            )
-        wind = data.get("wind", {})
-        wind_speed = wind.get("speed")
-        wind_gust = wind.get("gust")
-        if forecast_type == "current":
-            rain_1h = data.get("rain", {}).get("1h")
-            snow_1h = None
-        else:
-            rain_1h = data.get("rain", {}).get("3h")
-            snow_1h = data.get("snow", {}).get("3h")
-        uvi = None
-        weather_list = data.get("weather", [])
-        weather_id = weather_list[0].get("icon") if weather_list else None
-        insert_query = """
-            INSERT INTO FetchedWeatherData (
-                timestamp_requested, timestamp_weatherinfo, forecast_type, target_datetime,
-                feels_like, humidity, pressure, sunrise, sunset, temp, uvi, weather_id,
-                wind_gust, wind_speed, rain_1h, snow_1h
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
-        """
-        cursor = conn.cursor()
-        cursor.execute(
-            insert_query,
-            (
-                timestamp_requested,
-                timestamp_weatherinfo,
-                forecast_type,
-                target_datetime,
-                feels_like,
-                humidity,
-                pressure,
-                sunrise,
-                sunset,
-                temp,
-                uvi,
-                weather_id,
-                wind_gust,
-                wind_speed,
-                rain_1h,
-                snow_1h,
-            ),
+    row = _build_weather_row(data, forecast_type, target_datetime, datetime.datetime.now())
+    with get_connection() as conn:
+        conn.execute(_INSERT_WEATHER_QUERY, row)
+    logger.info("Weather data saved to cache database successfully.")
+    if return_row:
+        return dict(zip(WEATHER_COLUMNS, row))
+
+
+def save_forecast_data_to_cache_db(forecast_list: list, forecast_type: str) -> Optional[ForecastTimeline]:
+    """
+    Save a forecast fetched from the API to the cache database, in a single transaction.
+
+    The fetch is inserted once into the 'ForecastFetches' table (its fetch_id is the generation of
+    the forecast, and it is valid for FORECAST_TIMELINE_MINUTES), and all its entries are inserted
+    into the 'ForecastWeatherData' table with one executemany.
+
+    Parameters:
+        forecast_list (list): The forecast entries of the API response ("list" field).
+        forecast_type (str): The type of forecast ('hourly' or 'daily').
+
+    Returns:
+        Optional[ForecastTimeline]: The timeline of the saved forecast, or None if it has no entry.
+    """
+    rows = sorted((_build_forecast_row(forecast) for forecast in forecast_list), key=lambda row: row[0])
+    if not rows:
+        return None
+    fetched_at = datetime.datetime.now()
+    valid_until = fetched_at + datetime.timedelta(minutes=FORECAST_TIMELINE_MINUTES)
+    with get_connection() as conn:
+        cursor = conn.execute(
+            """
+            INSERT INTO ForecastFetches (forecast_type, fetched_at, valid_until, first_weatherinfo, last_weatherinfo)
+            VALUES (?, ?, ?, ?, ?);
+            """,
+            (forecast_type, fetched_at.isoformat(" "), valid_until.isoformat(" "), rows[0][0], rows[-1][0]),
         )
-        conn.commit()
-        logger.info("Weather data saved to cache database successfully.")
-        
-        # If we want to return the row we just inserted
-        if return_row:
-            cursor.execute("SELECT last_insert_rowid();")
-            inserted_rowid = cursor.fetchone()[0]
-            cursor.execute(
-                "SELECT * FROM FetchedWeatherData WHERE rowid = ?", (inserted_rowid,)
-            )
-            row = cursor.fetchone()
-            return dict(row) if row else {}
-    finally:
-        conn.close()
+        fetch_id = cursor.lastrowid
+        conn.executemany(_INSERT_FORECAST_QUERY, [(fetch_id,) + row for row in rows])
+    logger.info(f"Forecast fetch {fetch_id} ({len(rows)} entries) saved to cache database successfully.")
+    fetch = {"fetch_id": fetch_id, "forecast_type": forecast_type, "fetched_at": fetched_at, "valid_until": valid_until}
+    return build_forecast_timeline(fetch, [dict(zip(FORECAST_COLUMNS, row)) for row in rows])
 
 
-def get_current_weather_data():
+def read_cached_current_weather(max_age_minutes: float = WEATHER_CACHE_MINUTES) -> dict:
     """
-    Retrieve current weather data from the cache or from the OpenWeather API.
+    Read the latest current weather record cached in the last max_age_minutes.
 
-    This function attempts to retrieve current weather data from the cache if a record was requested
-    within the last 15 minutes. If a recent record is found, it returns it as a dictionary.
-    Otherwise, it fetches new data from the OpenWeather API, saves it to the cache, and returns the new record.
+    Parameters:
+        max_age_minutes (float): The maximum age of the record. Defaults to WEATHER_CACHE_MINUTES.
 
     Returns:
-        dict: A dictionary containing current weather data, or an error message if data could not be fetched.
+        dict: The cached record, or an empty dictionary if there is no recent record.
     """
-    conn = get_sql_engine()
-    try:
-        fifteen_minutes_ago = datetime.datetime.now() - datetime.timedelta(minutes=15)
+    with get_connection() as conn:
+        oldest = datetime.datetime.now() - datetime.timedelta(minutes=max_age_minutes)
         query = """
             SELECT * FROM FetchedWeatherData
             WHERE forecast_type = 'current' AND timestamp_requested >= ?
             ORDER BY timestamp_requested DESC LIMIT 1;
         """
         cursor = conn.cursor()
-        cursor.execute(query, (fifteen_minutes_ago,))
+        cursor.execute(query, (oldest,))
         row = cursor.fetchone()
-    finally:
-        cursor.close()
+    return dict(row) if row else {}
+
+
+def fetch_current_weather_data() -> dict:
+    """
+    Fetch the current weather from the OpenWeather API and save it to the cache database.
+
+    Returns:
+        dict: The inserted weather record, or an error message if data could not be fetched.
+    """
+    data_text = get_data_from_openweather()
+    if data_text:
+        current = json.loads(data_text)
+        dt_current = datetime.datetime.fromtimestamp(current.get("dt"))
+        return save_weather_data_to_cache_db(
+            current, "current", dt_current, return_row=True
+        )
+    else:
+        logger.error("Unable to fetch current weather data from API.")
+        return {"error": "Unable to fetch weather data"}
+
+
+def refresh_current_weather() -> bool:
+    """
+    Fetch the current weather ahead of the expiry of the cache, if it is WEATHER_REFRESH_MINUTES old.
+
+    Called by the background refresher. If another process refreshed the cache database in the
+    meantime, its record is used instead of calling the API.
+
+    Returns:
+        bool: True if the current weather was refreshed.
+    """
+    if read_cached_current_weather(WEATHER_REFRESH_MINUTES):
+        return False
+    row = get_single_flight().do(
+        "current_weather",
+        fetch_current_weather_data,
+        recheck_fn=lambda: read_cached_current_weather(WEATHER_REFRESH_MINUTES),
+    )
+    return "error" not in row
+
+
+def get_current_weather_data():
+    """
+    Retrieve current weather data from the cache or from the OpenWeather API.
+
+    This function attempts to retrieve current weather data from the cache if a record was requested
+    within the last 15 minutes (WEATHER_CACHE_MINUTES). If a recent record is found, it returns it as a dictionary.
+    Otherwise, it fetches new data from the OpenWeather API, saves it to the cache, and returns the new record.
+    Only one request (of all the threads and processes) calls the API at a time, the others share
+    its record (see Utils/single_flight.py).
+
+    Returns:
+        dict: A dictionary containing current weather data, or an error message if data could not be fetched.
+    """
+    row = read_cached_current_weather()
     if row:
         logger.info("Weather data found in cache.")
-        return dict(row)
-    else:
-        # No recent record: fetch new data from OpenWeather.
-        data_text = get_data_from_openweather()
-        if data_text:
-            current = json.loads(data_text)
-            dt_current = datetime.datetime.fromtimestamp(current.get("dt"))
-            return save_weather_data_to_cache_db(
-                current, "current", dt_current, return_row=True
-            )
-        else:
-            logger.error("Unable to fetch current weather data from API.")
-            return {"error": "Unable to fetch weather data"}
+        return row
+
+    # A refresh is running (usually in the background refresher): serve the previous record meanwhile.
+    if get_single_flight().in_flight("current_weather"):
+        row = read_cached_current_weather(2 * WEATHER_CACHE_MINUTES)
+        if row:
+            return row
+    # No recent record: fetch new data from OpenWeather.
+    return get_single_flight().do(
+        "current_weather", fetch_current_weather_data, recheck_fn=read_cached_current_weather
+    )
+
+
+def _to_datetime(value) -> datetime.datetime:
+    """
+    Convert a datetime string, as stored in the database, to a datetime.
+    """
+    if isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.fromisoformat(str(value))
+
+
+def _to_seconds(value) -> float:
+    """
+    Convert a datetime (or a datetime string, as stored in the database) to a POSIX timestamp.
+    """
+    return _to_datetime(value).timestamp()
+
+
+def build_forecast_timeline(fetch: dict, rows: list) -> Optional[ForecastTimeline]:
+    """
+    Build the timeline of a forecast fetch from its cached rows.
+
+    Parameters:
+        fetch (dict): The fetch (fetch_id, forecast_type, fetched_at and valid_until, as datetimes
+                      or as stored in the 'ForecastFetches' table).
+        rows (list): The entries of the fetch (dictionaries with the FORECAST_COLUMNS).
+
+    Returns:
+        Optional[ForecastTimeline]: The timeline, or None if there is no row.
+    """
+    if not rows:
+        return None
+    rows = sorted(rows, key=lambda row: _to_seconds(row["timestamp_weatherinfo"]))
+    seconds = np.array([_to_seconds(row["timestamp_weatherinfo"]) for row in rows])
+    values = {
+        column: np.array([np.nan if row[column] is None else row[column] for row in rows], dtype=float)
+        for column in FORECAST_INTERPOLATED_COLUMNS
+    }
+    return ForecastTimeline(
+        fetch["fetch_id"], fetch["forecast_type"], _to_datetime(fetch["fetched_at"]),
+        _to_datetime(fetch["valid_until"]), seconds, values, rows,
+    )
+
+
+def forecast_at(timeline: ForecastTimeline, target_dt: datetime.datetime) -> Optional[dict]:
+    """
+    Return the forecast weather at a target time, interpolated between the two surrounding entries.
+
+    The entries are found by binary search in the timeline. The FORECAST_INTERPOLATED_COLUMNS are
+    interpolated linearly; the other columns (e.g., the weather icon and the rain) are those of the
+    nearest entry. Before the first entry and after the last one, the values of that entry are used.
+
+    Parameters:
+        timeline (ForecastTimeline): The forecast timeline.
+        target_dt (datetime.datetime): The target time.
+
+    Returns:
+        Optional[dict]: The forecast row at the target time (timestamp_weatherinfo is the target
+                        time), or None if the target is more than FORECAST_MATCH_SECONDS away from
+                        the first or the last entry.
+    """
+    target = target_dt.timestamp()
+    seconds = timeline.seconds
+    if target < seconds[0] - FORECAST_MATCH_SECONDS or target > seconds[-1] + FORECAST_MATCH_SECONDS:
+        return None
+    after = int(np.searchsorted(seconds, target))
+    before = max(after - 1, 0)
+    after = min(after, len(seconds) - 1)
+    nearest = after if abs(seconds[after] - target) < abs(target - seconds[before]) else before
+
+    result = dict(timeline.rows[nearest])
+    if seconds[after] > seconds[before]:
+        weight = (target - seconds[before]) / (seconds[after] - seconds[before])
+        for column, column_values in timeline.values.items():
+            value = column_values[before] + weight * (column_values[after] - column_values[before])
+            result[column] = None if np.isnan(value) else round(float(value), 2)
+    result["timestamp_weatherinfo"] = target_dt.replace(microsecond=0).isoformat(" ")
+    return result
+
+
+def read_cached_forecast(forecast_type: str, max_age_minutes: Optional[float] = None) -> Optional[ForecastTimeline]:
+    """
+    Read the latest valid forecast fetch of a type from the cache database, as a timeline.
+
+    Parameters:
+        forecast_type (str): The type of forecast ('hourly' or 'daily').
+        max_age_minutes (Optional[float]): If given, only a fetch made in the last max_age_minutes
+                                           is returned.
+
+    Returns:
+        Optional[ForecastTimeline]: The timeline, or None if no cached fetch is still valid.
+    """
+    now = datetime.datetime.now()
+    oldest = now - datetime.timedelta(minutes=max_age_minutes) if max_age_minutes is not None else datetime.datetime.min
+    query_fetch = """
+        SELECT fetch_id, forecast_type, fetched_at, valid_until FROM ForecastFetches
+        WHERE forecast_type = ? AND valid_until > ? AND fetched_at >= ?
+        ORDER BY fetch_id DESC LIMIT 1;
+    """
+    query_entries = f"""
+        SELECT {", ".join(FORECAST_COLUMNS)} FROM ForecastWeatherData
+        WHERE fetch_id = ?
+        ORDER BY timestamp_weatherinfo;
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query_fetch, (forecast_type, now.isoformat(" "), oldest.isoformat(" ")))
+        fetch = cursor.fetchone()
+        if fetch is None:
+            return None
+        cursor.execute(query_entries, (fetch["fetch_id"],))
+        rows = [dict(row) for row in cursor.fetchall()]
+    return build_forecast_timeline(dict(fetch), rows)
+
+
+def fetch_forecast(forecast_type: str) -> Optional[ForecastTimeline]:
+    """
+    Fetch the forecast from the OpenWeather API and save it to the cache database.
+
+    Parameters:
+        forecast_type (str): The type of forecast ('hourly' or 'daily').
+
+    Returns:
+        Optional[ForecastTimeline]: The timeline of the forecast, or None if it could not be fetched.
+    """
+    api_url = "https://api.openweathermap.org/data/2.5/forecast"
+    data_text = get_data_from_openweather(link=api_url)
+    if not data_text:
+        logger.error("Unable to fetch forecast data from API.")
+        return None
+    forecast_list = json.loads(data_text).get("list", [])
+    return save_forecast_data_to_cache_db(forecast_list, forecast_type)
+
+
+def get_forecast_timeline(forecast_type: str) -> Optional[ForecastTimeline]:
+    """
+    Return the timeline of the latest forecast of a type.
+
+    The timeline is kept in memory by each process until the end of its validity window. When it
+    expires, the latest fetch cached by another process is used if it is still valid; otherwise the
+    forecast is fetched from the API by a single request at a time (see Utils/single_flight.py). If
+    the API cannot be reached, the expired timeline is used until the next attempt.
+
+    Parameters:
+        forecast_type (str): The type of forecast ('hourly' or 'daily').
+
+    Returns:
+        Optional[ForecastTimeline]: The timeline, or None if no forecast could be fetched.
+    """
+    with _forecast_timelines_lock:
+        timeline = _forecast_timelines.get(forecast_type)
+    if timeline is not None and datetime.datetime.now() < timeline.valid_until:
+        return timeline
+
+    # A refresh is running (usually in the background refresher): serve the previous forecast meanwhile.
+    if timeline is not None and get_single_flight().in_flight(f"forecast_{forecast_type}"):
+        return timeline
+
+    new_timeline = get_single_flight().do(
+        f"forecast_{forecast_type}",
+        lambda: fetch_forecast(forecast_type),
+        recheck_fn=lambda: read_cached_forecast(forecast_type),
+    )
+    if new_timeline is None:
+        return timeline
+    return _set_forecast_timeline(new_timeline)
+
+
+def _set_forecast_timeline(timeline: ForecastTimeline) -> ForecastTimeline:
+    """
+    Keep a forecast timeline in memory, unless a more recent fetch of its type is already kept.
+
+    Returns:
+        ForecastTimeline: The timeline kept in memory for the forecast type.
+    """
+    with _forecast_timelines_lock:
+        current = _forecast_timelines.get(timeline.forecast_type)
+        if current is None or current.fetch_id <= timeline.fetch_id:
+            _forecast_timelines[timeline.forecast_type] = timeline
+        return _forecast_timelines[timeline.forecast_type]
+
+
+def refresh_forecast(forecast_type: str = "hourly") -> bool:
+    """
+    Fetch the forecast ahead of the expiry of its timeline, if it is FORECAST_REFRESH_MINUTES old.
+
+    Called by the background refresher, which keeps the forecast warm for the forecast lookups and
+    the ride predictions. If another process refreshed the cache database in the meantime, its
+    fetch is used instead of calling the API.
+
+    Parameters:
+        forecast_type (str): The type of forecast ('hourly' or 'daily').
+
+    Returns:
+        bool: True if the forecast was refreshed.
+    """
+    with _forecast_timelines_lock:
+        timeline = _forecast_timelines.get(forecast_type)
+    max_age = datetime.timedelta(minutes=FORECAST_REFRESH_MINUTES)
+    if timeline is not None and datetime.datetime.now() - timeline.fetched_at < max_age:
+        return False
+    new_timeline = get_single_flight().do(
+        f"forecast_{forecast_type}",
+        lambda: fetch_forecast(forecast_type),
+        recheck_fn=lambda: read_cached_forecast(forecast_type, FORECAST_REFRESH_MINUTES),
+    )
+    if new_timeline is None:
+        return False
+    _set_forecast_timeline(new_timeline)
+    return True
+
+
+def clear_forecast_timelines() -> None:
+    """
+    Drop the forecast timelines kept in memory by this process (the next call reads the cache
+    database).
+
+    Returns:
+        None
+    """
+    with _forecast_timelines_lock:
+        _forecast_timelines.clear()
 
 
 def get_forecast_weather_data(forecast_type: str, target_datetime: str) -> dict:
     """
-    Retrieve forecast weather data from the cache or from the OpenWeather API.
+    Retrieve the forecast weather at a target time.
 
     For forecast_type 'current', this function simply returns the current weather data.
-    For other forecast types ('hourly' or 'daily'), it first attempts to retrieve a matching forecast
-    from the cache that is within a specified time range of the target datetime.
-    If a matching forecast is not found, it fetches forecast data from the API, caches all forecasts,
-    and returns the forecast that best matches the target datetime.
+    For other forecast types ('hourly' or 'daily'), the weather is interpolated at the target time in
+    the timeline of the latest forecast fetch (see get_forecast_timeline and forecast_at), so that
+    all the target times are answered from the same fetch, from memory.
 
     Parameters:
         forecast_type (str): The type of forecast ('current', 'hourly', or 'daily').
@@ -183,55 +580,63 @@ def get_forecast_weather_data(forecast_type: str, target_datetime: str) -> dict:
     if forecast_type == "current":
         return get_current_weather_data()
     target_dt = datetime.datetime.fromisoformat(target_datetime)
-    now = datetime.datetime.now()
-    cache_interval = datetime.timedelta(hours=1)
-    engine = get_sql_engine()
-    try:
-        cutoff = now - cache_interval
-        query = """
-            SELECT *, ABS(strftime('%s', timestamp_weatherinfo) - strftime('%s', ?)) AS time_diff
-            FROM FetchedWeatherData
-            WHERE forecast_type = ?
-            AND timestamp_requested >= ?
-            AND ABS(strftime('%s', timestamp_weatherinfo) - strftime('%s', ?)) <= 10800
-            ORDER BY time_diff ASC
-            LIMIT 1;
-        """
-        cursor = engine.cursor()
-        cursor.execute(query, (target_dt, forecast_type, cutoff, target_dt))
-        row = cursor.fetchone()
-    finally:
-        engine.close()
-    if row:
-        logger.info("Weather data found in cache.")
-        return dict(row)
-    
-    # Else, ask the API, and save cache data from the API for all the forecasts given
-    else:
-        api_url = "https://api.openweathermap.org/data/2.5/forecast"
-        data_text = get_data_from_openweather(link=api_url)
-        if not data_text:
-            return {"error": "Unable to fetch forecast data from API"}
-        forecast_data = json.loads(data_text)
-        forecast_list = forecast_data.get("list", [])
-        matching_forecast = None
-        
-        # Extract all the forecasts: cache all to the DB and save one
-        for forecast in forecast_list:
-            entry_dt = datetime.datetime.fromtimestamp(forecast.get("dt"))
-
-            # We check if the entry is within 1.5 hours of the requested time stamp
-            # Why? Because the API gives us data of every 3 hours, this would be the colsest one
-            # 3 hours = 5400 seconds, we put a bit more just in case
-            if abs((entry_dt - target_dt).total_seconds()) < 5470:
-                matching_forecast = save_weather_data_to_cache_db(
-                    forecast, forecast_type, target_datetime, return_row=True
-                )
-            else:
-                save_weather_data_to_cache_db(
-                    forecast, forecast_type, target_datetime, return_row=False
-                )
-        if not matching_forecast:
-            logger.error("No matching forecast found for the requested time.")
-            return {"error": "No forecast found for the selected time."}
-        return matching_forecast
+    timeline = get_forecast_timeline(forecast_type)
+    if timeline is None:
+        return {"error": "Unable to fetch forecast data from API"}
+
+    forecast = forecast_at(timeline, target_dt)
+    if forecast is None:
+        logger.error("No matching forecast found for the requested time.")
+        return {"error": FORECAST_NOT_FOUND_ERROR}
+    forecast.update(
+        forecast_type=forecast_type,
+        fetch_id=timeline.fetch_id,
+        timestamp_requested=timeline.fetched_at.isoformat(" "),
+        target_datetime=target_datetime,
+    )
+    return forecast
+
+
+def get_forecast_weather_series() -> list:
+    """
+    Retrieve all the hourly forecast entries (every 3 hours for the next 5 days) in time order.
+
+    Returns:
+        list: The rows of the latest hourly forecast (with timestamp_weatherinfo, temp and humidity),
+              ordered by timestamp_weatherinfo (empty if the forecast could not be fetched). The
+              rows are shared by all the callers and must not be modified.
+    """
+    timeline = get_forecast_timeline("hourly")
+    return timeline.rows if timeline is not None else []
+
+
+def get_weather_at(target_dt: datetime.datetime) -> dict:
+    """
+    Retrieve the temperature and humidity at a time, for the predictions that are not given them.
+
+    The weather is interpolated in the hourly forecast (kept warm by the background refresher).
+    Before the first forecast entry (i.e., in the next hours), the current weather is used. The
+    forecast entries are 3 hours apart: the current weather is also used for the next 3 hours when
+    the forecast is not available.
+
+    Parameters:
+        target_dt (datetime.datetime): The time of the prediction.
+
+    Returns:
+        dict: The temperature, the humidity and their source ("forecast" or "current"), or an error
+              message if the weather is not available.
+    """
+    timeline = get_forecast_timeline("hourly")
+    if timeline is not None:
+        forecast = forecast_at(timeline, target_dt)
+        if forecast is not None and forecast["temp"] is not None and forecast["humidity"] is not None:
+            return {"temperature": forecast["temp"], "humidity": forecast["humidity"], "source": "forecast"}
+        if target_dt.timestamp() > timeline.seconds[-1]:
+            return {"error": FORECAST_NOT_FOUND_ERROR}
+    elif target_dt > datetime.datetime.now() + datetime.timedelta(hours=3):
+        return {"error": "Unable to fetch forecast data from API"}
+
+    current = get_current_weather_data()
+    if "error" in current:
+        return {"error": "Unable to fetch weather data"}
+    return {"temperature": current["temp"], "humidity": current["humidity"], "source": "current"}
@@ -0,0 +1,118 @@
+import os
+import threading
+from typing import Optional
+from DublinBikes.Utils.params import BACKGROUND_REFRESH_ENABLED
+from DublinBikes.DataFrontend.data_realtime_bikes import refresh_bikes_data
+from DublinBikes.DataFrontend.data_realtime_weather import refresh_current_weather, refresh_forecast
+
+"""
+Module: data_refresher
+----------------------
+This module refreshes the real-time bikes and current weather data, and prefetches the hourly
+forecast, in a background thread, so that the user requests are not the ones waiting for the APIs
+when the cache expires.
+
+Script Logic:
+- Every CHECK_INTERVAL_SECONDS, check the age of the bikes snapshot, of the cached current weather
+  and of the forecast timeline.
+- If they are older than BIKES_REFRESH_MINUTES / WEATHER_REFRESH_MINUTES / FORECAST_REFRESH_MINUTES
+  (params.py), shortly before they expire, fetch them again (through the single-flight layer, so a refresh made by another
+  process is reused).
+- Meanwhile, the requests are served the previous data (see get_current_bikes_data,
+  get_current_weather_data and get_forecast_timeline).
+
+The refresher is started with the Flask application (on the first request served by each process,
+see FlaskApp/__init__.py) when BACKGROUND_REFRESH_ENABLED is True, whatever the server (run.py,
+flask run, gunicorn workers).
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Time between two checks of the data age: the refreshes happen at most this late.
+CHECK_INTERVAL_SECONDS = 30
+
+_refresher_thread: Optional[threading.Thread] = None
+_stop_event = threading.Event()
+
+
+def refresh_once() -> None:
+    """
+    Refresh the bikes, current weather and forecast data that are about to expire.
+
+    An error while refreshing one resource is logged and does not prevent the other refresh.
+
+    Returns:
+        None
+    """
+    for name, refresh in (
+        ("bikes", refresh_bikes_data),
+        ("current weather", refresh_current_weather),
+        ("forecast", refresh_forecast),
+    ):
+        try:
+            if refresh():
+                logger.info(f"Background refresh of the {name} data done.")
+        except Exception as e:
+            logger.error(f"Background refresh of the {name} data failed: {e}")
+
+
+def _run_refresher() -> None:
+    """
+    Refresh the data until stop_background_refresher() is called.
+    """
+    while not _stop_event.is_set():
+        refresh_once()
+        _stop_event.wait(CHECK_INTERVAL_SECONDS)
+
+
+def should_start_refresher(debug: bool, testing: bool) -> bool:
+    """
+    Tell whether the process serving the Flask application should run the background refresher.
+
+    The refresher runs in every serving process, except in the tests and in the parent process of
+    the debug reloader (which only watches the files: the child process, where WERKZEUG_RUN_MAIN is
+    set, serves the requests).
+
+    Parameters:
+        debug (bool): Whether the application runs in debug mode (app.debug).
+        testing (bool): Whether the application runs in the tests (app.testing).
+
+    Returns:
+        bool: True if the refresher should be started.
+    """
+    if not BACKGROUND_REFRESH_ENABLED or testing:
+        return False
+    return not (debug and os.environ.get("WERKZEUG_RUN_MAIN") != "true")
+
+
+def start_background_refresher() -> threading.Thread:
+    """
+    Start the background refresher thread of this process (once).
+
+    Returns:
+        threading.Thread: The refresher thread.
+    """
+    global _refresher_thread
+    if _refresher_thread is None or not _refresher_thread.is_alive():
+        _stop_event.clear()
+        _refresher_thread = threading.Thread(target=_run_refresher, name="data-refresher", daemon=True)
+        _refresher_thread.start()
+        logger.info("Background data refresher started.")
+    return _refresher_thread
+
+
+def stop_background_refresher() -> None:
+    """
+    Stop the background refresher thread and wait for its current refresh to finish.
+
+    Returns:
+        None
+    """
+    global _refresher_thread
+    _stop_event.set()
+    if _refresher_thread is not None:
+        _refresher_thread.join()
+        _refresher_thread = None
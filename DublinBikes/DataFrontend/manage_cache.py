@@ -1,12 +1,12 @@
 import os
 from datetime import date
-from DublinBikes.SqlCode.sql_utils import get_sql_engine
+from DublinBikes.SqlCode.sql_utils import get_connection
 
 """
 Module: manage_cache
 ----------------------
 This module provides functionality to clean the cache database.
-It removes outdated records from both weather and bike data tables and updates a cache file
+It removes outdated records from the weather, forecast and bike data tables and updates a cache file
 to record the last time the cache was cleaned.
 """
 
@@ -20,7 +20,8 @@ def clean_cache(date_today: date = None):
     Clean the cache database by removing outdated records.
 
     This function deletes records from the 'FetchedWeatherData' and 'FetchedBikesData' tables
-    that were requested before the current day. It also updates a cache file 'lastcachedelete.txt'
+    that were requested before the current day, and the forecast fetches (with their entries) that
+    expired before the current day. It also updates a cache file 'lastcachedelete.txt'
     to indicate the last cleaning date. If the cache has already been cleaned today, no action is taken.
     
     :param date_today: Optional; if provided, this date will be used instead of today's date.
@@ -42,23 +43,31 @@ def clean_cache(date_today: date = None):
             logger.info("Cache already cleaned today. No action taken.")
             return 0
         
-    conn = get_sql_engine()
+    # The deletions are committed together when the connection block exits, or rolled back on error.
     try:
-        cursor = conn.cursor()
-        
-        delete_weather = ("DELETE FROM FetchedWeatherData WHERE date(timestamp_requested) < ?;")
-        cursor.execute(delete_weather, (today_str,))
-        
-        delete_bikes = "DELETE FROM FetchedBikesData WHERE date(time_requested) < ?;"
-        cursor.execute(delete_bikes, (today_str,))
+        with get_connection() as conn:
+            cursor = conn.cursor()
+
+            # The timestamps are stored as 'YYYY-MM-DD HH:MM:SS' text: comparing them with the date
+            # of today keeps the primary key usable (unlike date(timestamp) < ?).
+            delete_weather = "DELETE FROM FetchedWeatherData WHERE timestamp_requested < ?;"
+            cursor.execute(delete_weather, (today_str,))
         
-        conn.commit()
+            delete_bikes = "DELETE FROM FetchedBikesData WHERE time_requested < ?;"
+            cursor.execute(delete_bikes, (today_str,))
+
+            delete_forecast_entries = """
+                DELETE FROM ForecastWeatherData WHERE fetch_id IN (
+                    SELECT fetch_id FROM ForecastFetches WHERE valid_until < ?
+                );
+            """
+            cursor.execute(delete_forecast_entries, (today_str,))
+            delete_forecast_fetches = "DELETE FROM ForecastFetches WHERE valid_until < ?;"
+            cursor.execute(delete_forecast_fetches, (today_str,))
         logger.info("Cache cleaned successfully.")
         
     except Exception as e:
         logger.info("Error cleaning cache:", e)
-    finally:
-        conn.close()
     with open(cache_file, "w") as f:
         f.write(date.today().isoformat())
 
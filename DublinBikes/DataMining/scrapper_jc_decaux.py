@@ -10,6 +10,7 @@ import glob
 import os
 import requests
 import time
+from typing import Dict
 
 from DublinBikes.Utils.params import *
 from DublinBikes.SqlCode.sql_utils import execute_sql
@@ -94,32 +95,139 @@ def save_stations_data_to_db(data: str, in_engine: sqla.engine.base.Connection)
         execute_sql(query, in_engine)
 
 
-def save_availability_data_to_db(data: str, in_engine: sqla.engine.base.Connection) -> None:
+class AvailabilityChangeTracker:
+    """
+    Keep the last saved observation of each station, so that only new observations are inserted
+    into the 'availability' table.
+
+    The JCDecaux API returns every station at each poll, but a station only sends a new report from
+    time to time: a station whose last_update did not change since the previous poll would insert
+    the same (station_id, last_update) row again. Those rows are skipped and counted.
+    """
+
+    def __init__(self):
+        self._last_updates: Dict[int, str] = {}
+        self._loaded = False
+        self.rows_received = 0
+        self.rows_inserted = 0
+        self.rows_skipped = 0
+
+    def load_state(self, in_engine) -> None:
+        """
+        Load the latest saved observation of each station from the 'availability' table (once), so
+        that a restarted scraper does not insert the observations saved before it stopped.
+
+        Parameters:
+            in_engine: The database connection.
+
+        Returns:
+            None
+        """
+        if self._loaded:
+            return
+        cursor = in_engine.execute("SELECT station_id, MAX(last_update) FROM availability GROUP BY station_id;")
+        self._last_updates.update({row[0]: str(row[1]) for row in cursor.fetchall()})
+        self._loaded = True
+
+    def changed_rows(self, rows: list) -> list:
+        """
+        Keep the rows whose last_update differs from the last saved observation of their station.
+
+        Parameters:
+            rows (list): (station_id, last_update, available_bikes, available_bike_stands, status) tuples,
+                         with last_update formatted as in the database ('YYYY-MM-DD HH:MM:SS').
+
+        Returns:
+            list: The rows to insert.
+        """
+        changed = [row for row in rows if self._last_updates.get(row[0]) != row[1]]
+        self.rows_received += len(rows)
+        self.rows_skipped += len(rows) - len(changed)
+        return changed
+
+    def mark_saved(self, rows: list) -> None:
+        """
+        Record the rows inserted into the database as the last saved observations.
+
+        Parameters:
+            rows (list): The rows returned by changed_rows() once they are committed.
+
+        Returns:
+            None
+        """
+        for row in rows:
+            self._last_updates[row[0]] = row[1]
+        self.rows_inserted += len(rows)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the counters of the tracker.
+
+        Returns:
+            Dict[str, int]: rows_received, rows_inserted and rows_skipped since the scraper started.
+        """
+        return {
+            "rows_received": self.rows_received,
+            "rows_inserted": self.rows_inserted,
+            "rows_skipped": self.rows_skipped,
+        }
+
+
+# Last saved observation of each station, shared by the polls of the scraper.
+_availability_tracker = AvailabilityChangeTracker()
+
+
+def get_availability_tracker() -> AvailabilityChangeTracker:
+    """
+    Return the change tracker of the 'availability' table used by the scraper.
+
+    Returns:
+        AvailabilityChangeTracker: The tracker (see its stats() for the skipped rows).
+    """
+    return _availability_tracker
+
+
+def save_availability_data_to_db(data: str, in_engine: sqla.engine.base.Connection,
+                                 tracker: AvailabilityChangeTracker = None) -> int:
     """
     Save bike station availability data into the SQL database.
 
     This function parses the raw bike station data from the JCDecaux API and inserts availability information
     (including station_id, last_update, available_bikes, available_bike_stands, and status) into the 'availability' table.
+    Only the stations whose last_update changed since their last saved observation are inserted (see
+    AvailabilityChangeTracker), with a single executemany in one transaction.
 
     Parameters:
         data (str): The raw bike station data in JSON format.
         in_engine: The SQLAlchemy engine or connection object for database operations.
+        tracker (AvailabilityChangeTracker): The change tracker. Defaults to the tracker of the scraper.
 
     Returns:
-        None
+        int: The number of inserted rows.
     """
-    stations = json.loads(data)
-    for station in stations:
-        v_station_id = station.get("number")  # Changed from number to station_id
-        v_last_update = datetime.datetime.fromtimestamp(station.get("last_update") / 1000)
-        v_available_bikes = int(station.get("available_bikes"))
-        v_available_bike_stands = int(station.get("available_bike_stands"))
-        v_status = station.get("status")
-        query = f"""
-                INSERT INTO availability (station_id, last_update, available_bikes, available_bike_stands, status)
-                VALUES ({v_station_id}, '{v_last_update}', {v_available_bikes}, {v_available_bike_stands}, '{v_status}');
-                """
-        execute_sql(query, in_engine)
+    tracker = tracker or _availability_tracker
+    tracker.load_state(in_engine)
+
+    rows = []
+    for station in json.loads(data):
+        rows.append((
+            station.get("number"),
+            str(datetime.datetime.fromtimestamp(station.get("last_update") / 1000)),
+            int(station.get("available_bikes")),
+            int(station.get("available_bike_stands")),
+            station.get("status"),
+        ))
+    changed = tracker.changed_rows(rows)
+
+    query = """
+            INSERT OR IGNORE INTO availability (station_id, last_update, available_bikes, available_bike_stands, status)
+            VALUES (?, ?, ?, ?, ?);
+            """
+    with in_engine:
+        in_engine.executemany(query, changed)
+    tracker.mark_saved(changed)
+    logger.info(f"Availability: {len(changed)} new observations saved, {len(rows) - len(changed)} unchanged stations skipped")
+    return len(changed)
 
 
 def main_data_scrapper_bikes(save_to_db: bool, engine: sqla.engine.base.Connection = None, text_file_path: os.path = None) -> None:
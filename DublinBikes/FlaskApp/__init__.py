@@ -1,3 +1,4 @@
+import threading
 from flask import Flask
 from DublinBikes.Utils.params import APP_SECRET_KEY
 
@@ -7,6 +8,30 @@ app.secret_key = APP_SECRET_KEY
 
 # Import routes to register them with the app.
 from DublinBikes.FlaskApp import routes
+from DublinBikes.DataFrontend.data_refresher import should_start_refresher, start_background_refresher
+
+
+# The background refresher is started by the first request of each process (after the fork of the
+# server workers, since threads do not survive it).
+_refresher_checked = False
+_refresher_lock = threading.Lock()
+
+
+@app.before_request
+def start_data_refresher():
+    """
+    Start the background refresher of the bikes, weather and forecast data on the first request of
+    the process, if it should run there (see data_refresher.should_start_refresher).
+    """
+    global _refresher_checked
+    if _refresher_checked:
+        return
+    with _refresher_lock:
+        if _refresher_checked:
+            return
+        _refresher_checked = True
+        if should_start_refresher(app.debug, app.testing):
+            start_background_refresher()
 
 
 # This is a context processor that will inject the timedelta function into all templates.
@@ -20,12 +20,26 @@ from DublinBikes.DataFrontend.data_loader_SQL import (
     get_all_stations_data_SQL,
     get_one_station_data,
     get_station_availability_daily,
+    get_stations_bike_stands,
 )
 from DublinBikes.DataFrontend.data_realtime_weather import (
     get_forecast_weather_data,
+    get_forecast_weather_series,
     get_current_weather_data,
+    get_weather_at,
+    FORECAST_NOT_FOUND_ERROR,
 )
-from DublinBikes.DataFrontend.data_realtime_bikes import get_current_bikes_data
+from DublinBikes.DataFrontend.data_realtime_bikes import (
+    get_current_bikes_data,
+    get_bikes_payload,
+    build_bikes_payload,
+    get_bikes_delta,
+    get_bikes_events,
+    get_bikes_snapshot_id,
+    parse_bikes_fields,
+    BIKES_FORMATS,
+)
+from DublinBikes.DataFrontend.data_forecast_stations import get_forecast_all_stations
 from DublinBikes.SqlCode.user_db import (
     register_user,
     get_user_by_email,
@@ -33,6 +47,7 @@ from DublinBikes.SqlCode.user_db import (
 )
 
 from datetime import datetime, timedelta
+import json
 import re
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -101,6 +116,49 @@ def station_view(station_id):
     )
 
 
+@app.route("/api/station/<int:station_id>/forecast_curve")
+def station_forecast_curve_api(station_id):
+    """
+    Provide the predicted availability of a station for every 15-minute slot of the next hours.
+
+    Expects the following optional query parameter:
+        - hours: Number of hours covered by the curve (default 24, at most FORECAST_CURVE_MAX_HOURS).
+
+    The hourly forecast weather is interpolated onto the slots and the station model is evaluated
+    once for the whole curve.
+
+    Parameters:
+        station_id (int): The unique identifier of the bike station.
+
+    Returns:
+        Response: JSON object with the station_id and a "curve" list of predictions, or an error
+                  message (400 for invalid hours, 404 for unknown stations, 503 if the weather
+                  forecast is not available, 500 if the prediction fails).
+    """
+    from DublinBikes.MachineLearning.predict_availability import predict_station_curve
+
+    hours = request.args.get("hours", 24, type=int)
+    if hours is None or not 1 <= hours <= FORECAST_CURVE_MAX_HOURS:
+        return jsonify({"error": f"hours must be between 1 and {FORECAST_CURVE_MAX_HOURS}"}), 400
+
+    bike_stands = get_stations_bike_stands([station_id])
+    if station_id not in bike_stands:
+        return jsonify({"error": f"No data found for station {station_id}"}), 404
+
+    weather = get_forecast_weather_series()
+    if not weather:
+        return jsonify({"error": "Unable to fetch forecast data from API"}), 503
+
+    try:
+        curve = predict_station_curve(
+            station_id, datetime.now(), hours, FORECAST_CURVE_SLOT_MINUTES, weather, bike_stands[station_id]
+        )
+    except Exception as e:
+        return jsonify({"error": f"Prediction failed: {e}"}), 500
+
+    return jsonify({"station_id": station_id, "curve": curve})
+
+
 @app.route("/api/current_weather")
 def current_weather_api():
     """
@@ -144,29 +202,156 @@ def current_bikes_api():
 
     Retrieves real-time bike availability information from the cache or the external API.
 
+    The JSON body is serialized (and gzip compressed) once per fetch, and served with an ETag: a
+    request whose If-None-Match header matches it receives a 304 Not Modified without body. The
+    clients must revalidate on every request (Cache-Control: no-cache).
+
+    Optional query parameters:
+        - since: the id of the snapshot displayed by the client (X-Snapshot-Id header of a previous
+          response). Only the stations whose bikes, stands or status changed since then are
+          returned (see get_bikes_delta), restricted to the requested fields. If the snapshot is no
+          longer known, the full list is returned. Only supported with the "rows" format.
+        - format: "rows" (default, a list of station records) or "columnar" (an object with one
+          list of values per field, the position being split into position_lat and position_lng).
+        - fields: comma separated fields to return (e.g., "station_id,available_bikes,available_bike_stands").
+
     Returns:
-        Response: JSON object containing current bike data.
+        Response: JSON list containing current bike data (gzip compressed if the client accepts
+                  it), a JSON delta object (with its own ETag) if "since" is a known snapshot, or an
+                  empty 304 response if the client already has this body. The X-Snapshot-Id header
+                  holds the id of the current snapshot. An error message (400) is returned for an
+                  unknown format or field, or for "since" with the columnar format.
     """
+    fmt = request.args.get("format", "rows")
+    if fmt not in BIKES_FORMATS:
+        return jsonify({"error": f"Invalid format: {fmt}"}), 400
+    since = request.args.get("since")
+    if since and fmt != "rows":
+        return jsonify({"error": "The since parameter is only supported with the rows format"}), 400
+    try:
+        fields = parse_bikes_fields(request.args.get("fields"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     data = get_current_bikes_data()
+    if not isinstance(data, list):
+        return jsonify(data)
+
+    snapshot_id = get_bikes_payload(data).etag
+    delta = get_bikes_delta(data, since, fields) if since else None
+    # A delta depends on the snapshot of the client: it is serialized per request, with its own ETag.
+    payload = build_bikes_payload(delta) if delta is not None else get_bikes_payload(data, fmt, fields)
+    if request.if_none_match.contains_weak(payload.etag):
+        response = app.response_class(status=304)
+    elif "gzip" in request.accept_encodings:
+        response = app.response_class(payload.gzip_body, mimetype="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = app.response_class(payload.body, mimetype="application/json")
+    # The gzip and plain bodies hold the same JSON: they share a weak ETag.
+    response.set_etag(payload.etag, weak=True)
+    response.headers["X-Snapshot-Id"] = snapshot_id
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+@app.route("/api/stream/bikes")
+def stream_bikes_api():
+    """
+    Stream the changes of the bike stations as Server-Sent Events.
+
+    The stream starts with a "snapshot" event holding the id of the current snapshot of the worker
+    (null if it has none yet). Then, each time the worker stores a new snapshot (see
+    data_refresher.py), a "delta" event is sent with the stations whose bikes, stands or status
+    changed, in the format of /api/current_bikes?since= (its "since" field lets the client detect a
+    missed event). A comment is sent every BIKES_STREAM_KEEPALIVE_SECONDS to keep the connection open.
+
+    Returns:
+        Response: The text/event-stream response, or an error message (503) if the worker already
+                  streams to BIKES_STREAM_MAX_CLIENTS clients.
+    """
+    events = get_bikes_events()
+    subscriber_id = events.subscribe()
+    if subscriber_id is None:
+        return jsonify({"error": "Too many bikes stream clients, poll /api/current_bikes instead"}), 503
+
+    def stream():
+        yield f"retry: 5000\nevent: snapshot\ndata: {json.dumps({'snapshot_id': get_bikes_snapshot_id()})}\n\n"
+        while True:
+            event = events.get(subscriber_id, BIKES_STREAM_KEEPALIVE_SECONDS)
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            snapshot_id, delta = event
+            yield f"id: {snapshot_id}\nevent: delta\ndata: {delta}\n\n"
+
+    response = app.response_class(stream(), mimetype="text/event-stream")
+    # Unsubscribe when the client disconnects (also if the stream never started).
+    response.call_on_close(lambda: events.unsubscribe(subscriber_id))
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@app.route("/api/forecast_all")
+def forecast_all_api():
+    """
+    Provide the predicted availability of every station at a future time.
+
+    Expects the following query parameter:
+        - at: ISO formatted datetime string of the requested time (required).
+
+    The weather comes from the cached forecast and the result is cached per time slot.
+
+    Returns:
+        Response: JSON object with the slot, the forecast weather and the predicted bikes and stands
+                  of each station, or an error message if the parameter is invalid or outside the
+                  forecast window (400), or if the weather forecast is not available (503).
+    """
+    at = request.args.get("at")
+    if not at:
+        return jsonify({"error": "at parameter is required"}), 400
+    try:
+        at_datetime = datetime.fromisoformat(at)
+    except ValueError:
+        return jsonify({"error": f"Invalid at parameter: {at}"}), 400
+
+    data = get_forecast_all_stations(at_datetime)
+    if "error" in data:
+        return jsonify(data), 400 if data["error"] == FORECAST_NOT_FOUND_ERROR else 503
     return jsonify(data)
 
 
 @app.route("/api/ride_prediction", methods=["POST"])
 def ride_prediction():
     """
-    Provide a dummy ride prediction based on input data.
+    Provide the predicted bikes at the origin station and stands at the destination station.
 
-    Simulates a machine learning prediction by generating a random value.
-    Logs the received data (timestamp, weather conditions, station IDs) for debugging.
+    Expects a JSON body with the origin_station_id, the destination_station_id and the timestamp of
+    the ride. The temperature and humidity are optional: when they are missing, they are filled in
+    from the forecast kept warm by the background refresher (or the current weather for the next
+    hours), so that the client does not need to fetch the forecast first.
 
     Returns:
-        Response: JSON object with the predicted ride value.
+        Response: JSON object with the predictions, or an error message (400 for invalid inputs,
+                  503 if the weather is missing and not available, 500 if the prediction fails).
     """
-    import random
     from DublinBikes.MachineLearning.predict_availability import prediction
 
-    data = request.get_json()
-    
+    data = request.get_json(silent=True) or {}
+    if data.get("temperature") is None or data.get("humidity") is None:
+        try:
+            target = datetime.fromisoformat(data.get("timestamp"))
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": f"Timestamp parsing error: {e}"}), 400
+        if target.tzinfo is not None:
+            target = target.astimezone().replace(tzinfo=None)
+        weather = get_weather_at(target)
+        if "error" in weather:
+            return jsonify(weather), 503
+        data = {**data, "temperature": weather["temperature"], "humidity": weather["humidity"]}
+
     origin = get_station_data(station_id=data["origin_station_id"])[0]
     destination = get_station_data(station_id=data["destination_station_id"])[0]
     
@@ -175,6 +360,46 @@ def ride_prediction():
     return result
 
 
+@app.route("/api/ride_prediction/batch", methods=["POST"])
+def ride_prediction_batch():
+    """
+    Provide availability predictions for many stations and times in a single call.
+
+    Expects a JSON body with a "queries" list, each query having a station_id, a timestamp,
+    a temperature and a humidity. The queries are grouped by station so that each station model
+    is evaluated only once.
+
+    Returns:
+        Response: JSON object with a "predictions" list (same order as the queries), or an error
+                  message with a 400 status if the queries are invalid.
+    """
+    from DublinBikes.MachineLearning.predict_availability import batch_prediction
+
+    data = request.get_json(silent=True) or {}
+    queries = data.get("queries")
+    if not isinstance(queries, list) or not queries:
+        return jsonify({"error": "A non-empty 'queries' list is required"}), 400
+
+    try:
+        station_ids = {int(query["station_id"]) for query in queries}
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Every query must have a valid station_id"}), 400
+
+    bike_stands = get_stations_bike_stands(station_ids)
+    unknown_stations = sorted(station_ids - bike_stands.keys())
+    if unknown_stations:
+        return jsonify({"error": f"No data found for stations {unknown_stations}"}), 400
+
+    try:
+        predictions = batch_prediction(queries, bike_stands)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Prediction failed: {e}"}), 500
+
+    return jsonify({"predictions": predictions})
+
+
 
 # Email regex pattern
 EMAIL_REGEX = r"[^@]+@[^@]+\.[^@]+"
@@ -9,6 +9,10 @@ import { placeMarkers, stationMarkers } from "./maps.js";
 
 
 let lastFetchTime = 0;
+// ETag of the bikes data currently displayed (sent back in If-None-Match).
+let bikesDataETag = null;
+// Id of the snapshot currently displayed: the next fetches only ask for the changes since it.
+let snapshotId = null;
 
 /**
  * Waits until the Google Maps API is available before calling the callback.
@@ -25,15 +29,65 @@ function waitForGoogleMaps(callback, retries = 20) {
   }
 }
 
+/**
+ * Forgets the displayed snapshot and its ETag, so that the next fetch downloads
+ * the full station list instead of a delta or a 304 Not Modified.
+ */
+function resetBikesSnapshot() {
+  snapshotId = null;
+  bikesDataETag = null;
+}
+
+/**
+ * Tells whether a delta contains stations missing from the displayed list: their
+ * static data (name, position) is only in the full list.
+ * @param {Object} delta - The delta returned by /api/current_bikes?since=.
+ * @returns {boolean} True if the full list must be fetched instead.
+ */
+function deltaHasNewStations(delta) {
+  return delta.changed.some(
+    (change) => !window.stations.some((s) => s.station_id == change.station_id)
+  );
+}
+
 /**
  * Fetches the current bikes data from the API.
- * Updates the global stations variable and calls updateMarkers.
+ * Updates the global stations variable and calls updateMarkers, unless the
+ * server answers 304 Not Modified (the data did not change since the last fetch).
+ * Once the stations are displayed, only the changes since the displayed snapshot
+ * are requested, and applied with applyBikesDelta.
  */
 export function fetchBikesData() {
-  fetch("/api/current_bikes")
-    .then((response) => response.json())
-    .then((data) => {
+  // Send the ETag of the data already displayed: the server answers 304 if it did not change.
+  const headers = bikesDataETag ? { "If-None-Match": bikesDataETag } : {};
+  const url = snapshotId && window.stations
+    ? `/api/current_bikes?since=${encodeURIComponent(snapshotId)}`
+    : "/api/current_bikes";
+  fetch(url, { headers, cache: "no-store" })
+    .then((response) => {
       lastFetchTime = Date.now();
+      if (response.status === 304) {
+        return null;
+      }
+      bikesDataETag = response.headers.get("ETag");
+      snapshotId = response.headers.get("X-Snapshot-Id");
+      return response.json();
+    })
+    .then((data) => {
+      // 304 Not Modified: the markers already show the current data.
+      if (data === null) {
+        return;
+      }
+      // Delta since the displayed snapshot: only update the changed stations.
+      if (data.changed) {
+        if (deltaHasNewStations(data)) {
+          resetBikesSnapshot();
+          fetchBikesData();
+          return;
+        }
+        waitForGoogleMaps(() => applyBikesDelta(data));
+        return;
+      }
       // Update global stations variable.
       window.stations = data;
       // Wait for the Google Maps API to load before updating markers.
@@ -75,5 +129,81 @@ export function updateMarkers(stationsData) {
   }
 }
 
-// Optionally, fetch bikes data on page load.
+/**
+ * Applies the changes since the displayed snapshot:
+ * - Merges the changed fields into the global stations variable.
+ * - Replaces the markers of the changed stations only.
+ * - Removes the stations missing from the current data.
+ * @param {Object} delta - The delta returned by /api/current_bikes?since=.
+ */
+export function applyBikesDelta(delta) {
+  const changedIds = new Set();
+  delta.changed.forEach((change) => {
+    const station = window.stations.find((s) => s.station_id == change.station_id);
+    if (station) {
+      Object.assign(station, change);
+      changedIds.add(station.station_id);
+    } else {
+      // New station: its static data (name, position) is only in the full list.
+      resetBikesSnapshot();
+    }
+  });
+  window.stations = window.stations.filter((s) => !delta.removed.includes(s.station_id));
+
+  // Remove the markers of the changed and removed stations.
+  [...changedIds, ...delta.removed].forEach((id) => {
+    if (stationMarkers[id]) {
+      stationMarkers[id].setMap(null);
+      delete stationMarkers[id];
+    }
+  });
+  placeMarkers(window.stations.filter((s) => changedIds.has(s.station_id)));
+
+  // Reopen info window for previously selected station if it was replaced.
+  if (changedIds.has(Number(window.selectedStationId)) && stationMarkers[window.selectedStationId]) {
+    google.maps.event.trigger(stationMarkers[window.selectedStationId], "click");
+  }
+}
+
+/**
+ * Subscribes to the stream of station changes (/api/stream/bikes):
+ * - "delta" events following the displayed snapshot are applied to the markers.
+ * - Otherwise (missed event, new connection with another snapshot), the changes
+ *   are fetched with fetchBikesData.
+ * The browser reconnects automatically if the connection is lost.
+ */
+export function startBikesStream() {
+  if (typeof EventSource === "undefined") {
+    return;
+  }
+  const source = new EventSource("/api/stream/bikes");
+  source.addEventListener("snapshot", (event) => {
+    const current = JSON.parse(event.data).snapshot_id;
+    if (current && snapshotId && current !== snapshotId) {
+      fetchBikesData();
+    }
+  });
+  source.addEventListener("delta", (event) => {
+    const delta = JSON.parse(event.data);
+    if (!snapshotId || !window.stations) {
+      return; // The first fetch is not done yet: it will return the current data.
+    }
+    if (delta.since !== snapshotId) {
+      fetchBikesData();
+      return;
+    }
+    if (deltaHasNewStations(delta)) {
+      resetBikesSnapshot();
+      fetchBikesData();
+      return;
+    }
+    snapshotId = delta.snapshot_id;
+    bikesDataETag = `W/"${delta.snapshot_id}"`;
+    lastFetchTime = Date.now();
+    waitForGoogleMaps(() => applyBikesDelta(delta));
+  });
+}
+
+// Optionally, fetch bikes data on page load, then follow its changes.
 document.addEventListener("DOMContentLoaded", fetchBikesData);
+document.addEventListener("DOMContentLoaded", startBikesStream);
@@ -201,6 +201,42 @@ export function placeMarkers(stations_data) {
 
 
 
+/**
+ * Shows the predicted bikes of every station at a future time as marker labels.
+ * All the stations are predicted with a single request to /api/forecast_all.
+ * @param {string} targetDatetime - ISO datetime of the forecast.
+ */
+export function showForecastAvailability(targetDatetime) {
+  fetch(`/api/forecast_all?at=${encodeURIComponent(targetDatetime)}`)
+    .then((response) => response.json())
+    .then((data) => {
+      if (data.error) {
+        console.error("Stations forecast error:", data.error);
+        return;
+      }
+      data.stations.forEach((station) => {
+        const marker = stationMarkers[station.station_id];
+        if (marker && station.available_bikes !== null) {
+          marker.setLabel({ text: String(station.available_bikes), fontWeight: "bold" });
+        }
+      });
+    })
+    .catch((error) => {
+      console.error("Error fetching stations forecast:", error);
+    });
+}
+
+
+/**
+ * Removes the predicted bikes labels from the markers.
+ */
+export function clearForecastAvailability() {
+  for (const id in stationMarkers) {
+    stationMarkers[id].setLabel(null);
+  }
+}
+
+
 /**
  * Draws an arrow (polyline) between two points on the map.
  * @param {Object} from - Starting point {lat, lng}.
@@ -12,18 +12,13 @@ import { formatTimestamp } from "./weather.js";
 window.combinedForecastAndPrediction = combinedForecastAndPrediction;
 
 /**
- * Gets ride prediction by gathering the current timestamp,
- * weather data, and station information, then sends a POST request.
+ * Gets ride prediction by gathering the selected timestamp and station information,
+ * then sends a POST request. The server fills in the forecast weather of the timestamp.
  */
 export function getRidePrediction() {
-  // Create a formatted timestamp.
-  const now = new Date();
-
-  // Retrieve weather data from the global variable (set in weather.js).
+  // Retrieve the selected time from the global variable (set in weather.js).
   const timestamp = window.TimestampWeather ? window.TimestampWeather : "N/A";
   console.log("Timestamp:", timestamp);
-  const temperature = window.fullWeatherData ? window.fullWeatherData.temp : "N/A";
-  const humidity = window.fullWeatherData ? window.fullWeatherData.humidity : "N/A";
 
   // Get destination station id from a global variable.
   const station_id = window.selectedStationId;
@@ -33,11 +28,9 @@ export function getRidePrediction() {
   }
   const originStationId = window.originStationId;
 
-  // Create the payload.
+  // Create the payload (no weather: it is filled in from the forecast by the server).
   const payload = {
     timestamp: timestamp,
-    temperature: temperature,
-    humidity: humidity,
     origin_station_id: originStationId,
     destination_station_id: station_id,
   };
@@ -52,7 +45,11 @@ export function getRidePrediction() {
   })
     .then((response) => response.json())
     .then((data) => {
-      
+      if (data.error) {
+        console.error("Prediction error:", data.error);
+        return;
+      }
+
       document.getElementById("prediction-text").style.display = "block";
       document.getElementById("prediction-text").innerHTML =
         "Prediction Availability for: ";
@@ -174,10 +171,10 @@ export function getLiveInfo() {
 
 /**
  * Combines forecast weather and prediction or live info.
- * If Bike Later is selected, it fetches the forecast and then performs the prediction.
+ * If Bike Later is selected, it fetches the forecast and the prediction in parallel.
  * Otherwise (Bike Now), it simply displays live station info.
  */
-export async function combinedForecastAndPrediction() {
+export function combinedForecastAndPrediction() {
   // Ensure a station has been selected.
   const station_id = window.selectedStationId;
   if (!station_id) {
@@ -187,7 +184,8 @@ export async function combinedForecastAndPrediction() {
 
   const forecastType = document.querySelector('input[name="forecastType"]:checked').value;
   if (forecastType === "forecast") {
-    await fetchForecastWeather();
+    // The prediction does not wait for the forecast: the server fills in its weather.
+    fetchForecastWeather();
     getRidePrediction();
   }
   // For "Bike Now" mode, the button is hidden and live info is updated automatically.
@@ -6,7 +6,11 @@
  */
 
 
-import { updateEstimatedArrivalTime } from "./maps.js";
+import {
+  updateEstimatedArrivalTime,
+  showForecastAvailability,
+  clearForecastAvailability,
+} from "./maps.js";
 
 
 /**
@@ -102,7 +106,8 @@ export function fetchForecastWeather() {
       setWeatherIcon(data.weather_id);
       window.fullWeatherData = data;
 
-
+      // Show the predicted bikes of every station at the selected time on the map.
+      showForecastAvailability(targetDatetime);
     })
     .catch((error) => {
       console.error("Error fetching forecast data:", error);
@@ -138,6 +143,7 @@ document.addEventListener("DOMContentLoaded", function () {
       } else {
         // If "Bike Now" is selected, hide the forecast options and show current weather.
         forecastOptions.style.display = "none";
+        clearForecastAvailability();
         fetchCurrentWeather();
         updateEstimatedArrivalTime();
       }
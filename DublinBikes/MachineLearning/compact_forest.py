@@ -0,0 +1,377 @@
+import argparse
+import glob
+import json
+import os
+import pickle
+import re
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+"""
+Module: compact_forest
+----------------------
+This module stores the station random forests in a compact, array-backed format and evaluates them
+with NumPy only, without unpickling any scikit-learn object.
+
+Export:
+    Every tree of every station model is flattened into contiguous arrays (feature, threshold,
+    children_left, children_right, value). The arrays of all the stations are concatenated and
+    written to a single binary file:
+        - 8 bytes: length of the JSON header (little-endian unsigned integer).
+        - JSON header: the offset, dtype and length of each array, for each station the position
+          of its tree roots in the "roots" array and the depth of its deepest tree, and the model
+          version (train.py) the forests were exported from.
+        - The arrays, each one aligned to 64 bytes.
+
+    Run the export after (re)training the models:
+        python -m DublinBikes.MachineLearning.compact_forest
+
+Evaluation:
+    The file is memory-mapped, so "loading" a station only creates array views: the pages are read
+    lazily and shared by all the worker processes that map the same file. The leaves point to
+    themselves, so that all the rows and all the trees of a station can be pushed down one level at
+    a time with vectorized NumPy operations, for as many levels as the depth of the station trees.
+    The predictions are identical to RandomForestRegressor.predict.
+
+    The file is mapped again once a new export replaced it. The model registry only uses it while
+    its model version is the active one (see model_registry.load_station_model).
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+ALIGNMENT = 64
+ARRAY_DTYPES = {
+    "feature": "<i2",
+    "threshold": "<f8",
+    "children_left": "<i4",
+    "children_right": "<i4",
+    "value": "<f8",
+    "roots": "<i4",
+}
+
+
+def get_compact_models_path() -> str:
+    """
+    Get the default path of the compact models file.
+
+    Returns:
+        str: The absolute path to "compact_models.bin" in the MachineLearning folder.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "compact_models.bin")
+
+
+def flatten_forest(model) -> Dict[str, np.ndarray]:
+    """
+    Flatten a fitted random forest regressor into contiguous arrays.
+
+    The node indices of every tree are shifted so that all the trees live in the same arrays.
+    Leaves point to themselves (children_left == children_right == node index).
+
+    Parameters:
+        model: A fitted scikit-learn RandomForestRegressor (or any ensemble with estimators_
+               holding single-output regression trees).
+
+    Returns:
+        Dict[str, np.ndarray]: The arrays described in ARRAY_DTYPES, plus "max_depth" (0-d array).
+    """
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+        roots.append(offset)
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+        rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+        values.append(tree.value[:, 0, 0])
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    return {
+        "feature": np.concatenate(features).astype(ARRAY_DTYPES["feature"]),
+        "threshold": np.concatenate(thresholds).astype(ARRAY_DTYPES["threshold"]),
+        "children_left": np.concatenate(lefts).astype(ARRAY_DTYPES["children_left"]),
+        "children_right": np.concatenate(rights).astype(ARRAY_DTYPES["children_right"]),
+        "value": np.concatenate(values).astype(ARRAY_DTYPES["value"]),
+        "roots": np.asarray(roots, dtype=ARRAY_DTYPES["roots"]),
+        "max_depth": np.asarray(max_depth),
+    }
+
+
+def write_compact_models(forests: Dict[int, Dict[str, np.ndarray]], output_path: str,
+                         model_version: Optional[str] = None) -> None:
+    """
+    Write flattened forests to a single memory-mappable file.
+
+    The file is written next to the output path first and then renamed, so that processes that
+    map the previous file are not affected.
+
+    Parameters:
+        forests (Dict[int, Dict[str, np.ndarray]]): Flattened forests (see flatten_forest) keyed by station id.
+        output_path (str): The path of the file to write.
+        model_version (Optional[str]): The model version of the forests (None for pickle_models).
+
+    Returns:
+        None
+    """
+    arrays = {name: [] for name in ARRAY_DTYPES}
+    stations = {}
+    node_offset = 0
+    root_offset = 0
+    for station_id, forest in sorted(forests.items()):
+        for name in ARRAY_DTYPES:
+            if name in ("roots", "children_left", "children_right"):
+                # Node indices are shifted by the number of nodes of the previous stations.
+                arrays[name].append(forest[name] + node_offset)
+            else:
+                arrays[name].append(forest[name])
+        n_trees = len(forest["roots"])
+        stations[str(station_id)] = [root_offset, n_trees, int(forest["max_depth"])]
+        node_offset += len(forest["value"])
+        root_offset += n_trees
+
+    merged = {
+        name: np.concatenate(parts).astype(ARRAY_DTYPES[name]) if parts else np.empty(0, ARRAY_DTYPES[name])
+        for name, parts in arrays.items()
+    }
+
+    # Compute the array offsets relative to the end of the header, then the header size.
+    layout = {}
+    position = 0
+    for name, array in merged.items():
+        position = -(-position // ALIGNMENT) * ALIGNMENT
+        layout[name] = {"offset": position, "dtype": ARRAY_DTYPES[name], "length": len(array)}
+        position += array.nbytes
+    header = {"arrays": layout, "stations": stations, "model_version": model_version}
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = -(-(8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+    header_bytes = header_bytes.ljust(data_start - 8, b" ")
+
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for name, array in merged.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(array.tobytes())
+    os.replace(tmp_path, output_path)
+    logger.info(f"Wrote {len(forests)} compact models ({node_offset} nodes) to {output_path}")
+
+
+def export_compact_models(models_folder: str, output_path: str, model_version: Optional[str] = None) -> int:
+    """
+    Convert all the station pickle models of a folder into one compact models file.
+
+    Parameters:
+        models_folder (str): The folder containing the "model_station_{id}.pkl" files.
+        output_path (str): The path of the compact models file to write.
+        model_version (Optional[str]): The model version of the folder (None for pickle_models).
+
+    Returns:
+        int: The number of exported station models.
+    """
+    forests = {}
+    for model_path in glob.glob(os.path.join(models_folder, "model_station_*.pkl")):
+        match = re.search(r"model_station_(\d+)\.pkl$", model_path)
+        if not match:
+            continue
+        with open(model_path, "rb") as f:
+            model = pickle.load(f)
+        forests[int(match.group(1))] = flatten_forest(model)
+    write_compact_models(forests, output_path, model_version)
+    return len(forests)
+
+
+def get_file_id(path: str) -> Optional[tuple]:
+    """
+    Return the identity of a file, which changes whenever the file is replaced.
+
+    Parameters:
+        path (str): The path of the file.
+
+    Returns:
+        Optional[tuple]: The inode and modification time of the file, or None if it does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns)
+
+
+class CompactForest:
+    """
+    A random forest regressor evaluated with NumPy on flattened tree arrays.
+
+    The arrays are shared by all the forests of a compact models file; a forest only knows the
+    position of its tree roots.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], roots: np.ndarray, max_depth: int):
+        """
+        Parameters:
+            arrays (Dict[str, np.ndarray]): The node arrays (feature, threshold, children_left,
+                                            children_right, value).
+            roots (np.ndarray): The indices of the root node of each tree.
+            max_depth (int): The depth of the deepest tree.
+        """
+        self._feature = arrays["feature"]
+        self._threshold = arrays["threshold"]
+        self._left = arrays["children_left"]
+        self._right = arrays["children_right"]
+        self._value = arrays["value"]
+        self.roots = roots
+        self.max_depth = max_depth
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+    def predict(self, X) -> np.ndarray:
+        """
+        Predict the target of every row of X (mean of the tree predictions).
+
+        As in scikit-learn, the features are compared as float32 values against the thresholds.
+
+        Parameters:
+            X: A (n, n_features) array or DataFrame, in the same column order as in training.
+
+        Returns:
+            np.ndarray: The predictions, one per row.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])
+        nodes = np.repeat(self.roots[:, np.newaxis], X.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            go_left = X[rows, self._feature[nodes]] <= self._threshold[nodes]
+            nodes = np.where(go_left, self._left[nodes], self._right[nodes])
+        return self._value[nodes].sum(axis=0) / self.n_estimators
+
+
+class CompactModelFile:
+    """
+    A memory-mapped compact models file giving access to the forest of each station.
+    """
+
+    def __init__(self, path: str):
+        """
+        Parameters:
+            path (str): The path of a file written by write_compact_models().
+
+        Raises:
+            OSError: If the file cannot be opened.
+            ValueError: If the file header is invalid.
+        """
+        self.path = path
+        self.file_id = get_file_id(path)
+        with open(path, "rb") as f:
+            header_length = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(header_length))
+        data_start = 8 + header_length
+        buffer = np.memmap(path, dtype=np.uint8, mode="r")
+        self._arrays = {}
+        for name, spec in header["arrays"].items():
+            start = data_start + spec["offset"]
+            dtype = np.dtype(spec["dtype"])
+            self._arrays[name] = buffer[start:start + spec["length"] * dtype.itemsize].view(dtype)
+        self._stations = {int(station_id): spec for station_id, spec in header["stations"].items()}
+        self.model_version: Optional[str] = header.get("model_version")
+
+    def station_ids(self) -> list:
+        """
+        Returns:
+            list: The ids of the stations stored in the file.
+        """
+        return sorted(self._stations)
+
+    def get_forest(self, station_id: int) -> Optional[CompactForest]:
+        """
+        Get the forest of a station.
+
+        Parameters:
+            station_id (int): The unique identifier of the station.
+
+        Returns:
+            Optional[CompactForest]: The station forest, or None if the station is not in the file.
+        """
+        spec = self._stations.get(int(station_id))
+        if spec is None:
+            return None
+        root_start, n_trees, max_depth = spec
+        roots = self._arrays["roots"][root_start:root_start + n_trees]
+        return CompactForest(self._arrays, roots, max_depth)
+
+    def forest_nbytes(self, station_id: int) -> int:
+        """
+        Estimate the size of the nodes of a station forest.
+
+        Parameters:
+            station_id (int): The unique identifier of the station.
+
+        Returns:
+            int: The size in bytes of the station nodes (0 if the station is not in the file).
+        """
+        spec = self._stations.get(int(station_id))
+        if spec is None:
+            return 0
+        root_start, n_trees, _ = spec
+        roots = self._arrays["roots"]
+        first_node = int(roots[root_start])
+        end = root_start + n_trees
+        last_node = int(roots[end]) if end < len(roots) else len(self._arrays["value"])
+        bytes_per_node = sum(np.dtype(ARRAY_DTYPES[name]).itemsize for name in ARRAY_DTYPES if name != "roots")
+        return (last_node - first_node) * bytes_per_node
+
+
+_model_file: Optional[CompactModelFile] = None
+_model_file_lock = threading.Lock()
+
+
+def get_compact_model_file(path: str = None) -> Optional[CompactModelFile]:
+    """
+    Return the memory-mapped compact models file, opening it on first use and again when a new
+    export replaced it.
+
+    Parameters:
+        path (str): The path of the file. Defaults to get_compact_models_path().
+
+    Returns:
+        Optional[CompactModelFile]: The compact models file, or None if it does not exist.
+    """
+    global _model_file
+    path = path or get_compact_models_path()
+    with _model_file_lock:
+        file_id = get_file_id(path)
+        if file_id is None:
+            return None
+        if _model_file is None or _model_file.path != path or _model_file.file_id != file_id:
+            _model_file = CompactModelFile(path)
+            logger.info(f"Compact models file {path} opened (model version {_model_file.model_version or 'pickle_models'})")
+        return _model_file
+
+
+if __name__ == "__main__":
+    from DublinBikes.MachineLearning.model_registry import get_model_versions_folder, get_models_folder
+
+    parser = argparse.ArgumentParser(
+        description="Export the station pickle models to a single compact, memory-mappable file"
+    )
+    parser.add_argument(
+        "--models-folder", default=get_models_folder(), help="Folder containing the station pickle models"
+    )
+    parser.add_argument(
+        "--output", default=get_compact_models_path(), help="Path of the compact models file to write"
+    )
+    args = parser.parse_args()
+    models_folder = os.path.abspath(args.models_folder)
+    in_versions = os.path.dirname(models_folder) == os.path.abspath(get_model_versions_folder())
+    count = export_compact_models(models_folder, args.output, os.path.basename(models_folder) if in_versions else None)
+    print(f"Exported {count} station models to {args.output}")
@@ -0,0 +1,240 @@
+import argparse
+import datetime
+import os
+import pickle
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingRegressor
+
+"""
+Module: global_model
+--------------------
+This module trains and serves a single availability model for all the stations, as an alternative
+to the per-station pickle models.
+
+The global model receives the station as a categorical feature in addition to the time and weather
+features of the per-station models (see predict_availability.FEATURE_NAMES). It is a histogram
+gradient boosting regressor: its trees are much shallower than the per-station random forests,
+so one artifact of a few MB replaces the 115 pickle files (265 MB), and the predictions for any
+mix of stations are computed with a single vectorized predict call.
+
+Artifact (pickle_models/model_global.pkl), a dictionary with:
+    - "model": the fitted HistGradientBoostingRegressor.
+    - "station_index": station id -> category code used for the "station" feature.
+    - "feature_names": the names of the model columns ("station" first).
+    - "trained_at" and "validation_rmse": training metadata.
+
+Training (from the merged data CSV used by the training notebooks):
+    python -m DublinBikes.MachineLearning.global_model --data data/final_merged_data.csv
+
+Set PREDICTION_MODEL_TYPE = "global" in params.py to use it for the predictions.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def get_global_model_path() -> str:
+    """
+    Get the path of the global model artifact.
+
+    Returns:
+        str: The absolute path to "model_global.pkl" in the pickle_models folder.
+    """
+    from DublinBikes.MachineLearning.model_registry import get_base_models_folder
+
+    return os.path.join(get_base_models_folder(), "model_global.pkl")
+
+
+def load_training_csv(csv_path: str) -> pd.DataFrame:
+    """
+    Load the merged bikes and weather data used by the training notebooks.
+
+    As in the notebooks, the temperature and humidity are the mean of their daily max and min, the
+    day of the week comes from "last_reported" and the time of day from "hour" and "minute".
+
+    Parameters:
+        csv_path (str): The path of the merged data CSV.
+
+    Returns:
+        pd.DataFrame: One row per observation with the columns station_id, timestamp, temperature,
+                      humidity and bikes.
+    """
+    df = pd.read_csv(csv_path)
+    dates = pd.to_datetime(df["last_reported"]).dt.normalize()
+    return pd.DataFrame({
+        "station_id": df["station_id"].astype(int),
+        "timestamp": dates + pd.to_timedelta(df["hour"] * 60 + df["minute"], unit="min"),
+        "temperature": (df["max_air_temperature_celsius"] + df["min_air_temperature_celsius"]) / 2,
+        "humidity": (df["max_relative_humidity_percent"] + df["min_relative_humidity_percent"]) / 2,
+        "bikes": df["num_bikes_available"],
+    })
+
+
+def train_global_model(data: pd.DataFrame, max_iter: int = 300, validation_fraction: float = 0.2,
+                       random_state: int = 42) -> dict:
+    """
+    Train the global model on the observations of all the stations.
+
+    Parameters:
+        data (pd.DataFrame): Observations with the columns station_id, timestamp, temperature,
+                             humidity and bikes (see load_training_csv).
+        max_iter (int): The maximum number of boosting iterations.
+        validation_fraction (float): The share of the observations held out to compute the RMSE.
+        random_state (int): Seed of the train/validation split and of the model.
+
+    Returns:
+        dict: The model artifact (see the module documentation).
+    """
+    from DublinBikes.MachineLearning.predict_availability import FEATURE_NAMES, build_feature_matrix
+
+    data = data.dropna(subset=["timestamp", "temperature", "humidity", "bikes"])
+    station_ids = sorted(int(station_id) for station_id in data["station_id"].unique())
+    station_index = {station_id: i for i, station_id in enumerate(station_ids)}
+
+    features = build_feature_matrix(data["timestamp"], data["temperature"], data["humidity"])
+    codes = data["station_id"].astype(int).map(station_index).to_numpy(dtype=float)
+    X = np.column_stack([codes, features])
+    y = data["bikes"].to_numpy(dtype=float)
+
+    rng = np.random.default_rng(random_state)
+    is_validation = rng.random(len(y)) < validation_fraction
+    model = HistGradientBoostingRegressor(
+        max_iter=max_iter,
+        max_leaf_nodes=63,
+        categorical_features=[0],
+        early_stopping=False,
+        random_state=random_state,
+    )
+    model.fit(X[~is_validation], y[~is_validation])
+    rmse = float(np.sqrt(np.mean((model.predict(X[is_validation]) - y[is_validation]) ** 2)))
+    logger.info(f"Global model trained on {len(station_ids)} stations, validation RMSE {rmse:.2f}")
+
+    # Refit on all the observations now that the validation error is known.
+    model.fit(X, y)
+    return {
+        "model": model,
+        "station_index": station_index,
+        "feature_names": ["station"] + FEATURE_NAMES,
+        "trained_at": datetime.datetime.now().isoformat(),
+        "validation_rmse": rmse,
+    }
+
+
+def save_global_model(artifact: dict, path: str = None) -> None:
+    """
+    Save the global model artifact, replacing the previous one atomically.
+
+    Parameters:
+        artifact (dict): The artifact returned by train_global_model.
+        path (str): The path of the artifact. Defaults to get_global_model_path().
+
+    Returns:
+        None
+    """
+    path = path or get_global_model_path()
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump(artifact, f)
+    os.replace(path + ".tmp", path)
+    logger.info(f"Global model saved to {path}")
+
+
+class GlobalModel:
+    """
+    The global availability model, predicting any mix of stations in one call.
+    """
+
+    def __init__(self, artifact: dict):
+        """
+        Parameters:
+            artifact (dict): The artifact returned by train_global_model.
+        """
+        self.model = artifact["model"]
+        self.station_index = artifact["station_index"]
+        self.metadata = {key: value for key, value in artifact.items() if key != "model"}
+
+    def station_ids(self) -> list:
+        """
+        Returns:
+            list: The ids of the stations known by the model.
+        """
+        return sorted(self.station_index)
+
+    def predict(self, station_ids, features: np.ndarray) -> np.ndarray:
+        """
+        Predict the number of available bikes for every row of a feature matrix.
+
+        Parameters:
+            station_ids (array-like): The station of each row.
+            features (np.ndarray): A (n, 10) matrix built with build_feature_matrix().
+
+        Returns:
+            np.ndarray: The raw predictions, one per row.
+
+        Raises:
+            ValueError: If a station was not part of the training data.
+        """
+        station_ids = np.asarray(station_ids, dtype=int)
+        unknown = set(station_ids.tolist()) - set(self.station_index)
+        if unknown:
+            raise ValueError(f"No global model data for stations {sorted(unknown)}")
+        codes = np.array([self.station_index[station_id] for station_id in station_ids.tolist()], dtype=float)
+        return self.model.predict(np.column_stack([codes, features]))
+
+
+def get_global_model_version() -> Optional[tuple]:
+    """
+    Return the version of the global model artifact, which changes whenever save_global_model
+    replaces it.
+
+    Returns:
+        Optional[tuple]: The inode and modification time of the artifact, or None if it does not exist.
+    """
+    try:
+        stat = os.stat(get_global_model_path())
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns)
+
+
+_global_model: Optional[GlobalModel] = None
+_global_model_version: Optional[tuple] = None
+_global_model_lock = threading.Lock()
+
+
+def get_global_model() -> GlobalModel:
+    """
+    Return the global model, loading it on first use and again when a new artifact was saved.
+
+    Returns:
+        GlobalModel: The global model.
+
+    Raises:
+        OSError: If the artifact cannot be read.
+    """
+    global _global_model, _global_model_version
+    with _global_model_lock:
+        version = get_global_model_version()
+        if _global_model is None or (version is not None and version != _global_model_version):
+            with open(get_global_model_path(), "rb") as f:
+                _global_model = GlobalModel(pickle.load(f))
+            _global_model_version = version
+            logger.info(f"Global model loaded (trained at {_global_model.metadata['trained_at']})")
+        return _global_model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the global availability model of all the stations")
+    parser.add_argument("--data", required=True, help="Path of the merged bikes and weather data CSV")
+    parser.add_argument("--output", default=None, help="Path of the artifact (default: pickle_models/model_global.pkl)")
+    parser.add_argument("--max-iter", type=int, default=300, help="Maximum number of boosting iterations")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    artifact = train_global_model(load_training_csv(args.data), max_iter=args.max_iter)
+    save_global_model(artifact, args.output)
+    print(f"Global model saved (validation RMSE {artifact['validation_rmse']:.2f})")
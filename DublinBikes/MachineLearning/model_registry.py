@@ -0,0 +1,301 @@
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from DublinBikes.Utils.params import MODEL_CACHE_MAX_MB, MODEL_FORMAT
+from DublinBikes.MachineLearning.compact_forest import get_compact_model_file, get_compact_models_path, get_file_id
+
+"""
+Module: model_registry
+----------------------
+This module keeps the deserialized station models in memory so that a prediction only pays for
+the model.predict call instead of reading and unpickling the model file on every request.
+
+The registry is bounded by a memory budget (MODEL_CACHE_MAX_MB in params.py). When loading a new
+model would exceed the budget, the least recently used models are evicted. The size of a model is
+estimated from the size of its pickle file, which is close to its in-memory footprint since the
+trees are stored as NumPy arrays (or from the size of its nodes for the compact models).
+
+The registry also keeps counters (hits, misses, evictions and time spent loading models) that can
+be read with get_registry_stats().
+
+The station models are read from the active model version written by train.py (model_versions/
+folder, "CURRENT" pointer file), or from the pickle_models folder if no version was trained yet.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def get_base_models_folder() -> str:
+    """
+    Get the absolute path to the folder containing the station pickle models shipped with the code.
+
+    Returns:
+        str: The absolute path to the "pickle_models" folder.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "pickle_models")
+
+
+def get_model_versions_folder() -> str:
+    """
+    Get the absolute path to the folder containing the model versions written by train.py.
+
+    Returns:
+        str: The absolute path to the "model_versions" folder.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_versions")
+
+
+def read_model_version_pointer(versions_folder: str) -> Optional[str]:
+    """
+    Read the name of the active model version of a versions folder.
+
+    Parameters:
+        versions_folder (str): The folder containing the versions and the "CURRENT" pointer file.
+
+    Returns:
+        Optional[str]: The active version, or None if no version was trained yet.
+    """
+    try:
+        with open(os.path.join(versions_folder, "CURRENT"), "r") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+_active_version: Tuple[Optional[tuple], Optional[str]] = (None, None)
+
+
+def get_active_model_version() -> Optional[str]:
+    """
+    Return the active model version, re-reading the pointer file only when it was replaced.
+
+    Returns:
+        Optional[str]: The active version, or None if no version was trained yet.
+    """
+    global _active_version
+    try:
+        stat = os.stat(os.path.join(get_model_versions_folder(), "CURRENT"))
+    except FileNotFoundError:
+        return None
+    file_id = (stat.st_ino, stat.st_mtime_ns)
+    if _active_version[0] != file_id:
+        _active_version = (file_id, read_model_version_pointer(get_model_versions_folder()))
+    return _active_version[1]
+
+
+def get_models_folder() -> str:
+    """
+    Get the absolute path to the folder containing the station pickle models in use.
+
+    This is the active version written by train.py if there is one, otherwise the "pickle_models"
+    folder shipped with the code.
+
+    Returns:
+        str: The absolute path to the folder of the station models.
+    """
+    version = get_active_model_version()
+    if version is None:
+        return get_base_models_folder()
+    return os.path.join(get_model_versions_folder(), version)
+
+
+def get_model_path(station_id: int) -> str:
+    """
+    Get the path to the pickle file of a station model.
+
+    Parameters:
+        station_id (int): The unique identifier of the station.
+
+    Returns:
+        str: The absolute path to "model_station_{station_id}.pkl".
+    """
+    return os.path.join(get_models_folder(), f"model_station_{station_id}.pkl")
+
+
+def load_station_model(station_id: int) -> Tuple[Any, int]:
+    """
+    Load a station model.
+
+    With MODEL_FORMAT = "compact", the model is a view on the memory-mapped compact models file
+    (see compact_forest.py). Otherwise, or if the station is not in the compact file, or if the file
+    was exported from another model version than the active one, the model is read from its pickle file.
+
+    Parameters:
+        station_id (int): The unique identifier of the station.
+
+    Returns:
+        Tuple[Any, int]: The model and its estimated size in bytes.
+
+    Raises:
+        OSError: If the pickle file cannot be read.
+        pickle.UnpicklingError: If the file does not contain a valid model.
+    """
+    if MODEL_FORMAT == "compact":
+        model_file = get_compact_model_file()
+        version = get_active_model_version()
+        if model_file is not None and model_file.model_version != version:
+            logger.warning(
+                f"Compact models exported from version {model_file.model_version or 'pickle_models'}, "
+                f"not the active version {version or 'pickle_models'}: loading the pickle file of station {station_id}"
+            )
+        else:
+            forest = model_file.get_forest(station_id) if model_file else None
+            if forest is not None:
+                return forest, model_file.forest_nbytes(station_id)
+            logger.warning(f"No compact model for station {station_id}, loading its pickle file")
+
+    model_path = get_model_path(station_id)
+    with open(model_path, "rb") as f:
+        model = pickle.load(f)
+    return model, os.path.getsize(model_path)
+
+
+class ModelRegistry:
+    """
+    Thread-safe LRU cache of deserialized models bounded by a memory budget.
+
+    Models are loaded on demand through the loader function, which returns the model together
+    with its estimated size in bytes. A model larger than the whole budget is still cached on its
+    own, so that it does not have to be reloaded for every prediction.
+    """
+
+    def __init__(self, max_bytes: int, loader: Callable[[Hashable], Tuple[Any, int]]):
+        """
+        Parameters:
+            max_bytes (int): The memory budget for the cached models, in bytes.
+            loader (Callable): Function receiving a model key and returning (model, size_in_bytes).
+        """
+        self.max_bytes = max_bytes
+        self._loader = loader
+        self._models: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes_cached = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._load_time = 0.0
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Return the model for the given key, loading it if it is not cached yet.
+
+        Parameters:
+            key (Hashable): The model key (e.g., the station id).
+
+        Returns:
+            Any: The deserialized model.
+
+        Raises:
+            Exception: Any error raised by the loader function.
+        """
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self._hits += 1
+                return self._models[key][0]
+            self._misses += 1
+
+        # Load outside of the lock so that predictions for cached models are not blocked.
+        start = time.perf_counter()
+        model, size = self._loader(key)
+        elapsed = time.perf_counter() - start
+        logger.info(f"Loaded model {key} ({size / 1e6:.1f} MB) in {elapsed:.3f}s")
+
+        with self._lock:
+            self._load_time += elapsed
+            if key in self._models:
+                # Another thread loaded the same model in the meantime.
+                self._models.move_to_end(key)
+                return self._models[key][0]
+            self._models[key] = (model, size)
+            self._bytes_cached += size
+            self._evict()
+        return model
+
+    def _evict(self) -> None:
+        """
+        Evict least recently used models until the cache fits in the memory budget.
+        The most recently used model is never evicted. Must be called with the lock held.
+        """
+        while self._bytes_cached > self.max_bytes and len(self._models) > 1:
+            key, (_, size) = self._models.popitem(last=False)
+            self._bytes_cached -= size
+            self._evictions += 1
+            logger.info(f"Evicted model {key} from the registry")
+
+    def clear(self) -> None:
+        """
+        Remove all the cached models. The counters are kept.
+        """
+        with self._lock:
+            self._models.clear()
+            self._bytes_cached = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the registry counters.
+
+        Returns:
+            Dict[str, Any]: hits, misses, hit_rate, evictions, load_time_seconds,
+                            models_cached, bytes_cached and max_bytes.
+        """
+        with self._lock:
+            requests = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / requests if requests else 0.0,
+                "evictions": self._evictions,
+                "load_time_seconds": self._load_time,
+                "models_cached": len(self._models),
+                "bytes_cached": self._bytes_cached,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Registry shared by all the requests handled by this process.
+_station_models = ModelRegistry(MODEL_CACHE_MAX_MB * 1024 * 1024, load_station_model)
+_station_models_version: Optional[tuple] = None
+
+
+def get_station_model(station_id: int) -> Any:
+    """
+    Return the model of a station, from memory if it was already loaded.
+
+    When train.py activates a new model version, or with MODEL_FORMAT = "compact" when the compact
+    models file is exported again, the registry is cleared so that the new models are loaded.
+
+    Parameters:
+        station_id (int): The unique identifier of the station.
+
+    Returns:
+        Any: The station model.
+
+    Raises:
+        ValueError: If the station id is not an integer.
+        Exception: If the station model cannot be loaded.
+    """
+    global _station_models_version
+    version = get_active_model_version()
+    compact_file_id = get_file_id(get_compact_models_path()) if MODEL_FORMAT == "compact" else None
+    if (version, compact_file_id) != _station_models_version:
+        _station_models.clear()
+        _station_models_version = (version, compact_file_id)
+        logger.info(f"Using station models version {version or 'pickle_models'}")
+    return _station_models.get(int(station_id))
+
+
+def get_registry_stats() -> Dict[str, Any]:
+    """
+    Return the hit/miss/eviction/load-time counters of the station model registry.
+
+    Returns:
+        Dict[str, Any]: The registry counters (see ModelRegistry.stats).
+    """
+    return _station_models.stats()
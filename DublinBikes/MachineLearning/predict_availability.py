@@ -1,19 +1,387 @@
 from flask import request, jsonify
-import pickle
 import numpy as np
 import pandas as pd
-import os
+
+from DublinBikes.Utils.params import (
+    PREDICTION_GRID_ENABLED,
+    PREDICTION_SERVER_ENABLED,
+    PREDICTION_MODEL_TYPE,
+    PREDICTION_CACHE_ENABLED,
+    PREDICTION_CACHE_SLOT_MINUTES,
+    PREDICTION_CACHE_TEMPERATURE_STEP,
+    PREDICTION_CACHE_HUMIDITY_STEP,
+    PREDICTION_CACHE_TTL_MINUTES,
+    PREDICTION_CACHE_MAX_ENTRIES,
+)
+from DublinBikes.Utils.ttl_cache import TTLCache
+from DublinBikes.MachineLearning.model_registry import get_active_model_version, get_station_model
+from DublinBikes.MachineLearning.global_model import get_global_model, get_global_model_version
+from DublinBikes.MachineLearning.prediction_grid import get_prediction_grid
+from DublinBikes.MachineLearning.prediction_server import PredictionServerUnavailable, get_prediction_client
 
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+# Feature names (and order) used when the station models were trained.
+FEATURE_NAMES = ['time_sin', 'time_cos', 'air_temperature_celsius', 'relative_humidity_percent', 
+                 'day_of_week_Tue', 'day_of_week_Wed', 'day_of_week_Thu', 
+                 'day_of_week_Fri', 'day_of_week_Sat', 'day_of_week_Sun']
+
+
+def build_feature_matrix(timestamps, temperatures, humidities) -> np.ndarray:
+    """
+    Build the model feature matrix for several (timestamp, temperature, humidity) inputs at once.
+
+    The features are the same ones used during training:
+      - Cyclical time features (sine and cosine of the time of day).
+      - The temperature and relative humidity.
+      - One-hot encoded day-of-week features (with Monday as the baseline).
+
+    Parameters:
+        timestamps: Timestamps of the predictions (strings, datetimes or a pandas DatetimeIndex).
+        temperatures: Temperatures in Celsius, one per timestamp.
+        humidities: Relative humidities in percent, one per timestamp.
+
+    Returns:
+        np.ndarray: A (n, 10) float matrix with the columns in the order of FEATURE_NAMES.
+
+    Raises:
+        ValueError: If a timestamp cannot be parsed or the inputs have different lengths.
+    """
+    dt = pd.DatetimeIndex(pd.to_datetime(timestamps))
+    if dt.hasnans:
+        raise ValueError("Missing or invalid timestamp")
+    temperatures = np.asarray(temperatures, dtype=float)
+    humidities = np.asarray(humidities, dtype=float)
+    if not len(dt) == len(temperatures) == len(humidities):
+        raise ValueError("timestamps, temperatures and humidities must have the same length")
+
+    features = np.zeros((len(dt), len(FEATURE_NAMES)))
+    time_of_day = (dt.hour.to_numpy() * 60 + dt.minute.to_numpy()) / (24 * 60)
+    features[:, 0] = np.sin(2 * np.pi * time_of_day)
+    features[:, 1] = np.cos(2 * np.pi * time_of_day)
+    features[:, 2] = temperatures
+    features[:, 3] = humidities
+
+    # Monday = 0, Tuesday = 1, ... Sunday = 6: Tuesday is column 4, Sunday is column 9.
+    dow = dt.dayofweek.to_numpy()
+    not_monday = dow > 0
+    features[np.nonzero(not_monday)[0], 3 + dow[not_monday]] = 1
+    return features
+
+
+def evaluate_station_model(station_id: int, features: np.ndarray) -> np.ndarray:
+    """
+    Evaluate the station model of this process on every row of a feature matrix.
+
+    The station model is evaluated once on the whole matrix. With PREDICTION_MODEL_TYPE = "global",
+    the global model of all the stations is used instead (see global_model.py).
+
+    Parameters:
+        station_id (int): The station whose model is used.
+        features (np.ndarray): A (n, 10) matrix built with build_feature_matrix().
+
+    Returns:
+        np.ndarray: The predicted number of bikes (truncated to integers), one per row.
+
+    Raises:
+        Exception: If the station model cannot be loaded or the prediction fails.
+    """
+    if PREDICTION_MODEL_TYPE == "global":
+        station_ids = np.full(len(features), int(station_id))
+        return np.trunc(get_global_model().predict(station_ids, features)).astype(int)
+
+    model = get_station_model(station_id)
+    features_df = pd.DataFrame(features, columns=FEATURE_NAMES)
+    return np.trunc(model.predict(features_df)).astype(int)
+
+
+def get_prediction_model_version() -> str:
+    """
+    Return the version of the models used for the predictions.
+
+    It changes when train.py activates a new version of the station models or, with
+    PREDICTION_MODEL_TYPE = "global", when a new global model is saved, so that the predictions
+    cached or precomputed (prediction grid) with the previous models are no longer used.
+
+    Returns:
+        str: The model type and its version, e.g. "station:20250403-021500-000000" ("station:pickle_models"
+             before the first version, "global:<inode>-<modification time>" for the global model).
+    """
+    if PREDICTION_MODEL_TYPE == "global":
+        version = get_global_model_version()
+        return f"global:{version[0]}-{version[1]}" if version else "global:missing"
+    return f"station:{get_active_model_version() or 'pickle_models'}"
+
+
+def predict_station_bikes(station_id: int, features: np.ndarray) -> np.ndarray:
+    """
+    Predict the number of available bikes at a station for every row of a feature matrix.
+
+    With PREDICTION_SERVER_ENABLED, the model is evaluated by the prediction server process (see
+    prediction_server.py), which batches the requests of all the web workers. If the server cannot
+    be reached, or if it is disabled, the model is evaluated in this process.
+
+    Parameters:
+        station_id (int): The station whose model is used.
+        features (np.ndarray): A (n, 10) matrix built with build_feature_matrix().
+
+    Returns:
+        np.ndarray: The predicted number of bikes (truncated to integers), one per row.
+
+    Raises:
+        Exception: If the station model cannot be loaded or the prediction fails.
+    """
+    if PREDICTION_SERVER_ENABLED:
+        try:
+            return get_prediction_client().predict(station_id, features)
+        except PredictionServerUnavailable as e:
+            logger.warning(f"{e}: predicting in this process")
+    return evaluate_station_model(station_id, features)
+
+
+def predict_bikes(station_id: int, timestamps: pd.DatetimeIndex, temperatures, humidities,
+                  features: np.ndarray) -> np.ndarray:
+    """
+    Predict the number of available bikes at a station, using the precomputed grid when possible.
+
+    Inputs found in the prediction grid (see prediction_grid.py) are answered with an array lookup.
+    The other ones (weather outside the grid range, missing grid or grid computed with other models)
+    are evaluated by the station model.
+
+    Parameters:
+        station_id (int): The station to predict.
+        timestamps (pd.DatetimeIndex): The prediction times.
+        temperatures: The temperatures, one per timestamp.
+        humidities: The relative humidities, one per timestamp.
+        features (np.ndarray): The feature matrix of the same inputs (see build_feature_matrix).
+
+    Returns:
+        np.ndarray: The predicted number of bikes, one per input.
+
+    Raises:
+        Exception: If the station model is needed and cannot be loaded, or if the prediction fails.
+    """
+    grid = get_prediction_grid(get_prediction_model_version()) if PREDICTION_GRID_ENABLED else None
+    if grid is None:
+        return predict_station_bikes(station_id, features)
+
+    predicted_bikes, found = grid.lookup(station_id, timestamps, temperatures, humidities)
+    if not found.all():
+        predicted_bikes[~found] = predict_station_bikes(station_id, features[~found])
+    return predicted_bikes
+
+
+def predict_all_stations(timestamp, temperature: float, humidity: float, bike_stands: dict) -> list:
+    """
+    Predict the availability of many stations at the same time and weather in a single pass.
+
+    The stations found in the precomputed prediction grid are answered with one vectorized lookup.
+    The remaining ones are evaluated with one predict call for all of them with the global model,
+    or with each station model otherwise. Stations without a model are returned with None values.
+
+    Parameters:
+        timestamp: The prediction time (string, datetime or pandas Timestamp).
+        temperature (float): The temperature in Celsius.
+        humidity (float): The relative humidity in percent.
+        bike_stands (dict): The total number of bike stands keyed by station_id.
+
+    Returns:
+        list: One dictionary per station (ordered by station_id) with station_id, available_bikes
+              and available_bike_stands.
+
+    Raises:
+        ValueError: If the timestamp cannot be parsed.
+    """
+    station_ids = sorted(bike_stands)
+    timestamps = pd.DatetimeIndex([timestamp])
+    features = build_feature_matrix(timestamps, [temperature], [humidity])
+
+    predicted_bikes = np.zeros(len(station_ids), dtype=int)
+    found = np.zeros(len(station_ids), dtype=bool)
+    grid = get_prediction_grid(get_prediction_model_version()) if PREDICTION_GRID_ENABLED else None
+    if grid is not None:
+        predicted_bikes, found = grid.lookup_stations(station_ids, timestamps[0], temperature, humidity)
+
+    missing = np.nonzero(~found)[0]
+    if len(missing) and PREDICTION_MODEL_TYPE == "global":
+        global_model = get_global_model()
+        missing = [i for i in missing if station_ids[i] in global_model.station_index]
+        if missing:
+            missing_ids = [station_ids[i] for i in missing]
+            raw = global_model.predict(missing_ids, np.repeat(features, len(missing), axis=0))
+            predicted_bikes[missing] = np.trunc(raw).astype(int)
+            found[missing] = True
+    elif len(missing):
+        for i in missing:
+            try:
+                predicted_bikes[i] = predict_station_bikes(station_ids[i], features)[0]
+                found[i] = True
+            except Exception as e:
+                logger.info(f"No prediction for station {station_ids[i]}: {e}")
+
+    stands = np.array([bike_stands[station_id] for station_id in station_ids])
+    bikes, free_stands = clamp_availability(predicted_bikes, stands)
+    return [
+        {
+            "station_id": int(station_id),
+            "available_bikes": int(bikes[i]) if found[i] else None,
+            "available_bike_stands": int(free_stands[i]) if found[i] else None,
+        }
+        for i, station_id in enumerate(station_ids)
+    ]
+
+
+def predict_station_curve(station_id: int, start, hours: int, slot_minutes: int, weather: list,
+                          bike_stands: int) -> list:
+    """
+    Predict the availability of a station for every time slot of the next hours in a single pass.
+
+    The forecast weather (one entry every 3 hours) is linearly interpolated onto the slots; slots
+    before the first or after the last forecast entry use the closest entry. The feature matrix of
+    all the slots is built at once and the station model is evaluated once (see predict_bikes).
+
+    Parameters:
+        station_id (int): The station to predict.
+        start: The start of the curve (string, datetime or pandas Timestamp), rounded up to a slot.
+        hours (int): The number of hours covered by the curve.
+        slot_minutes (int): The time between two points of the curve.
+        weather (list): Forecast entries with timestamp_weatherinfo, temp and humidity.
+        bike_stands (int): The total number of bike stands of the station.
+
+    Returns:
+        list: One dictionary per slot with timestamp, available_bikes and available_bike_stands.
+
+    Raises:
+        ValueError: If there is no weather entry or a timestamp cannot be parsed.
+        Exception: If the station model cannot be loaded or the prediction fails.
+    """
+    if not weather:
+        raise ValueError("No forecast weather to build the curve")
+    first_slot = pd.Timestamp(start).ceil(f"{slot_minutes}min")
+    timestamps = first_slot + pd.to_timedelta(np.arange(hours * 60 // slot_minutes) * slot_minutes, unit="min")
+
+    weather_times = pd.DatetimeIndex(pd.to_datetime([entry["timestamp_weatherinfo"] for entry in weather]))
+    weather_seconds = weather_times.asi8 / 1e9
+    slot_seconds = timestamps.asi8 / 1e9
+    temperatures = np.interp(slot_seconds, weather_seconds, [float(entry["temp"]) for entry in weather])
+    humidities = np.interp(slot_seconds, weather_seconds, [float(entry["humidity"]) for entry in weather])
+
+    features = build_feature_matrix(timestamps, temperatures, humidities)
+    predicted_bikes = predict_bikes(station_id, timestamps, temperatures, humidities, features)
+    bikes, stands = clamp_availability(predicted_bikes, bike_stands)
+    return [
+        {"timestamp": timestamp.isoformat(), "available_bikes": int(station_bikes), "available_bike_stands": int(station_stands)}
+        for timestamp, station_bikes, station_stands in zip(timestamps, bikes, stands)
+    ]
+
+
+def clamp_availability(predicted_bikes: np.ndarray, bike_stands: int):
+    """
+    Turn raw bike predictions into available bikes and available stands for a station.
+
+    The bikes are clamped to [0, bike_stands] and the stands are computed as bike_stands minus the
+    predicted bikes, also clamped to [0, bike_stands].
+
+    Parameters:
+        predicted_bikes (np.ndarray): Raw predictions returned by predict_station_bikes().
+        bike_stands (int): The total number of bike stands of the station (or an array with the
+                           bike stands of the station of each prediction).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The available bikes and the available stands.
+    """
+    bikes = np.clip(predicted_bikes, 0, bike_stands)
+    stands = np.clip(bike_stands - predicted_bikes, 0, bike_stands)
+    return bikes, stands
+
+
+# Predicted bikes of the ride predictions keyed by (model version, station_id, time slot, temperature,
+# humidity).
+_prediction_cache = TTLCache(PREDICTION_CACHE_MAX_ENTRIES, PREDICTION_CACHE_TTL_MINUTES * 60)
+
+
+def quantize_prediction_inputs(dt: pd.Timestamp, temperature: float, humidity: float):
+    """
+    Round the inputs of a ride prediction to the resolution of the prediction cache key.
+
+    The time is rounded down to its slot (PREDICTION_CACHE_SLOT_MINUTES) and the weather values to
+    the nearest step (PREDICTION_CACHE_TEMPERATURE_STEP and PREDICTION_CACHE_HUMIDITY_STEP), so that
+    nearly identical requests share the same cache entry. Only the key is rounded: the model is
+    still evaluated on the real inputs.
+
+    Parameters:
+        dt (pd.Timestamp): The prediction time.
+        temperature (float): The temperature in Celsius.
+        humidity (float): The relative humidity in percent.
+
+    Returns:
+        Tuple[pd.Timestamp, float, float]: The rounded time, temperature and humidity.
+    """
+    dt = dt.floor(f"{PREDICTION_CACHE_SLOT_MINUTES}min")
+    temperature = round(temperature / PREDICTION_CACHE_TEMPERATURE_STEP) * PREDICTION_CACHE_TEMPERATURE_STEP
+    humidity = round(humidity / PREDICTION_CACHE_HUMIDITY_STEP) * PREDICTION_CACHE_HUMIDITY_STEP
+    return dt, float(temperature), float(humidity)
+
+
+def predict_ride_bikes(station_id: int, dt: pd.Timestamp, temperature: float, humidity: float,
+                       features: np.ndarray) -> np.ndarray:
+    """
+    Predict the raw number of bikes of a station for a ride prediction, using the prediction cache.
+
+    The cache is keyed by the rounded inputs (see quantize_prediction_inputs) while a miss evaluates
+    the model on the real inputs, so a hit returns the prediction of the first request of its bucket.
+
+    Parameters:
+        station_id (int): The station to predict.
+        dt (pd.Timestamp): The prediction time.
+        temperature (float): The temperature in Celsius.
+        humidity (float): The relative humidity in percent.
+        features (np.ndarray): The (1, 10) feature matrix of the inputs.
+
+    Returns:
+        np.ndarray: The raw predicted bikes (one value).
+
+    Raises:
+        ValueError: If the station id is not an integer.
+        Exception: If the station model cannot be loaded or the prediction fails.
+    """
+    key = (get_prediction_model_version(), int(station_id),
+           *quantize_prediction_inputs(dt, temperature, humidity))
+    if PREDICTION_CACHE_ENABLED:
+        cached = _prediction_cache.get(key)
+        if cached is not None:
+            return cached
+    predicted_bikes = predict_bikes(station_id, pd.DatetimeIndex([dt]), [temperature], [humidity], features)
+    if PREDICTION_CACHE_ENABLED:
+        _prediction_cache.set(key, predicted_bikes)
+    return predicted_bikes
+
+
+def get_prediction_cache_stats() -> dict:
+    """
+    Return the hit/miss/eviction counters of the ride prediction cache.
+
+    Returns:
+        dict: The cache counters (see TTLCache.stats).
+    """
+    return _prediction_cache.stats()
+
+
 def prediction(data: dict, origin_station: dict, destination_station: dict):
     """
     Predict ride availability for both the origin and destination stations using station-specific ML models.
 
-    This function loads pre-trained models (stored as pickle files) for each station and uses input data to predict:
+    The predicted bikes of a station are cached under the inputs rounded to the resolution of the
+    prediction cache (15-minute slot, 1 degree, 5% humidity by default, see params.py): they are
+    reused by all the requests with the same rounded inputs until they expire. The model itself is
+    always evaluated on the real inputs.
+
+    On a cache miss, this function looks the prediction up in the precomputed prediction grid when the inputs are within
+    its range. Otherwise it gets the pre-trained model of each station from the model registry (which
+    keeps the unpickled models in memory) and uses input data to predict:
       - The number of available bikes at the origin station.
       - The number of available bike stands at the destination station.
       
@@ -69,6 +437,8 @@ def prediction(data: dict, origin_station: dict, destination_station: dict):
     # Convert timestamp string to a datetime object
     try:
         dt = pd.to_datetime(timestamp_str)
+        if dt is None or pd.isna(dt):
+            raise ValueError("missing timestamp")
     except Exception as e:
         logger.info(f"Timestamp parsing error: {e}")
         return jsonify({"error": f"Timestamp parsing error: {e}"}), 400
@@ -76,30 +446,8 @@ def prediction(data: dict, origin_station: dict, destination_station: dict):
     # Check that all arguments are present
     logger.info(f"Received data: {data}")
 
-
-    # Compute the features as used during training.
-    time_of_day = (dt.hour * 60 + dt.minute) / (24 * 60)
-    time_sin = np.sin(2 * np.pi * time_of_day)
-    time_cos = np.cos(2 * np.pi * time_of_day)
-
-    # Create one-hot encoded day-of-week features (drop Monday as baseline)
-    # Monday = 0, Tuesday = 1, ... Sunday = 6.
-    dow = dt.dayofweek  
-    # We create six dummy features for Tuesday-Sunday.
-    day_features = [0] * 6  
-    if dow > 0:
-        day_features[dow - 1] = 1
-
-    # Construct the full feature vector.
-    # The expected order: [time_sin, time_cos, temperature, humidity] + day-of-week dummies.
-    features = [time_sin, time_cos, temperature, humidity] + day_features
-    features = np.array(features).reshape(1, -1)
-    
-    # Convert to a DataFrame with the correct feature names.
-    feature_names = ['time_sin', 'time_cos', 'air_temperature_celsius', 'relative_humidity_percent', 
-                    'day_of_week_Tue', 'day_of_week_Wed', 'day_of_week_Thu', 
-                    'day_of_week_Fri', 'day_of_week_Sat', 'day_of_week_Sun']
-    features_df = pd.DataFrame(features, columns=feature_names)
+    # Compute the features as used during training (a single row, shared by both stations).
+    features = build_feature_matrix(pd.DatetimeIndex([dt]), [temperature], [humidity])
     
     predictions_dict = {}
     for station_predicted in ["origin_station_id", "destination_station_id"]:
@@ -108,41 +456,88 @@ def prediction(data: dict, origin_station: dict, destination_station: dict):
         if station_id is None:
             return jsonify({"error": f"Missing {station_predicted}"}), 400
 
-        # Define the path to the pickle file for this station.
-        model_path = os.path.join(os.path.dirname(__file__), "pickle_models", f"model_station_{station_id}.pkl")
-        
-        # Get the number of Stands for the station.
-        
-        try:
-            with open(model_path, "rb") as f:
-                model = pickle.load(f)
-        except Exception as e:
-            logger.info(f"Error loading model for station {station_id}: {e}")
-            return jsonify({"error": f"Could not load model for station {station_id}: {e}"}), 500
-
-        # Use the loaded model to predict the number of available bikes.
+        # Predict the number of available bikes (from the cache, the grid, or with the station model).
         try:
-            prediction = model.predict(features_df)
-            prediction_value = int(prediction[0])
+            predicted_bikes = predict_ride_bikes(station_id, dt, temperature, humidity, features)
             
             if station_predicted == "origin_station_id":
                 # We predict bikes: So we are OKay with getting the number of bikes available
-                prediction_value = max(0, prediction_value)
-                prediction_value = min(prediction_value, bike_stands_origin)
+                prediction_value = int(clamp_availability(predicted_bikes, bike_stands_origin)[0][0])
             else:
                 # We preidct the number of available bikes stands at the destination station.
-                prediction_value = int(bike_stands_destination - prediction_value)
-                prediction_value = max(0, prediction_value)
-                prediction_value = min(prediction_value, bike_stands_destination)
+                prediction_value = int(clamp_availability(predicted_bikes, bike_stands_destination)[1][0])
             
             predictions_dict[station_predicted] = prediction_value
             
             logger.info(f"Prediction: {prediction_value}")
+        except (OSError, ValueError) as e:
+            logger.info(f"Error loading model for station {station_id}: {e}")
+            return jsonify({"error": f"Could not load model for station {station_id}: {e}"}), 500
         except Exception as e:
             logger.info(f"Prediction error: {e}")
             return jsonify({"error": f"Prediction failed: {e}"}), 500
 
     # Return the prediction as JSON.
     logger.info(f"Final prediction: {predictions_dict}")
-    logger.info(jsonify({"prediction": predictions_dict}))
     return jsonify({"prediction": predictions_dict})
+
+
+def batch_prediction(queries: list, bike_stands: dict) -> list:
+    """
+    Predict the availability for many (station, timestamp, temperature, humidity) queries at once.
+
+    The queries are grouped by station and each station model is evaluated once on the feature
+    matrix of all its queries, instead of once per query. Queries found in the precomputed
+    prediction grid do not need the model at all.
+
+    Args:
+        queries (list): A list of dictionaries with the following keys:
+            - "station_id" (int): The station to predict.
+            - "timestamp" (str): The prediction time (e.g., "2025-04-02 14:30").
+            - "temperature" (float): The temperature at that time.
+            - "humidity" (float): The relative humidity at that time.
+        bike_stands (dict): The total number of bike stands of each queried station, keyed by station id.
+
+    Returns:
+        list: One dictionary per query, in the same order as the queries, with the keys
+              "station_id", "timestamp", "available_bikes" and "available_bike_stands".
+
+    Raises:
+        ValueError: If a query is missing a field or has an invalid value.
+        KeyError: If the number of bike stands of a queried station is unknown.
+        Exception: If a station model cannot be loaded or if the prediction process fails.
+    """
+    station_ids, temperatures, humidities = [], [], []
+    for i, query in enumerate(queries):
+        try:
+            station_ids.append(int(query["station_id"]))
+            temperatures.append(float(query["temperature"]))
+            humidities.append(float(query["humidity"]))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Query {i} must have a station_id, a temperature and a humidity")
+    timestamps = [query.get("timestamp") for query in queries]
+    features = build_feature_matrix(timestamps, temperatures, humidities)
+    dt = pd.DatetimeIndex(pd.to_datetime(timestamps))
+    temperatures = np.asarray(temperatures)
+    humidities = np.asarray(humidities)
+
+    # Group the query positions by station: one model evaluation per station.
+    rows_by_station = {}
+    for i, station_id in enumerate(station_ids):
+        rows_by_station.setdefault(station_id, []).append(i)
+
+    results = [None] * len(queries)
+    for station_id, rows in rows_by_station.items():
+        predicted_bikes = predict_bikes(
+            station_id, dt[rows], temperatures[rows], humidities[rows], features[rows]
+        )
+        bikes, stands = clamp_availability(predicted_bikes, bike_stands[station_id])
+        for row, station_bikes, station_stands in zip(rows, bikes, stands):
+            results[row] = {
+                "station_id": station_id,
+                "timestamp": timestamps[row],
+                "available_bikes": int(station_bikes),
+                "available_bike_stands": int(station_stands),
+            }
+    logger.info(f"Batch prediction: {len(queries)} queries for {len(rows_by_station)} stations")
+    return results
@@ -0,0 +1,300 @@
+import datetime
+import json
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from DublinBikes.Utils.params import (
+    PREDICTION_GRID_SLOT_MINUTES,
+    PREDICTION_GRID_TEMPERATURES,
+    PREDICTION_GRID_HUMIDITIES,
+)
+
+"""
+Module: prediction_grid
+-----------------------
+This module precomputes the predictions of every station model on a grid of inputs, so that the
+most common ride predictions are answered with an array lookup instead of a model evaluation.
+
+The station models only depend on the time of day, the day of the week, the temperature and the
+humidity. The time features repeat every week, so the grid covers one full week (the next 7 days
+and any later date) in slots of PREDICTION_GRID_SLOT_MINUTES, for the binned temperature and
+humidity values defined in params.py.
+
+Files:
+    - prediction_grid.npy: int16 array of shape (stations, week slots, temperatures, humidities)
+      holding the raw predicted bikes (as returned by predict_station_bikes).
+    - prediction_grid.json: the station order, the axes of the grid and the version of the models
+      it was computed with (see predict_availability.get_prediction_model_version).
+
+Run the precompute job every night (and after retraining the models):
+    python -m DublinBikes.MachineLearning.prediction_grid
+
+Queries outside the temperature or humidity range of the grid, or for stations not in the grid,
+are not found in the grid and must be answered with live inference. The grid is not used at all
+once train.py activates other models than those it was computed with, until it is computed again.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Any Monday: the week slots of the grid are computed from this date.
+REFERENCE_MONDAY = pd.Timestamp("2024-01-01")
+
+
+def get_grid_paths() -> tuple:
+    """
+    Get the paths of the grid array and of its metadata file.
+
+    Returns:
+        tuple: The absolute paths of "prediction_grid.npy" and "prediction_grid.json".
+    """
+    base = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prediction_grid")
+    return base + ".npy", base + ".json"
+
+
+def grid_axis(start: float, stop: float, step: float) -> np.ndarray:
+    """
+    Build the values of a weather axis of the grid (both ends included).
+
+    Parameters:
+        start (float): The first value.
+        stop (float): The last value.
+        step (float): The distance between two values.
+
+    Returns:
+        np.ndarray: The axis values.
+    """
+    return start + step * np.arange(int(round((stop - start) / step)) + 1)
+
+
+def build_prediction_grid(station_ids: list, predict_fn, model_version: Optional[str] = None) -> dict:
+    """
+    Evaluate the station models on every (week slot, temperature, humidity) combination.
+
+    Parameters:
+        station_ids (list): The stations to include in the grid.
+        predict_fn (Callable): Function (station_id, features) -> raw predicted bikes, usually
+                               predict_availability.predict_station_bikes.
+        model_version (Optional[str]): The version of the models evaluated by predict_fn (see
+                                       predict_availability.get_prediction_model_version).
+
+    Returns:
+        dict: "grid" (the int16 array) and "metadata" (the station order, grid axes and model version).
+    """
+    from DublinBikes.MachineLearning.predict_availability import build_feature_matrix
+
+    slot_minutes = PREDICTION_GRID_SLOT_MINUTES
+    n_slots = 7 * 24 * 60 // slot_minutes
+    temperatures = grid_axis(*PREDICTION_GRID_TEMPERATURES)
+    humidities = grid_axis(*PREDICTION_GRID_HUMIDITIES)
+
+    # All the combinations, ordered as the grid axes (slot, temperature, humidity).
+    slots = REFERENCE_MONDAY + pd.to_timedelta(np.arange(n_slots) * slot_minutes, unit="min")
+    slot_idx, temp_idx, hum_idx = np.meshgrid(
+        np.arange(n_slots), np.arange(len(temperatures)), np.arange(len(humidities)), indexing="ij"
+    )
+    features = build_feature_matrix(
+        slots[slot_idx.ravel()], temperatures[temp_idx.ravel()], humidities[hum_idx.ravel()]
+    )
+
+    grid = np.zeros((len(station_ids), n_slots, len(temperatures), len(humidities)), dtype=np.int16)
+    for i, station_id in enumerate(station_ids):
+        grid[i] = predict_fn(station_id, features).reshape(grid.shape[1:])
+        logger.info(f"Prediction grid computed for station {station_id}")
+
+    metadata = {
+        "station_ids": [int(station_id) for station_id in station_ids],
+        "slot_minutes": slot_minutes,
+        "temperatures": list(PREDICTION_GRID_TEMPERATURES),
+        "humidities": list(PREDICTION_GRID_HUMIDITIES),
+        "generated_at": datetime.datetime.now().isoformat(),
+        "model_version": model_version,
+    }
+    return {"grid": grid, "metadata": metadata}
+
+
+def save_prediction_grid(grid: np.ndarray, metadata: dict) -> None:
+    """
+    Save the grid and its metadata, replacing the previous files atomically.
+
+    Parameters:
+        grid (np.ndarray): The grid returned by build_prediction_grid.
+        metadata (dict): The metadata returned by build_prediction_grid.
+
+    Returns:
+        None
+    """
+    grid_path, metadata_path = get_grid_paths()
+    with open(grid_path + ".tmp", "wb") as f:
+        np.save(f, grid)
+    with open(metadata_path + ".tmp", "w") as f:
+        json.dump(metadata, f)
+    os.replace(grid_path + ".tmp", grid_path)
+    # The metadata file is replaced last: its modification time tells readers to reload the grid.
+    os.replace(metadata_path + ".tmp", metadata_path)
+    logger.info(f"Prediction grid saved to {grid_path}")
+
+
+class PredictionGrid:
+    """
+    A memory-mapped prediction grid with vectorized lookups.
+    """
+
+    def __init__(self, grid: np.ndarray, metadata: dict):
+        """
+        Parameters:
+            grid (np.ndarray): The (stations, week slots, temperatures, humidities) array.
+            metadata (dict): The station order, grid axes and model version.
+        """
+        self.grid = grid
+        self.metadata = metadata
+        self.model_version = metadata.get("model_version")
+        self.slot_minutes = metadata["slot_minutes"]
+        self.station_index = {station_id: i for i, station_id in enumerate(metadata["station_ids"])}
+        self.temperature_start, self.temperature_stop, self.temperature_step = metadata["temperatures"]
+        self.humidity_start, self.humidity_stop, self.humidity_step = metadata["humidities"]
+
+    def lookup(self, station_id: int, timestamps, temperatures, humidities):
+        """
+        Look up the raw predicted bikes of a station for several inputs.
+
+        The timestamp is rounded to the nearest slot and the weather values to the nearest bin.
+
+        Parameters:
+            station_id (int): The unique identifier of the station.
+            timestamps (pd.DatetimeIndex): The prediction times.
+            temperatures (array-like): The temperatures, one per timestamp.
+            humidities (array-like): The relative humidities, one per timestamp.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The predicted bikes and a boolean mask telling which
+                                           inputs were found in the grid (the others are 0).
+        """
+        n = len(timestamps)
+        station = self.station_index.get(int(station_id))
+        if station is None:
+            return np.zeros(n, dtype=int), np.zeros(n, dtype=bool)
+
+        temp_pos = (np.asarray(temperatures, dtype=float) - self.temperature_start) / self.temperature_step
+        hum_pos = (np.asarray(humidities, dtype=float) - self.humidity_start) / self.humidity_step
+        temp_idx = np.rint(temp_pos).astype(int)
+        hum_idx = np.rint(hum_pos).astype(int)
+        found = (
+            (temp_idx >= 0) & (temp_idx < self.grid.shape[2])
+            & (hum_idx >= 0) & (hum_idx < self.grid.shape[3])
+        )
+
+        minutes = (timestamps.dayofweek.to_numpy() * 24 + timestamps.hour.to_numpy()) * 60 + timestamps.minute.to_numpy()
+        slot_idx = np.rint(minutes / self.slot_minutes).astype(int) % self.grid.shape[1]
+
+        values = np.zeros(n, dtype=int)
+        values[found] = self.grid[station, slot_idx[found], temp_idx[found], hum_idx[found]]
+        return values, found
+
+    def lookup_stations(self, station_ids: list, timestamp: pd.Timestamp, temperature: float, humidity: float):
+        """
+        Look up the raw predicted bikes of several stations for the same input.
+
+        Parameters:
+            station_ids (list): The unique identifiers of the stations.
+            timestamp (pd.Timestamp): The prediction time.
+            temperature (float): The temperature.
+            humidity (float): The relative humidity.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The predicted bikes of each station and a boolean mask
+                                           telling which stations were found in the grid.
+        """
+        n = len(station_ids)
+        temp_idx = int(np.rint((temperature - self.temperature_start) / self.temperature_step))
+        hum_idx = int(np.rint((humidity - self.humidity_start) / self.humidity_step))
+        if not (0 <= temp_idx < self.grid.shape[2] and 0 <= hum_idx < self.grid.shape[3]):
+            return np.zeros(n, dtype=int), np.zeros(n, dtype=bool)
+
+        minutes = (timestamp.dayofweek * 24 + timestamp.hour) * 60 + timestamp.minute
+        slot_idx = int(np.rint(minutes / self.slot_minutes)) % self.grid.shape[1]
+        stations = np.array([self.station_index.get(int(station_id), -1) for station_id in station_ids], dtype=int)
+        found = stations >= 0
+
+        values = np.zeros(n, dtype=int)
+        values[found] = self.grid[stations[found], slot_idx, temp_idx, hum_idx]
+        return values, found
+
+
+_grid: Optional[PredictionGrid] = None
+_grid_mtime: Optional[float] = None
+_grid_lock = threading.Lock()
+# The (grid, model version) pair already reported as not matching, so that it is logged only once.
+_stale_grid_warning: Optional[tuple] = None
+
+
+def get_prediction_grid(model_version: Optional[str] = None) -> Optional[PredictionGrid]:
+    """
+    Return the prediction grid, (re)loading it when the precompute job wrote a new one.
+
+    Parameters:
+        model_version (Optional[str]): The version of the models in use (see
+                                       predict_availability.get_prediction_model_version). A grid
+                                       computed with other models is not returned.
+
+    Returns:
+        Optional[PredictionGrid]: The grid, or None if it has not been computed yet (or not with
+                                  the models in use).
+    """
+    global _grid, _grid_mtime, _stale_grid_warning
+    grid_path, metadata_path = get_grid_paths()
+    try:
+        mtime = os.path.getmtime(metadata_path)
+    except OSError:
+        return None
+    with _grid_lock:
+        if _grid is None or mtime != _grid_mtime:
+            with open(metadata_path, "r") as f:
+                metadata = json.load(f)
+            _grid = PredictionGrid(np.load(grid_path, mmap_mode="r"), metadata)
+            _grid_mtime = mtime
+            logger.info(f"Prediction grid loaded (generated at {metadata['generated_at']})")
+        if model_version is not None and _grid.model_version != model_version:
+            if _stale_grid_warning != (_grid_mtime, model_version):
+                _stale_grid_warning = (_grid_mtime, model_version)
+                logger.warning(
+                    f"Prediction grid computed with models {_grid.model_version}, not {model_version}: "
+                    "not used until it is computed again"
+                )
+            return None
+        return _grid
+
+
+def main_precompute_grid() -> None:
+    """
+    Precompute the prediction grid for all the stations with a model (per-station pickle files, or
+    the stations of the global model) and save it.
+
+    Returns:
+        None
+    """
+    from DublinBikes.Utils.params import PREDICTION_MODEL_TYPE
+    from DublinBikes.MachineLearning.global_model import get_global_model
+    from DublinBikes.MachineLearning.model_registry import get_models_folder
+    from DublinBikes.MachineLearning.predict_availability import evaluate_station_model, get_prediction_model_version
+
+    if PREDICTION_MODEL_TYPE == "global":
+        station_ids = get_global_model().station_ids()
+    else:
+        station_ids = sorted(
+            int(name[len("model_station_"):-len(".pkl")])
+            for name in os.listdir(get_models_folder())
+            if name.startswith("model_station_") and name.endswith(".pkl")
+        )
+    result = build_prediction_grid(station_ids, evaluate_station_model, get_prediction_model_version())
+    save_prediction_grid(result["grid"], result["metadata"])
+
+
+if __name__ == "__main__":
+    main_precompute_grid()
@@ -0,0 +1,425 @@
+import argparse
+import os
+import queue
+import secrets
+import socket
+import stat
+import threading
+from multiprocessing.connection import AuthenticationError, Client, Listener, answer_challenge, deliver_challenge
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from DublinBikes.Utils.params import (
+    PREDICTION_SERVER_AUTHKEY,
+    PREDICTION_SERVER_SOCKET,
+    PREDICTION_SERVER_TIMEOUT_SECONDS,
+)
+
+"""
+Module: prediction_server
+-------------------------
+This module runs the station models in one dedicated local process shared by all the web workers.
+
+When the application runs with several worker processes, each worker that loads station models
+keeps its own copy of them in its model registry. With PREDICTION_SERVER_ENABLED = True in
+params.py, the workers send their model evaluations to the prediction server over a Unix socket
+instead, so the models are only loaded once, by the server.
+
+Server:
+    Start it before the web server:
+        python -m DublinBikes.MachineLearning.prediction_server
+
+    The socket is created in a private folder (mode 0700, owned by the user running the server),
+    and the clients must know the authentication key (see get_prediction_server_authkey): the
+    messages are pickled, so only the processes of the same user may connect.
+
+    Each client connection is handled by its own thread, which first runs the authentication
+    handshake (so that a client that never completes it only holds its own thread, and is
+    disconnected after PREDICTION_SERVER_TIMEOUT_SECONDS), then queues the requests. A single
+    batching thread takes all the queued requests at once, concatenates the features of the
+    requests for the same station and evaluates each station model once per batch. Under load,
+    the requests received while a batch is being evaluated form the next batch.
+
+Client:
+    predict_availability.predict_station_bikes() calls PredictionClient.predict(). Every thread
+    keeps its own connection to the server. If the server cannot be reached or does not reply
+    within the timeout, the client raises PredictionServerUnavailable and the prediction is
+    evaluated in the web worker.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionServerUnavailable(ConnectionError):
+    """
+    Raised by the client when the prediction server cannot be reached.
+    """
+
+
+def get_prediction_server_key_file() -> str:
+    """
+    Get the path of the file holding the generated authentication key, next to the models.
+
+    Returns:
+        str: The absolute path to "MachineLearning/prediction_server.key".
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "prediction_server.key")
+
+
+def get_prediction_server_authkey(key_file: str = None) -> bytes:
+    """
+    Get the key authenticating the clients of the prediction server.
+
+    The key is read from the PREDICTION_SERVER_AUTHKEY environment variable. Otherwise, a random key
+    is generated into the key file (readable by its owner only) by the first process needing it,
+    and read from it by the others.
+
+    Parameters:
+        key_file (str): The file of the generated key. Defaults to get_prediction_server_key_file().
+
+    Returns:
+        bytes: The authentication key.
+    """
+    if PREDICTION_SERVER_AUTHKEY:
+        return PREDICTION_SERVER_AUTHKEY.encode()
+    key_file = key_file or get_prediction_server_key_file()
+    try:
+        fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    with open(key_file, "r") as f:
+        key = f.read().strip()
+    if not key:
+        raise RuntimeError(f"Empty prediction server key file {key_file}")
+    return key.encode()
+
+
+def make_private_folder(folder: str) -> None:
+    """
+    Create the folder of the server socket, accessible by its owner only (mode 0700).
+
+    Parameters:
+        folder (str): The folder to create (or to check, if it exists).
+
+    Raises:
+        PermissionError: If the folder belongs to another user.
+    """
+    os.makedirs(folder, mode=0o700, exist_ok=True)
+    info = os.lstat(folder)
+    if not stat.S_ISDIR(info.st_mode) or (hasattr(os, "getuid") and info.st_uid != os.getuid()):
+        raise PermissionError(f"{folder} is not a folder of the current user")
+    if stat.S_IMODE(info.st_mode) != 0o700:
+        os.chmod(folder, 0o700)
+
+
+class _PendingRequest:
+    """
+    A model evaluation waiting to be processed by the batching thread.
+    """
+
+    def __init__(self, station_id: int, features: np.ndarray):
+        self.station_id = station_id
+        self.features = features
+        self.result: Optional[np.ndarray] = None
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+
+class PredictionServer:
+    """
+    Local server evaluating the station models for the web workers, batching concurrent requests.
+    """
+
+    def __init__(self, address: str, authkey: bytes, predict_fn: Callable[[int, np.ndarray], np.ndarray],
+                 handshake_timeout: float = PREDICTION_SERVER_TIMEOUT_SECONDS):
+        """
+        Parameters:
+            address (str): The path of the Unix socket to listen on.
+            authkey (bytes): The key the clients must use to connect.
+            predict_fn (Callable): Function (station_id, features) -> predicted bikes, evaluated
+                                   once per station and batch.
+            handshake_timeout (float): Seconds given to a new client to complete the authentication.
+        """
+        self.address = address
+        self._authkey = authkey
+        self._handshake_timeout = handshake_timeout
+        self._predict_fn = predict_fn
+        self._requests: "queue.Queue[Optional[_PendingRequest]]" = queue.Queue()
+        self._closed = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._requests_count = 0
+        self._batches_count = 0
+        self._evaluations_count = 0
+
+        make_private_folder(os.path.dirname(os.path.abspath(address)))
+        # A socket file left by a previous server would prevent the listener from binding.
+        if os.path.exists(address):
+            os.remove(address)
+        # No authkey for the listener: its accept() would run the handshake in the accept loop, where
+        # a client that never answers would block all the others. See _authenticate.
+        self._listener = Listener(address, family="AF_UNIX")
+        self._batcher = threading.Thread(target=self._process_batches, name="prediction-batcher", daemon=True)
+        self._batcher.start()
+
+    def serve_forever(self) -> None:
+        """
+        Accept client connections until close() is called.
+        """
+        logger.info(f"Prediction server listening on {self.address}")
+        while not self._closed.is_set():
+            try:
+                connection = self._listener.accept()
+            except OSError as e:
+                if self._closed.is_set():
+                    break
+                logger.warning(f"Failed to accept a prediction client: {e}")
+                continue
+            if self._closed.is_set():
+                connection.close()
+                break
+            threading.Thread(target=self._handle_connection, args=(connection,), daemon=True).start()
+
+    def close(self) -> None:
+        """
+        Stop accepting connections and stop the batching thread.
+        """
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        # Wake up the accept() call of serve_forever with a last (unauthenticated) connection.
+        try:
+            with socket.socket(socket.AF_UNIX) as wake_up:
+                wake_up.connect(self.address)
+        except OSError:
+            pass
+        self._listener.close()
+        self._requests.put(None)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the server counters.
+
+        Returns:
+            Dict[str, Any]: requests, batches and model evaluations processed so far.
+        """
+        with self._stats_lock:
+            return {
+                "requests": self._requests_count,
+                "batches": self._batches_count,
+                "model_evaluations": self._evaluations_count,
+            }
+
+    def _handle_connection(self, connection) -> None:
+        """
+        Answer the requests of one client connection until the client disconnects.
+
+        Requests are tuples: ("predict", station_id, features) or ("stats",).
+        Replies are tuples: ("ok", value) or ("error", exception).
+        """
+        with connection:
+            if not self._authenticate(connection):
+                return
+            while True:
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    return
+
+                if message[0] == "stats":
+                    reply = ("ok", self.stats())
+                elif message[0] == "predict":
+                    pending = _PendingRequest(int(message[1]), np.asarray(message[2], dtype=float))
+                    self._requests.put(pending)
+                    pending.done.wait()
+                    reply = ("error", pending.error) if pending.error is not None else ("ok", pending.result)
+                else:
+                    reply = ("error", ValueError(f"Unknown request {message[0]!r}"))
+
+                try:
+                    connection.send(reply)
+                except (OSError, ValueError):
+                    return
+
+    def _authenticate(self, connection) -> bool:
+        """
+        Run the authentication handshake of a new client connection (as Listener.accept does with
+        an authkey), shutting the socket down if it is not completed within the handshake timeout.
+
+        Returns:
+            bool: True if the client knows the key.
+        """
+        def shutdown() -> None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        # A duplicate of the connection socket, to wake up the handshake if the client is silent.
+        with socket.fromfd(connection.fileno(), socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            timer = threading.Timer(self._handshake_timeout, shutdown)
+            timer.start()
+            try:
+                deliver_challenge(connection, self._authkey)
+                answer_challenge(connection, self._authkey)
+            except (AuthenticationError, EOFError, OSError) as e:
+                logger.warning(f"Rejected prediction client: {e}")
+                return False
+            finally:
+                timer.cancel()
+        return True
+
+    def _process_batches(self) -> None:
+        """
+        Evaluate the queued requests, one model evaluation per station and batch.
+        """
+        while True:
+            pending = self._requests.get()
+            if pending is None:
+                return
+            batch = [pending]
+            # Take everything that was queued while the previous batch was being evaluated.
+            while True:
+                try:
+                    pending = self._requests.get_nowait()
+                except queue.Empty:
+                    break
+                if pending is None:
+                    self._requests.put(None)
+                    break
+                batch.append(pending)
+
+            by_station: Dict[int, list] = {}
+            for pending in batch:
+                by_station.setdefault(pending.station_id, []).append(pending)
+
+            for station_id, requests in by_station.items():
+                try:
+                    features = np.concatenate([pending.features for pending in requests])
+                    predictions = self._predict_fn(station_id, features)
+                    split_at = np.cumsum([len(pending.features) for pending in requests])[:-1]
+                    for pending, result in zip(requests, np.split(predictions, split_at)):
+                        pending.result = result
+                except Exception as e:
+                    logger.info(f"Prediction error for station {station_id}: {e}")
+                    for pending in requests:
+                        pending.error = e
+                for pending in requests:
+                    pending.done.set()
+
+            with self._stats_lock:
+                self._requests_count += len(batch)
+                self._batches_count += 1
+                self._evaluations_count += len(by_station)
+
+
+class PredictionClient:
+    """
+    Client of the prediction server. Each thread uses its own connection, opened on first use.
+    """
+
+    def __init__(self, address: str, authkey: bytes, timeout: float = PREDICTION_SERVER_TIMEOUT_SECONDS):
+        """
+        Parameters:
+            address (str): The path of the Unix socket of the server.
+            authkey (bytes): The key shared with the server.
+            timeout (float): The maximum time to wait for a reply, in seconds.
+        """
+        self.address = address
+        self._authkey = authkey
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _request(self, message: tuple) -> Any:
+        """
+        Send a request to the server and return the value of its reply.
+
+        Raises:
+            PredictionServerUnavailable: If the server cannot be reached or does not reply in time.
+            Exception: The error raised by the server while processing the request.
+        """
+        connection = getattr(self._local, "connection", None)
+        try:
+            if connection is None:
+                connection = Client(self.address, family="AF_UNIX", authkey=self._authkey)
+                self._local.connection = connection
+            connection.send(message)
+            # A late reply would be read as the reply of the next request: the connection is dropped.
+            if not connection.poll(self.timeout):
+                raise TimeoutError(f"no reply within {self.timeout}s")
+            status, value = connection.recv()
+        except (OSError, EOFError, AuthenticationError) as e:
+            # Drop the connection: the next request opens a new one (e.g. after a server restart).
+            if connection is not None:
+                connection.close()
+            self._local.connection = None
+            raise PredictionServerUnavailable(f"Prediction server at {self.address} unavailable: {e}") from e
+
+        if status == "error":
+            raise value
+        return value
+
+    def predict(self, station_id: int, features: np.ndarray) -> np.ndarray:
+        """
+        Evaluate a station model in the prediction server.
+
+        Parameters:
+            station_id (int): The station whose model is used.
+            features (np.ndarray): A (n, 10) matrix built with build_feature_matrix().
+
+        Returns:
+            np.ndarray: The predicted number of bikes, one per row.
+
+        Raises:
+            PredictionServerUnavailable: If the server cannot be reached or does not reply in time.
+            Exception: If the station model cannot be loaded or the prediction fails.
+        """
+        return self._request(("predict", int(station_id), np.asarray(features, dtype=float)))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the counters of the server (see PredictionServer.stats).
+        """
+        return self._request(("stats",))
+
+
+_client: Optional[PredictionClient] = None
+_client_lock = threading.Lock()
+
+
+def get_prediction_client() -> PredictionClient:
+    """
+    Return the client of the prediction server configured in params.py (created on first use).
+
+    Returns:
+        PredictionClient: The shared client (one connection per thread).
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = PredictionClient(PREDICTION_SERVER_SOCKET, get_prediction_server_authkey())
+        return _client
+
+
+if __name__ == "__main__":
+    from DublinBikes.MachineLearning.predict_availability import evaluate_station_model
+
+    parser = argparse.ArgumentParser(description="Run the station models in a dedicated prediction process")
+    parser.add_argument(
+        "--socket", default=PREDICTION_SERVER_SOCKET, help="Path of the Unix socket to listen on"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = PredictionServer(args.socket, get_prediction_server_authkey(), evaluate_station_model)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
@@ -0,0 +1,333 @@
+import argparse
+import datetime
+import json
+import os
+import pickle
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from DublinBikes.Utils.params import (
+    MODEL_TRAINING_WORKERS,
+    MODEL_TRAINING_MIN_OBSERVATIONS,
+    MODEL_VERSIONS_KEEP,
+)
+from DublinBikes.MachineLearning.model_registry import (
+    get_base_models_folder,
+    get_model_versions_folder,
+    read_model_version_pointer,
+)
+from DublinBikes.MachineLearning.training_data import (
+    get_station_watermarks,
+    load_station_observations,
+    load_weather_records,
+)
+
+"""
+Module: train
+-------------
+This module retrains the per-station models from the 'availability' and 'current' tables, in
+parallel on a pool of worker processes.
+
+Incremental retraining:
+    Every model version stores the watermark of each station (latest last_update and number of
+    availability records, see training_data.get_station_watermarks). Only the stations whose
+    watermark changed since the active version are retrained; the models of the other stations are
+    hard linked from the active version (or from pickle_models on the first run). The watermark of
+    the stations skipped for lack of observations is recorded too, in the manifest and in the
+    model_versions/skipped_watermarks.json file (kept even when the run creates no version), so that
+    they are only tried again once their data grows. A run that trains no station creates no version.
+
+Versioned output:
+    Each run writes a new version folder model_versions/<YYYYmmdd-HHMMSS-ffffff>/ containing the
+    station pickles and a manifest.json (watermarks, trained, skipped and failed stations). The
+    version is built in a hidden staging folder, renamed into place once complete, and then
+    activated by replacing the "CURRENT" pointer file. The web workers (see model_registry.py) switch to the new
+    version on their next prediction; a failed run leaves the active version untouched. Only the
+    last MODEL_VERSIONS_KEEP versions are kept.
+
+Usage:
+    python -m DublinBikes.MachineLearning.train [--full] [--workers N] [--stations ID ...]
+
+The compact models file (compact_forest.py) and the prediction grid (prediction_grid.py) are built
+from the station models: export them again after a new version is activated.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Weather records loaded once by each worker process (see _init_worker).
+_worker_weather: Optional[pd.DataFrame] = None
+
+
+def _init_worker() -> None:
+    """
+    Load the weather records shared by all the stations trained in a worker process.
+    """
+    global _worker_weather
+    _worker_weather = load_weather_records()
+
+
+def train_station_model(station_id: int, output_folder: str, min_observations: int) -> dict:
+    """
+    Train the model of a station and write its pickle file into the output folder.
+
+    The model is the random forest of the training notebooks, fitted on a DataFrame with the
+    FEATURE_NAMES columns so that it can be used by predict_availability as is.
+
+    Parameters:
+        station_id (int): The unique identifier of the station.
+        output_folder (str): The folder where "model_station_{station_id}.pkl" is written.
+        min_observations (int): Stations with fewer observations are skipped.
+
+    Returns:
+        dict: station_id, status ("trained" or "skipped") and the number of observations.
+    """
+    from DublinBikes.MachineLearning.predict_availability import FEATURE_NAMES, build_feature_matrix
+
+    observations = load_station_observations(station_id, _worker_weather)
+    if len(observations) < min_observations:
+        return {"station_id": station_id, "status": "skipped", "observations": len(observations)}
+
+    features = build_feature_matrix(
+        observations["timestamp"], observations["temperature"], observations["humidity"]
+    )
+    model = RandomForestRegressor(n_estimators=50, max_depth=15, random_state=42)
+    model.fit(pd.DataFrame(features, columns=FEATURE_NAMES), observations["bikes"].to_numpy(dtype=float))
+
+    # The previous model may be a hard link to the active version: replace the directory entry
+    # instead of writing into the linked file.
+    model_path = os.path.join(output_folder, f"model_station_{station_id}.pkl")
+    with open(model_path + ".tmp", "wb") as f:
+        pickle.dump(model, f)
+    os.replace(model_path + ".tmp", model_path)
+    return {"station_id": station_id, "status": "trained", "observations": len(observations)}
+
+
+def read_manifest(models_folder: str) -> dict:
+    """
+    Read the manifest of a model version.
+
+    Parameters:
+        models_folder (str): The folder of the version.
+
+    Returns:
+        dict: The manifest, or an empty dictionary for a folder without manifest (pickle_models).
+    """
+    try:
+        with open(os.path.join(models_folder, "manifest.json"), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def read_skipped_watermarks(versions_folder: str) -> dict:
+    """
+    Read the watermarks of the stations skipped for lack of observations.
+
+    Parameters:
+        versions_folder (str): The folder containing the versions.
+
+    Returns:
+        dict: The watermark of each skipped station, keyed by station id (as a string).
+    """
+    try:
+        with open(os.path.join(versions_folder, "skipped_watermarks.json"), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _write_skipped_watermarks(versions_folder: str, watermarks: dict) -> None:
+    """
+    Replace the skipped_watermarks.json file of the versions folder atomically.
+    """
+    path = os.path.join(versions_folder, "skipped_watermarks.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(watermarks, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _seed_models(source_folder: str, target_folder: str) -> None:
+    """
+    Hard link (or copy, across file systems) the station models of a version into a new one.
+    """
+    for name in os.listdir(source_folder):
+        if not (name.startswith("model_station_") and name.endswith(".pkl")):
+            continue
+        source, target = os.path.join(source_folder, name), os.path.join(target_folder, name)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+
+
+def _activate_version(versions_folder: str, version: str) -> None:
+    """
+    Point the "CURRENT" file of the versions folder to a version, replacing it atomically.
+    """
+    pointer = os.path.join(versions_folder, "CURRENT")
+    with open(pointer + ".tmp", "w") as f:
+        f.write(version)
+    os.replace(pointer + ".tmp", pointer)
+
+
+def prune_versions(versions_folder: str, keep: int) -> list:
+    """
+    Delete the oldest model versions, always keeping the active one.
+
+    Parameters:
+        versions_folder (str): The folder containing the versions.
+        keep (int): The number of versions to keep.
+
+    Returns:
+        list: The deleted versions.
+    """
+    active = read_model_version_pointer(versions_folder)
+    versions = sorted(
+        name for name in os.listdir(versions_folder)
+        if not name.startswith(".") and os.path.isdir(os.path.join(versions_folder, name))
+    )
+    deleted = [version for version in versions[:-keep] if version != active] if keep > 0 else []
+    for version in deleted:
+        shutil.rmtree(os.path.join(versions_folder, version))
+        logger.info(f"Deleted model version {version}")
+    return deleted
+
+
+def run_training(workers: Optional[int] = MODEL_TRAINING_WORKERS, full: bool = False, station_ids: list = None,
+                 min_observations: int = MODEL_TRAINING_MIN_OBSERVATIONS, versions_folder: str = None,
+                 base_folder: str = None, keep: int = MODEL_VERSIONS_KEEP) -> Optional[str]:
+    """
+    Retrain the station models whose data changed and activate the resulting model version.
+
+    Parameters:
+        workers (Optional[int]): The number of worker processes (None --> one per CPU).
+        full (bool): Retrain all the stations, even those whose data did not change.
+        station_ids (list): Only consider these stations (default: all the stations with data).
+        min_observations (int): Stations with fewer observations keep their previous model.
+        versions_folder (str): The folder of the versions. Defaults to get_model_versions_folder().
+        base_folder (str): The models used before the first version. Defaults to pickle_models.
+        keep (int): The number of versions to keep.
+
+    Returns:
+        Optional[str]: The new active version, or None if no station had to be retrained or no
+                       station could be trained.
+
+    Raises:
+        Exception: If the new version cannot be written (the active version is left untouched).
+    """
+    versions_folder = versions_folder or get_model_versions_folder()
+    base_folder = base_folder or get_base_models_folder()
+    os.makedirs(versions_folder, exist_ok=True)
+
+    previous_version = read_model_version_pointer(versions_folder)
+    previous_folder = os.path.join(versions_folder, previous_version) if previous_version else base_folder
+    previous_watermarks = read_manifest(previous_folder).get("watermarks", {})
+    skipped_watermarks = read_skipped_watermarks(versions_folder)
+
+    watermarks = get_station_watermarks()
+    if station_ids is not None:
+        selected = set(station_ids)
+        watermarks = {sid: wm for sid, wm in watermarks.items() if sid in selected}
+    changed = sorted(
+        sid for sid, wm in watermarks.items()
+        if full or wm not in (previous_watermarks.get(str(sid)), skipped_watermarks.get(str(sid)))
+    )
+    if not changed:
+        logger.info(f"Station models up to date (version {previous_version or 'pickle_models'})")
+        return None
+
+    version = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    staging_folder = os.path.join(versions_folder, f".staging-{version}")
+    os.makedirs(staging_folder)
+    try:
+        _seed_models(previous_folder, staging_folder)
+
+        results = {"trained": [], "skipped": [], "failed": {}}
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = {
+                pool.submit(train_station_model, sid, staging_folder, min_observations): sid for sid in changed
+            }
+            for future in as_completed(futures):
+                station_id = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Training failed for station {station_id}: {e}")
+                    results["failed"][str(station_id)] = str(e)
+                    continue
+                results[result["status"]].append(station_id)
+                logger.info(f"Station {station_id} {result['status']} ({result['observations']} observations)")
+
+        # Skipped stations are only tried again once their watermark changes (more observations),
+        # even if this run creates no version.
+        for station_id in results["trained"]:
+            skipped_watermarks.pop(str(station_id), None)
+        for station_id in results["skipped"]:
+            skipped_watermarks[str(station_id)] = watermarks[station_id]
+        _write_skipped_watermarks(versions_folder, skipped_watermarks)
+
+        # Nothing new to activate: keep the active version (and the models loaded by the web workers).
+        if not results["trained"]:
+            shutil.rmtree(staging_folder, ignore_errors=True)
+            logger.info(
+                f"No station model trained ({len(results['skipped'])} skipped, {len(results['failed'])} failed), "
+                f"version {previous_version or 'pickle_models'} kept"
+            )
+            return None
+
+        # Failed stations keep their previous watermark, so that they are retried. Skipped stations
+        # are only tried again once their watermark changes (more observations).
+        new_watermarks = dict(previous_watermarks)
+        for station_id in results["trained"] + results["skipped"]:
+            new_watermarks[str(station_id)] = watermarks[station_id]
+        manifest = {
+            "version": version,
+            "created_at": datetime.datetime.now().isoformat(),
+            "previous_version": previous_version,
+            "watermarks": new_watermarks,
+            "trained": sorted(results["trained"]),
+            "skipped": sorted(results["skipped"]),
+            "failed": results["failed"],
+        }
+        with open(os.path.join(staging_folder, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        os.rename(staging_folder, os.path.join(versions_folder, version))
+    except BaseException:
+        shutil.rmtree(staging_folder, ignore_errors=True)
+        raise
+
+    _activate_version(versions_folder, version)
+    logger.info(
+        f"Model version {version} activated: {len(results['trained'])} trained, "
+        f"{len(results['skipped'])} skipped, {len(results['failed'])} failed"
+    )
+    prune_versions(versions_folder, keep)
+    return version
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrain the station models whose availability data changed")
+    parser.add_argument("--full", action="store_true", help="Retrain all the stations")
+    parser.add_argument("--workers", type=int, default=MODEL_TRAINING_WORKERS, help="Number of worker processes")
+    parser.add_argument("--stations", type=int, nargs="+", default=None, help="Only retrain these stations")
+    parser.add_argument(
+        "--min-observations", type=int, default=MODEL_TRAINING_MIN_OBSERVATIONS,
+        help="Minimum number of observations to train a station model",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    new_version = run_training(args.workers, args.full, args.stations, args.min_observations)
+    if new_version is None:
+        print("Station models up to date, no new version")
+    else:
+        print(f"Model version {new_version} activated")
+        print("Export the compact models and precompute the prediction grid again to use the new models")
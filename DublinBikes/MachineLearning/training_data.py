@@ -0,0 +1,109 @@
+import datetime
+from typing import Dict, Optional
+
+import pandas as pd
+
+from DublinBikes.SqlCode.sql_utils import get_connection
+
+"""
+Module: training_data
+---------------------
+This module reads the training observations of the station models from the historical tables
+filled by the scraper (see DataMining): 'availability' (bikes of each station) and 'current'
+(weather).
+
+Each availability record is joined with the last weather record taken at most
+WEATHER_TOLERANCE before it, so that the observations have the same columns as the training
+notebooks: station_id, timestamp, temperature, humidity and bikes.
+
+The module also computes the watermark of each station (latest last_update and number of records),
+used by train.py to retrain only the stations whose data changed since the previous run.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Maximum time between an availability record and the weather record it is joined with.
+WEATHER_TOLERANCE = datetime.timedelta(hours=1)
+
+
+def get_station_watermarks() -> Dict[int, list]:
+    """
+    Compute the watermark of the availability data of every station.
+
+    Returns:
+        Dict[int, list]: [latest last_update, number of records] keyed by station_id.
+    """
+    query = """
+        SELECT station_id, MAX(last_update) AS last_update, COUNT(*) AS records
+        FROM availability
+        GROUP BY station_id;
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query)
+        return {row["station_id"]: [str(row["last_update"]), row["records"]] for row in cursor.fetchall()}
+
+
+def load_station_observations(station_id: int, weather: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Load the training observations of a station.
+
+    Parameters:
+        station_id (int): The unique identifier of the station.
+        weather (pd.DataFrame): The weather records (see load_weather_records). Read from the
+                                database if not given.
+
+    Returns:
+        pd.DataFrame: Observations with the columns station_id, timestamp, temperature, humidity
+                      and bikes, ordered by timestamp. Records without weather are left out.
+    """
+    query = """
+        SELECT station_id, last_update, available_bikes
+        FROM availability
+        WHERE station_id = ? AND available_bikes IS NOT NULL
+        ORDER BY last_update ASC;
+    """
+    with get_connection() as conn:
+        availability = pd.read_sql_query(query, conn, params=(int(station_id),))
+    if weather is None:
+        weather = load_weather_records()
+
+    availability["timestamp"] = pd.to_datetime(availability["last_update"])
+    observations = pd.merge_asof(
+        availability.sort_values("timestamp"),
+        weather,
+        left_on="timestamp",
+        right_on="dt",
+        direction="backward",
+        tolerance=pd.Timedelta(WEATHER_TOLERANCE),
+    )
+    observations = observations.dropna(subset=["temperature", "humidity"])
+    return pd.DataFrame({
+        "station_id": observations["station_id"].astype(int),
+        "timestamp": observations["timestamp"],
+        "temperature": observations["temperature"],
+        "humidity": observations["humidity"],
+        "bikes": observations["available_bikes"],
+    }).reset_index(drop=True)
+
+
+def load_weather_records() -> pd.DataFrame:
+    """
+    Load the historical weather records.
+
+    Returns:
+        pd.DataFrame: The columns dt, temperature and humidity, ordered by dt.
+    """
+    query = """
+        SELECT dt, temp AS temperature, humidity
+        FROM current
+        WHERE temp IS NOT NULL AND humidity IS NOT NULL
+        ORDER BY dt ASC;
+    """
+    with get_connection() as conn:
+        weather = pd.read_sql_query(query, conn)
+    weather["dt"] = pd.to_datetime(weather["dt"])
+    return weather.sort_values("dt")
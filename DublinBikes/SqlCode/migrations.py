@@ -0,0 +1,289 @@
+import sqlite3
+from typing import Callable, List, Tuple
+
+"""
+Module: migrations
+==================
+
+This module versions the schema of the SQLite database. The version of the schema is stored in the
+database itself (PRAGMA user_version), and the migrations newer than it are applied in order, each
+one in its own transaction together with the update of the version.
+
+Migrations:
+    1. Initial schema: the tables user, station, availability, current, FetchedWeatherData,
+       FetchedStationData and FetchedBikesData (databases created before the versioning already
+       have them: the statements are idempotent).
+    2. Indexes of the hot cache and history queries (see _migration_2_indexes).
+    3. Forecast cache keyed by fetch: the tables ForecastFetches and ForecastWeatherData (see
+       _migration_3_forecast_fetches).
+
+To change the schema, append a new migration to MIGRATIONS: never edit a migration that was
+released, since the existing databases will not apply it again.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _migration_1_initial_schema(conn: sqlite3.Connection) -> None:
+    """
+    Create the tables of the initial schema, if they do not exist.
+
+    A FetchedBikesData table with the previous schema (static station columns repeated in every
+    row) only holds cached API data: it is dropped and created again with the current schema.
+    """
+    sql_users_table = """
+    CREATE TABLE IF NOT EXISTS user (
+        email TEXT PRIMARY KEY,
+        username TEXT UNIQUE,
+        first_name TEXT,
+        last_name TEXT,
+        password TEXT,
+        default_station INTEGER
+    );
+    """
+
+    sql_station_table = """
+    CREATE TABLE IF NOT EXISTS station (
+        station_id INTEGER NOT NULL,
+        address VARCHAR(128),
+        banking INTEGER,
+        bonus INTEGER,
+        bike_stands INTEGER,
+        name VARCHAR(128),
+        position_lat FLOAT,
+        position_lng FLOAT,
+        PRIMARY KEY (station_id)
+    );
+    """
+
+    sql_availability_table = """
+    CREATE TABLE IF NOT EXISTS availability (
+        station_id INTEGER NOT NULL,
+        last_update DATETIME NOT NULL,
+        available_bikes INTEGER,
+        available_bike_stands INTEGER,
+        status VARCHAR(128),
+        PRIMARY KEY (station_id, last_update)
+    );
+    """
+
+    sql_current_table = """
+    CREATE TABLE IF NOT EXISTS current (
+        dt DATETIME NOT NULL,
+        feels_like FLOAT,
+        humidity INTEGER,
+        pressure INTEGER,
+        sunrise DATETIME,
+        sunset DATETIME,
+        temp FLOAT,
+        uvi FLOAT,
+        weather_id INTEGER,
+        wind_gust FLOAT,
+        wind_speed FLOAT,
+        rain_1h FLOAT,
+        snow_1h FLOAT,
+        PRIMARY KEY (dt)
+    );
+    """
+
+    sql_fetched_weather = """    
+    CREATE TABLE IF NOT EXISTS FetchedWeatherData (
+        timestamp_requested DATETIME NOT NULL,
+        timestamp_weatherinfo DATETIME NOT NULL,
+        forecast_type TEXT,         
+        target_datetime DATETIME,     
+        feels_like FLOAT, 
+        humidity INTEGER,
+        pressure INTEGER,
+        sunrise DATETIME,
+        sunset DATETIME,
+        temp FLOAT,
+        uvi FLOAT,
+        weather_id INTEGER,
+        wind_gust FLOAT,
+        wind_speed FLOAT,
+        rain_1h FLOAT,
+        snow_1h FLOAT,
+        PRIMARY KEY (timestamp_requested, timestamp_weatherinfo)
+    );
+    """
+
+    sql_fetched_stations = """
+    CREATE TABLE IF NOT EXISTS FetchedStationData (
+        station_id INTEGER NOT NULL,
+        address VARCHAR(128),
+        banking INTEGER,
+        bonus INTEGER,
+        bike_stands INTEGER,
+        name VARCHAR(128),
+        position_lat FLOAT,
+        position_lng FLOAT,
+        PRIMARY KEY (station_id)
+    );
+    """
+
+    sql_fetched_bikes = """
+    CREATE TABLE IF NOT EXISTS FetchedBikesData (
+        time_requested DATETIME NOT NULL,
+        station_id INTEGER NOT NULL,
+        available_bikes INTEGER,
+        available_bike_stands INTEGER,
+        status VARCHAR(128),
+        last_update DATETIME,
+        PRIMARY KEY (time_requested, station_id)
+    );
+    """
+
+    fetched_bikes_columns = [row[1] for row in conn.execute("PRAGMA table_info(FetchedBikesData);")]
+    if "address" in fetched_bikes_columns:
+        logger.info("Dropping the cache table FetchedBikesData with the previous schema.")
+        conn.execute("DROP TABLE FetchedBikesData;")
+
+    for statement in (
+        sql_users_table,
+        sql_station_table,
+        sql_availability_table,
+        sql_current_table,
+        sql_fetched_weather,
+        sql_fetched_stations,
+        sql_fetched_bikes,
+    ):
+        conn.execute(statement)
+
+
+def _migration_2_indexes(conn: sqlite3.Connection) -> None:
+    """
+    Add the indexes of the hot cache and history queries.
+
+    The primary keys already serve the latest bikes fetch (FetchedBikesData by time_requested), the
+    cache cleaning and the history of a station (availability by station_id and last_update). The
+    new indexes cover:
+      - the latest bikes fetch of a station (station_id = ? ORDER BY last_update DESC).
+      - the daily availability of a station, without reading the table rows.
+      - the cached current weather and forecast series (forecast_type = ? AND timestamp_requested >= ?),
+        with the columns of the forecast series.
+      - the cached forecast around a target time (forecast_type = ? AND timestamp_weatherinfo
+        BETWEEN ? AND ?).
+    """
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_fetched_bikes_station_update
+        ON FetchedBikesData (station_id, last_update);
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_availability_station_update
+        ON availability (station_id, last_update, available_bikes, available_bike_stands);
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_fetched_weather_type_requested
+        ON FetchedWeatherData (forecast_type, timestamp_requested, timestamp_weatherinfo, temp, humidity);
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_fetched_weather_type_info
+        ON FetchedWeatherData (forecast_type, timestamp_weatherinfo, timestamp_requested);
+    """)
+
+
+def _migration_3_forecast_fetches(conn: sqlite3.Connection) -> None:
+    """
+    Store the cached forecasts once per API fetch instead of once per requested target time.
+
+    Each fetch of a forecast is a row of ForecastFetches: its fetch_id is the generation of the
+    forecast (increasing with each fetch), valid_until is the time until which it is used for every
+    target time, and first_weatherinfo/last_weatherinfo is the time range covered by its entries.
+    The entries of a fetch are the rows of ForecastWeatherData with its fetch_id.
+
+    The forecast rows of FetchedWeatherData (copies of the forecast per requested target time) are
+    deleted, and so is the index of the old lookup around a target time: FetchedWeatherData now
+    only caches the current weather.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ForecastFetches (
+            fetch_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            forecast_type TEXT NOT NULL,
+            fetched_at DATETIME NOT NULL,
+            valid_until DATETIME NOT NULL,
+            first_weatherinfo DATETIME NOT NULL,
+            last_weatherinfo DATETIME NOT NULL
+        );
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_forecast_fetches_type_valid
+        ON ForecastFetches (forecast_type, valid_until);
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ForecastWeatherData (
+            fetch_id INTEGER NOT NULL,
+            timestamp_weatherinfo DATETIME NOT NULL,
+            feels_like FLOAT,
+            humidity INTEGER,
+            pressure INTEGER,
+            temp FLOAT,
+            weather_id TEXT,
+            wind_gust FLOAT,
+            wind_speed FLOAT,
+            rain_3h FLOAT,
+            snow_3h FLOAT,
+            PRIMARY KEY (fetch_id, timestamp_weatherinfo)
+        ) WITHOUT ROWID;
+    """)
+    conn.execute("DELETE FROM FetchedWeatherData WHERE forecast_type <> 'current';")
+    conn.execute("DROP INDEX IF EXISTS idx_fetched_weather_type_info;")
+
+
+# Ordered migrations: (schema version, function applying it).
+MIGRATIONS: List[Tuple[int, Callable[[sqlite3.Connection], None]]] = [
+    (1, _migration_1_initial_schema),
+    (2, _migration_2_indexes),
+    (3, _migration_3_forecast_fetches),
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """
+    Get the version of the schema of a database.
+
+    Parameters:
+        conn (sqlite3.Connection): The database connection.
+
+    Returns:
+        int: The version of the last migration applied (0 for a new or unversioned database).
+    """
+    return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+
+def migrate_database(conn: sqlite3.Connection) -> int:
+    """
+    Apply the migrations newer than the schema version of the database, in order.
+
+    Each migration runs in an IMMEDIATE transaction (which blocks the other writers) together
+    with the update of the version, so that a failed migration leaves the previous version intact
+    and concurrent processes apply each migration once.
+
+    Parameters:
+        conn (sqlite3.Connection): The database connection (without a pending transaction).
+
+    Returns:
+        int: The schema version after the migrations.
+
+    Raises:
+        sqlite3.Error: If a migration fails (it is rolled back).
+    """
+    if conn.in_transaction:
+        conn.commit()
+    for version, migration in MIGRATIONS:
+        if get_schema_version(conn) >= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            # Another process may have applied it while this one waited for the lock.
+            if get_schema_version(conn) < version:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {int(version)};")
+                logger.info(f"Database schema migrated to version {version} ({migration.__name__})")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return get_schema_version(conn)
@@ -1,6 +1,10 @@
 import os
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
 from DublinBikes.Utils.params import *
+from DublinBikes.SqlCode.migrations import migrate_database
 
 """
 Module: sql_utils
@@ -11,9 +15,13 @@ executing SQL commands, and creating the database schema for the Dublin Bikes pr
 
 Functions:
     - get_db_path: Returns the absolute path to the SQLite database file.
-    - get_sql_engine: Creates and returns a SQLite connection configured to allow row access by column name.
+    - get_connection: Context manager checking out a connection of the pool shared by the threads,
+      committing or rolling back its transaction and returning it to the pool on exit.
+    - close_connections: Closes the idle connections of the pool.
+    - get_sql_engine: Creates and returns a new SQLite connection configured to allow row access by column name
+      (closed by the caller, for the long-lived connections of the scraper).
     - execute_sql: Executes a given SQL command on the provided connection, printing query results or affected row counts.
-    - create_data_base: Creates all required tables if they do not already exist.
+    - create_data_base: Creates all required tables and indexes, applying the schema migrations (see migrations.py).
     - test_queries: Runs sample queries to verify the database setup.
 
 Note:
@@ -25,6 +33,21 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+# Idle connections shared by the threads of the process, at most SQLITE_POOL_SIZE (see get_connection).
+_pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=SQLITE_POOL_SIZE)
+_pool_pid = os.getpid()
+_pool_lock = threading.Lock()
+
+# Connection checked out by each thread: {"pid", "conn", "depth"} (nested get_connection calls).
+_thread_connections = threading.local()
+
+# Process whose database schema was migrated (see get_sql_engine).
+_migrated_pid = None
+_migration_lock = threading.Lock()
+
+# Connections inherited from the parent process after a fork: kept referenced, since closing them
+# in the child is not supported by SQLite.
+_inherited_connections = []
 
 
 def get_db_path() -> str:
@@ -41,12 +64,19 @@ def get_db_path() -> str:
     return os.path.join(data_folder, "db.sqlite3")
 
 
-def get_sql_engine() -> sqlite3.Connection:
+def get_sql_engine(check_same_thread: bool = True) -> sqlite3.Connection:
     """
-    Establish and return a connection to the SQLite database.
+    Establish and return a new connection to the SQLite database.
 
     If the database file does not exist, SQLite will automatically create it.
-    The connection is set with a row_factory so that rows can be accessed by column name.
+    The connection is set with a row_factory so that rows can be accessed by column name, and tuned
+    with the SQLITE_* pragmas of params.py. The first connection of each process applies the pending
+    schema migrations (see migrations.py). The caller must close it: prefer get_connection(), which
+    reuses the connections of the pool.
+
+    Parameters:
+        check_same_thread (bool): Only allow the thread that opened the connection to use it (False
+                                  for the pooled connections, used by one thread at a time).
 
     Returns:
         sqlite3.Connection: A connection to the SQLite database.
@@ -55,20 +85,135 @@ def get_sql_engine() -> sqlite3.Connection:
         sqlite3.Error: If there is an error connecting to the database.
     """
     db_path = get_db_path()
-    logger.info("Connecting to database at %s", db_path)
-
     try:
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS, check_same_thread=check_same_thread)
         conn.row_factory = sqlite3.Row
-        conn.execute("SELECT 1")  # Test the connection.
-        logger.info("Database connection established")
+        # WAL lets the readers run while the scraper or a cache refresh writes. The journal mode is
+        # stored in the database file; the other pragmas only apply to this connection.
+        conn.execute("PRAGMA journal_mode = WAL;")
+        conn.execute("PRAGMA synchronous = NORMAL;")
+        conn.execute(f"PRAGMA mmap_size = {int(SQLITE_MMAP_SIZE_BYTES)};")
+        conn.execute(f"PRAGMA cache_size = -{int(SQLITE_CACHE_SIZE_KB)};")
+        conn.execute("PRAGMA temp_store = MEMORY;")
     except sqlite3.Error as error:
-        logger.error("Failed to connect to database: %s", error)
+        logger.error("Failed to connect to database at %s: %s", db_path, error)
         raise
-
+    logger.debug("Database connection established at %s", db_path)
+
+    global _migrated_pid
+    if _migrated_pid != os.getpid():
+        with _migration_lock:
+            if _migrated_pid != os.getpid():
+                try:
+                    migrate_database(conn)
+                except sqlite3.Error:
+                    conn.close()
+                    raise
+                _migrated_pid = os.getpid()
     return conn
 
 
+def _get_pool() -> "queue.LifoQueue[sqlite3.Connection]":
+    """
+    Return the connection pool of this process (a process created by fork starts with an empty one).
+    """
+    global _pool, _pool_pid
+    if _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool_pid != os.getpid():
+                while True:
+                    try:
+                        _inherited_connections.append(_pool.get_nowait())
+                    except queue.Empty:
+                        break
+                _pool = queue.LifoQueue(maxsize=SQLITE_POOL_SIZE)
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def _release_connection(conn: sqlite3.Connection) -> None:
+    """
+    Return a checked out connection to the pool, or close it if the pool is full or the connection
+    is unusable.
+    """
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        _get_pool().put_nowait(conn)
+    except (sqlite3.Error, queue.Full):
+        conn.close()
+
+
+@contextmanager
+def get_connection():
+    """
+    Check out a connection of the pool, opened and tuned on first use (see get_sql_engine).
+
+    The idle connections are shared by all the threads of the process (a process created by fork
+    opens its own): a request handled by a new thread reuses the connection returned by a previous
+    one instead of opening and tuning a new one. Up to SQLITE_POOL_SIZE idle connections are kept;
+    the threads that find the pool empty open a new connection, closed on release if the pool is
+    full. On exit, the pending transaction is committed, or rolled back if an exception was raised,
+    and the connection is returned to the pool. Nested calls of the same thread share the connection
+    and the transaction of the outermost one, so they must not commit themselves. The connection
+    must not be closed nor used after the block.
+
+    Usage:
+        with get_connection() as conn:
+            rows = conn.execute("SELECT ...").fetchall()
+
+    Yields:
+        sqlite3.Connection: The connection checked out by the thread.
+
+    Raises:
+        sqlite3.Error: If there is an error connecting to the database.
+    """
+    state = _thread_connections
+    if getattr(state, "pid", None) != os.getpid() or state.depth == 0:
+        if getattr(state, "pid", None) not in (None, os.getpid()):
+            # Forked inside a get_connection block: the connection belongs to the parent.
+            _inherited_connections.append(state.conn)
+        try:
+            conn = _get_pool().get_nowait()
+        except queue.Empty:
+            conn = get_sql_engine(check_same_thread=False)
+        state.pid = os.getpid()
+        state.conn = conn
+        state.depth = 0
+
+    conn = state.conn
+    state.depth += 1
+    try:
+        yield conn
+    except BaseException:
+        if state.depth == 1 and conn.in_transaction:
+            conn.rollback()
+        raise
+    else:
+        if state.depth == 1 and conn.in_transaction:
+            conn.commit()
+    finally:
+        state.depth -= 1
+        if state.depth == 0:
+            state.conn = None
+            _release_connection(conn)
+
+
+def close_connections() -> None:
+    """
+    Close the idle connections of the pool (the next get_connection() calls open new ones).
+
+    Returns:
+        None
+    """
+    pool = _get_pool()
+    while True:
+        try:
+            pool.get_nowait().close()
+        except queue.Empty:
+            break
+
+
 def execute_sql(sql: str, connection: sqlite3.Connection) -> None:
     """
     Execute a SQL command and print the results or execution status.
@@ -100,128 +245,23 @@ def execute_sql(sql: str, connection: sqlite3.Connection) -> None:
         raise
 
 
-def create_data_base() -> None:
+def create_data_base() -> int:
     """
-    Create the necessary tables in the SQLite database.
-
-    This function executes SQL CREATE TABLE statements for the following tables:
-      - user
-      - station
-      - availability
-      - current
-      - FetchedWeatherData
-      - FetchedBikesData
+    Create the tables of the SQLite database, or bring an existing database up to date.
 
-    If a table already exists, it will not be recreated.
+    The schema is versioned (see migrations.py): the migrations newer than the version stored in the
+    database create the tables user, station, availability, current, FetchedWeatherData,
+    FetchedStationData and FetchedBikesData, and the indexes of the hot queries. The connections
+    opened by get_sql_engine() apply them too, once per process.
 
     Returns:
-        None
+        int: The schema version of the database.
     """
     engine = get_sql_engine()
-
-    sql_users_table = """
-    CREATE TABLE IF NOT EXISTS user (
-        email TEXT PRIMARY KEY,
-        username TEXT UNIQUE,
-        first_name TEXT,
-        last_name TEXT,
-        password TEXT,
-        default_station INTEGER
-    );
-    """
-
-    sql_station_table = """
-    CREATE TABLE IF NOT EXISTS station (
-        station_id INTEGER NOT NULL,
-        address VARCHAR(128),
-        banking INTEGER,
-        bonus INTEGER,
-        bike_stands INTEGER,
-        name VARCHAR(128),
-        position_lat FLOAT,
-        position_lng FLOAT,
-        PRIMARY KEY (station_id)
-    );
-    """
-
-    sql_availability_table = """
-    CREATE TABLE IF NOT EXISTS availability (
-        station_id INTEGER NOT NULL,
-        last_update DATETIME NOT NULL,
-        available_bikes INTEGER,
-        available_bike_stands INTEGER,
-        status VARCHAR(128),
-        PRIMARY KEY (station_id, last_update)
-    );
-    """
-
-    sql_current_table = """
-    CREATE TABLE IF NOT EXISTS current (
-        dt DATETIME NOT NULL,
-        feels_like FLOAT,
-        humidity INTEGER,
-        pressure INTEGER,
-        sunrise DATETIME,
-        sunset DATETIME,
-        temp FLOAT,
-        uvi FLOAT,
-        weather_id INTEGER,
-        wind_gust FLOAT,
-        wind_speed FLOAT,
-        rain_1h FLOAT,
-        snow_1h FLOAT,
-        PRIMARY KEY (dt)
-    );
-    """
-
-    sql_fetched_weather = """    
-    CREATE TABLE IF NOT EXISTS FetchedWeatherData (
-        timestamp_requested DATETIME NOT NULL,
-        timestamp_weatherinfo DATETIME NOT NULL,
-        forecast_type TEXT,         
-        target_datetime DATETIME,     
-        feels_like FLOAT, 
-        humidity INTEGER,
-        pressure INTEGER,
-        sunrise DATETIME,
-        sunset DATETIME,
-        temp FLOAT,
-        uvi FLOAT,
-        weather_id INTEGER,
-        wind_gust FLOAT,
-        wind_speed FLOAT,
-        rain_1h FLOAT,
-        snow_1h FLOAT,
-        PRIMARY KEY (timestamp_requested, timestamp_weatherinfo)
-    );
-    """
-
-    sql_fetched_bikes = """
-    CREATE TABLE IF NOT EXISTS FetchedBikesData (
-        time_requested DATETIME NOT NULL,
-        station_id INTEGER NOT NULL,
-        available_bikes INTEGER,
-        available_bike_stands INTEGER,
-        status VARCHAR(128),
-        last_update DATETIME,
-        address VARCHAR(128),
-        banking INTEGER,
-        bonus INTEGER,
-        bike_stands INTEGER,
-        name VARCHAR(128),
-        position_lat FLOAT,
-        position_lng FLOAT,
-        PRIMARY KEY (time_requested, station_id)
-    );
-    """
-
-    execute_sql(sql_users_table, engine)
-    execute_sql(sql_station_table, engine)
-    execute_sql(sql_availability_table, engine)
-    execute_sql(sql_current_table, engine)
-    execute_sql(sql_fetched_weather, engine)
-    execute_sql(sql_fetched_bikes, engine)
-
+    try:
+        return migrate_database(engine)
+    finally:
+        engine.close()
 
 
 if __name__ == "__main__":
@@ -1,6 +1,6 @@
 import sqlite3
 from typing import Optional, Union, Dict
-from DublinBikes.SqlCode.sql_utils import get_sql_engine
+from DublinBikes.SqlCode.sql_utils import get_connection
 
 """
 Module: user_db
@@ -46,23 +46,20 @@ def register_user(
     Returns:
         bool: True if the registration is successful; False if an integrity error occurs.
     """
-    conn = get_sql_engine()
-    try:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO user (email, username, first_name, last_name, password, default_station)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (email, username, first_name, last_name, password, default_station),
-        )
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError as e:
-        logger.info("Error registering user:", e)
-        return False
-    finally:
-        conn.close()
+    with get_connection() as conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO user (email, username, first_name, last_name, password, default_station)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (email, username, first_name, last_name, password, default_station),
+            )
+            return True
+        except sqlite3.IntegrityError as e:
+            logger.info("Error registering user:", e)
+            return False
 
 
 def get_user_by_email(email: str) -> Optional[Dict[str, Union[str, int]]]:
@@ -77,14 +74,11 @@ def get_user_by_email(email: str) -> Optional[Dict[str, Union[str, int]]]:
     Returns:
         Optional[Dict[str, Union[str, int]]]: A dictionary with user details if found; otherwise, None.
     """
-    conn = get_sql_engine()
-    try:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM user WHERE email = ?", (email,))
         row = cursor.fetchone()
         return dict(row) if row is not None else None
-    finally:
-        conn.close()
 
 
 def update_user_profile(
@@ -112,21 +106,18 @@ def update_user_profile(
     Returns:
         bool: True if the update was successful; False if an integrity error occurs.
     """
-    conn = get_sql_engine()
-    try:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            UPDATE user
-            SET username = ?, first_name = ?, last_name = ?, password = ?, default_station = ?
-            WHERE email = ?
-            """,
-            (username, first_name, last_name, password, default_station, email),
-        )
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError as e:
-        logger.info("Error updating user profile:", e)
-        return False
-    finally:
-        conn.close()
+    with get_connection() as conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                UPDATE user
+                SET username = ?, first_name = ?, last_name = ?, password = ?, default_station = ?
+                WHERE email = ?
+                """,
+                (username, first_name, last_name, password, default_station, email),
+            )
+            return True
+        except sqlite3.IntegrityError as e:
+            logger.info("Error updating user profile:", e)
+            return False
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from DublinBikes.MachineLearning.compact_forest import (
+    CompactModelFile,
+    flatten_forest,
+    get_compact_model_file,
+    write_compact_models,
+)
+
+
+class TestCompactForest(unittest.TestCase):
+    """
+    Test the export of random forests to the compact models file and their NumPy evaluation.
+    Small forests are trained on random data so that the tests do not depend on the pickle files.
+    """
+
+
+
+    def setUp(self) -> None:
+        """
+        Train two small forests and write them to a temporary compact models file.
+        """
+        rng = np.random.default_rng(42)
+        self.X = rng.uniform(-1, 1, size=(300, 10))
+        y = 10 * self.X[:, 0] + 5 * self.X[:, 2] ** 2 + rng.normal(size=300)
+        self.models = {
+            1: RandomForestRegressor(n_estimators=5, max_depth=6, random_state=0).fit(self.X, y),
+            7: RandomForestRegressor(n_estimators=3, max_depth=4, random_state=1).fit(self.X, -y),
+        }
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "compact_models.bin")
+        write_compact_models(
+            {station_id: flatten_forest(model) for station_id, model in self.models.items()}, self.path
+        )
+
+
+
+    def tearDown(self) -> None:
+        """
+        Remove the temporary compact models file.
+        """
+        self.tmp_dir.cleanup()
+
+
+
+    def test_predictions_match_scikit_learn(self) -> None:
+        """
+        Verify that the compact forests predict exactly the same values as the scikit-learn models.
+        """
+        model_file = CompactModelFile(self.path)
+        for station_id, model in self.models.items():
+            forest = model_file.get_forest(station_id)
+            np.testing.assert_array_equal(forest.predict(self.X), model.predict(self.X))
+
+
+
+    def test_station_ids(self) -> None:
+        """
+        Verify that the file lists the exported stations and returns None for unknown stations.
+        """
+        model_file = CompactModelFile(self.path)
+        self.assertEqual(model_file.station_ids(), [1, 7])
+        self.assertIsNone(model_file.get_forest(2), "Unknown stations should return None.")
+        self.assertEqual(model_file.get_forest(7).n_estimators, 3)
+
+
+
+    def test_forest_nbytes(self) -> None:
+        """
+        Verify that the size of the stored forests is smaller than the file and adds up.
+        """
+        model_file = CompactModelFile(self.path)
+        total = model_file.forest_nbytes(1) + model_file.forest_nbytes(7)
+        self.assertGreater(model_file.forest_nbytes(1), 0)
+        self.assertLessEqual(total, os.path.getsize(self.path))
+
+
+
+
+    def test_new_export_is_reopened(self) -> None:
+        """
+        Verify that the opened file is replaced once the forests are exported again, with the model
+        version they come from.
+        """
+        model_file = get_compact_model_file(self.path)
+        self.assertIsNone(model_file.model_version)
+        self.assertIs(get_compact_model_file(self.path), model_file)
+
+        write_compact_models({1: flatten_forest(self.models[7])}, self.path, "20250101-000000-000000")
+        reopened = get_compact_model_file(self.path)
+        self.assertIsNot(reopened, model_file)
+        self.assertEqual(reopened.model_version, "20250101-000000-000000")
+        self.assertEqual(reopened.station_ids(), [1])
+        np.testing.assert_array_equal(reopened.get_forest(1).predict(self.X), self.models[7].predict(self.X))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,17 @@
 import unittest
 from datetime import datetime, timedelta
 from typing import Any, Dict
-from DublinBikes.DataFrontend.data_realtime_weather import get_forecast_weather_data
+from DublinBikes.DataFrontend.data_realtime_weather import (
+    FORECAST_COLUMNS,
+    clear_forecast_timelines,
+    forecast_at,
+    get_forecast_weather_data,
+    get_weather_at,
+    refresh_forecast,
+    save_forecast_data_to_cache_db,
+)
 from DublinBikes.SqlCode.sql_utils import get_sql_engine
+from DublinBikes.Utils.params import FORECAST_TIMELINE_MINUTES
 
 
 class TestForecastWeather(unittest.TestCase):
@@ -36,9 +45,12 @@ class TestForecastWeather(unittest.TestCase):
         try:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM FetchedWeatherData;")
+            cursor.execute("DELETE FROM ForecastWeatherData;")
+            cursor.execute("DELETE FROM ForecastFetches;")
             conn.commit()
         finally:
             conn.close()
+        clear_forecast_timelines()
         
         # Call the function once and store the result
         # It will be API data, as the cache is cleared.
@@ -105,5 +117,165 @@ class TestForecastWeather(unittest.TestCase):
         )
 
 
+def fake_forecast_list(start: datetime, count: int) -> list:
+    """
+    Build forecast API entries every 3 hours from start, with a temperature rising by 3 degrees per
+    entry and a weather icon alternating between day and night.
+    """
+    first = int(start.timestamp())
+    return [
+        {"dt": first + i * 10800, "main": {"temp": 5 + 3 * i, "humidity": 80, "feels_like": 3, "pressure": 1000},
+         "wind": {"speed": 4 + i}, "weather": [{"icon": "04d" if i % 2 == 0 else "04n"}], "rain": {"3h": 0.5}}
+        for i in range(count)
+    ]
+
+
+def delete_fake_forecasts() -> None:
+    """
+    Delete the fake forecast fetches (with entries dated before 2002) from the cache.
+    """
+    conn = get_sql_engine()
+    try:
+        conn.execute("DELETE FROM ForecastWeatherData WHERE timestamp_weatherinfo < '2002-01-01';")
+        conn.execute("DELETE FROM ForecastFetches WHERE first_weatherinfo < '2002-01-01';")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class TestForecastCacheIngest(unittest.TestCase):
+    """
+    Test the insertion of a forecast fetch into the cache, with fake API entries dated 2001 (deleted
+    after the test).
+    """
+
+
+
+    def tearDown(self) -> None:
+        """
+        Delete the fake forecast entries.
+        """
+        delete_fake_forecasts()
+
+
+
+    def test_forecast_saved_in_one_batch(self) -> None:
+        """
+        Verify that a fetch is cached once with its validity window, that its entries match the
+        returned timeline, and that each fetch gets a new generation id.
+        """
+        forecast_list = fake_forecast_list(datetime(2001, 1, 1), 40)
+        timeline = save_forecast_data_to_cache_db(forecast_list, "hourly")
+        self.assertEqual(len(timeline.rows), 40)
+
+        conn = get_sql_engine()
+        try:
+            fetch = conn.execute("SELECT * FROM ForecastFetches WHERE fetch_id = ?;", (timeline.fetch_id,)).fetchone()
+            rows = conn.execute(
+                f"SELECT {', '.join(FORECAST_COLUMNS)} FROM ForecastWeatherData WHERE fetch_id = ? "
+                "ORDER BY timestamp_weatherinfo;", (timeline.fetch_id,)
+            ).fetchall()
+        finally:
+            conn.close()
+        self.assertEqual([dict(row) for row in rows], timeline.rows)
+        self.assertEqual(timeline.rows[1]["timestamp_weatherinfo"], "2001-01-01 03:00:00")
+        self.assertEqual(timeline.rows[1]["temp"], 8)
+        self.assertEqual((fetch["first_weatherinfo"], fetch["last_weatherinfo"]), ("2001-01-01 00:00:00", "2001-01-05 21:00:00"))
+        self.assertEqual(timeline.valid_until - timeline.fetched_at, timedelta(minutes=FORECAST_TIMELINE_MINUTES))
+
+        next_timeline = save_forecast_data_to_cache_db(forecast_list[:8], "hourly")
+        self.assertGreater(next_timeline.fetch_id, timeline.fetch_id)
+
+
+class TestForecastTimeline(unittest.TestCase):
+    """
+    Test the lookup and interpolation of the forecast weather in the in-memory timeline.
+    """
+
+
+
+    def setUp(self) -> None:
+        """
+        Cache a forecast fetch of 8 entries from 2001-01-01 00:00 (given in reverse order).
+        """
+        forecast_list = fake_forecast_list(datetime(2001, 1, 1), 8)
+        self.timeline = save_forecast_data_to_cache_db(list(reversed(forecast_list)), "hourly")
+
+
+
+    def tearDown(self) -> None:
+        """
+        Delete the fake forecast entries and the timelines of the process.
+        """
+        delete_fake_forecasts()
+        clear_forecast_timelines()
+
+
+
+    def test_interpolation_between_entries(self) -> None:
+        """
+        Verify that the numeric values are interpolated and the others taken from the nearest entry.
+        """
+        result = forecast_at(self.timeline, datetime(2001, 1, 1, 4))
+        self.assertAlmostEqual(result["temp"], 9)  # 1/3 of the way from 8 (03:00) to 11 (06:00).
+        self.assertAlmostEqual(result["wind_speed"], 5 + 1 / 3, places=2)
+        self.assertEqual(result["humidity"], 80)
+        self.assertEqual(result["weather_id"], "04n")  # Icon of the 03:00 entry.
+        self.assertEqual(result["timestamp_weatherinfo"], "2001-01-01 04:00:00")
+
+        exact = forecast_at(self.timeline, datetime(2001, 1, 1, 6))
+        self.assertEqual((exact["temp"], exact["weather_id"]), (11, "04d"))
+
+
+
+    def test_target_outside_the_forecast(self) -> None:
+        """
+        Verify that the first/last entry is used near the ends and that no forecast is found further.
+        """
+        self.assertEqual(forecast_at(self.timeline, datetime(2000, 12, 31, 23))["temp"], 5)
+        self.assertEqual(forecast_at(self.timeline, datetime(2001, 1, 1, 22))["temp"], 26)
+        self.assertIsNone(forecast_at(self.timeline, datetime(2000, 12, 31, 22)))
+        self.assertIsNone(forecast_at(self.timeline, datetime(2001, 1, 2, 1)))
+
+
+
+    def test_forecast_read_from_cache(self) -> None:
+        """
+        Verify that a forecast cached by another process is loaded as the timeline, without the API,
+        and that every target time is answered from that fetch.
+        """
+        clear_forecast_timelines()
+        result = get_forecast_weather_data("hourly", "2001-01-01T07:30:00")
+        self.assertEqual(result["temp"], 12.5)
+        self.assertEqual(result["target_datetime"], "2001-01-01T07:30:00")
+        self.assertEqual(result["fetch_id"], self.timeline.fetch_id)
+        other = get_forecast_weather_data("hourly", "2001-01-01T19:00:00")
+        self.assertEqual(other["fetch_id"], self.timeline.fetch_id)
+
+
+
+    def test_weather_filled_in_from_forecast(self) -> None:
+        """
+        Verify that the weather of a prediction is interpolated in the forecast, and that a time
+        after the forecast has no weather.
+        """
+        clear_forecast_timelines()
+        weather = get_weather_at(datetime(2001, 1, 1, 7, 30))
+        self.assertEqual(weather, {"temperature": 12.5, "humidity": 80, "source": "forecast"})
+        self.assertIn("error", get_weather_at(datetime(2001, 1, 3)))
+
+
+
+    def test_refresh_forecast(self) -> None:
+        """
+        Verify that the background refresh loads a fetch cached by another process, without the
+        API, and does nothing while the timeline is fresh.
+        """
+        clear_forecast_timelines()
+        self.assertTrue(refresh_forecast())
+        self.assertEqual(get_forecast_weather_data("hourly", "2001-01-01T03:00:00")["fetch_id"], self.timeline.fetch_id)
+        self.assertFalse(refresh_forecast())
+
+
 if __name__ == '__main__':
     unittest.main()
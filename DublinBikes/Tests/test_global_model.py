@@ -0,0 +1,123 @@
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from DublinBikes.MachineLearning import global_model
+from DublinBikes.MachineLearning.global_model import (
+    GlobalModel,
+    get_global_model,
+    load_training_csv,
+    save_global_model,
+    train_global_model,
+)
+from DublinBikes.MachineLearning.predict_availability import build_feature_matrix
+
+
+class TestGlobalModel(unittest.TestCase):
+    """
+    Test the training and the predictions of the global model of all the stations.
+    The model is trained on synthetic data where each station has its own level of bikes.
+    """
+
+    STATION_LEVELS = {2: 5, 7: 20, 31: 35}
+
+
+
+    def setUp(self) -> None:
+        """
+        Build the synthetic observations: the bikes of a station only depend on the station.
+        """
+        rng = np.random.default_rng(0)
+        frames = []
+        for station_id, level in self.STATION_LEVELS.items():
+            n = 200
+            frames.append(pd.DataFrame({
+                "station_id": station_id,
+                "timestamp": pd.Timestamp("2025-03-03") + pd.to_timedelta(rng.integers(0, 7 * 24 * 60, n), unit="min"),
+                "temperature": rng.uniform(0, 20, n),
+                "humidity": rng.uniform(50, 100, n),
+                "bikes": level + rng.normal(0, 0.5, n),
+            }))
+        self.data = pd.concat(frames, ignore_index=True)
+
+
+
+    def test_predictions_depend_on_station(self) -> None:
+        """
+        Verify that a single predict call returns the level of each station.
+        """
+        model = GlobalModel(train_global_model(self.data, max_iter=30))
+        station_ids = list(self.STATION_LEVELS)
+        features = build_feature_matrix(["2025-04-02 18:00"] * 3, [10] * 3, [80] * 3)
+        predictions = model.predict(station_ids, features)
+        np.testing.assert_allclose(predictions, list(self.STATION_LEVELS.values()), atol=1.5)
+        self.assertEqual(model.station_ids(), station_ids)
+
+
+
+    def test_unknown_station(self) -> None:
+        """
+        Verify that stations without training data are rejected.
+        """
+        model = GlobalModel(train_global_model(self.data, max_iter=5))
+        with self.assertRaises(ValueError):
+            model.predict([4], build_feature_matrix(["2025-04-02 18:00"], [10], [80]))
+
+
+
+    def test_save_and_load_training_csv(self) -> None:
+        """
+        Verify the CSV format of the training notebooks and that the saved artifact can be loaded.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = os.path.join(tmp_dir, "merged.csv")
+            pd.DataFrame({
+                "station_id": [2, 7],
+                "last_reported": ["2025-04-02 10:12:00", "2025-04-05 23:59:00"],
+                "hour": [18, 7],
+                "minute": [30, 0],
+                "max_air_temperature_celsius": [14, 8],
+                "min_air_temperature_celsius": [10, 2],
+                "max_relative_humidity_percent": [90, 100],
+                "min_relative_humidity_percent": [70, 80],
+                "num_bikes_available": [3, 12],
+            }).to_csv(csv_path, index=False)
+            data = load_training_csv(csv_path)
+            self.assertEqual(list(data["timestamp"].astype(str)), ["2025-04-02 18:30:00", "2025-04-05 07:00:00"])
+            self.assertEqual(list(data["temperature"]), [12, 5])
+            self.assertEqual(list(data["humidity"]), [80, 90])
+
+            model_path = os.path.join(tmp_dir, "model_global.pkl")
+            save_global_model(train_global_model(self.data, max_iter=5), model_path)
+            with open(model_path, "rb") as f:
+                artifact = pickle.load(f)
+            self.assertEqual(artifact["feature_names"][0], "station")
+            self.assertEqual(sorted(artifact["station_index"]), list(self.STATION_LEVELS))
+
+
+
+
+    def test_new_artifact_is_reloaded(self) -> None:
+        """
+        Verify that the loaded global model is replaced once a new artifact is saved.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model_path = os.path.join(tmp_dir, "model_global.pkl")
+            with mock.patch.object(global_model, "get_global_model_path", return_value=model_path), \
+                    mock.patch.object(global_model, "_global_model", None):
+                save_global_model(train_global_model(self.data, max_iter=5), model_path)
+                first = get_global_model()
+                self.assertIs(get_global_model(), first)
+
+                data = self.data[self.data["station_id"] != 31]
+                save_global_model(train_global_model(data, max_iter=5), model_path)
+                second = get_global_model()
+                self.assertIsNot(second, first)
+                self.assertEqual(second.station_ids(), [2, 7])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -46,17 +46,25 @@ class TestManageCache(unittest.TestCase):
                 dummy_weather
             )
             # Dummy record for FetchedBikesData.
-            dummy_bikes = (
-                yesterday_str, 1, 0, 0, "OPEN", yesterday_str, "dummy", 0, 0, 0, "dummy", 0.0, 0.0
-            )
+            dummy_bikes = (yesterday_str, 1, 0, 0, "OPEN", yesterday_str)
             cursor.execute(
                 """INSERT INTO FetchedBikesData (
                         time_requested, station_id, available_bikes, available_bike_stands,
-                        status, last_update, address, banking, bonus, bike_stands, name,
-                        position_lat, position_lng
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);""",
+                        status, last_update
+                    ) VALUES (?, ?, ?, ?, ?, ?);""",
                 dummy_bikes
             )
+            # Dummy forecast fetch, expired yesterday, with one entry.
+            cursor.execute(
+                """INSERT INTO ForecastFetches (
+                        forecast_type, fetched_at, valid_until, first_weatherinfo, last_weatherinfo
+                    ) VALUES ('hourly', ?, ?, ?, ?);""",
+                (yesterday_str, yesterday_str, yesterday_str, yesterday_str)
+            )
+            cursor.execute(
+                "INSERT INTO ForecastWeatherData (fetch_id, timestamp_weatherinfo, temp) VALUES (?, ?, 0);",
+                (cursor.lastrowid, yesterday_str)
+            )
             conn.commit()
         finally:
             conn.close()
@@ -72,6 +80,8 @@ class TestManageCache(unittest.TestCase):
             cursor = conn.cursor()
             cursor.execute("DELETE FROM FetchedWeatherData;")
             cursor.execute("DELETE FROM FetchedBikesData;")
+            cursor.execute("DELETE FROM ForecastWeatherData;")
+            cursor.execute("DELETE FROM ForecastFetches;")
             conn.commit()
         finally:
             conn.close()
@@ -95,11 +105,17 @@ class TestManageCache(unittest.TestCase):
             count_weather = cursor.fetchone()[0]
             cursor.execute("SELECT COUNT(*) FROM FetchedBikesData;")
             count_bikes = cursor.fetchone()[0]
+            cursor.execute("SELECT COUNT(*) FROM ForecastFetches;")
+            count_fetches = cursor.fetchone()[0]
+            cursor.execute("SELECT COUNT(*) FROM ForecastWeatherData;")
+            count_forecast = cursor.fetchone()[0]
         finally:
             conn.close()
 
         self.assertEqual(count_weather, 0, "FetchedWeatherData should be empty after cleaning.")
         self.assertEqual(count_bikes, 0, "FetchedBikesData should be empty after cleaning.")
+        self.assertEqual(count_fetches, 0, "ForecastFetches should be empty after cleaning.")
+        self.assertEqual(count_forecast, 0, "ForecastWeatherData should be empty after cleaning.")
 
 
 
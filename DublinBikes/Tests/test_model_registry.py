@@ -0,0 +1,116 @@
+import os
+import pickle
+import tempfile
+import unittest
+from typing import Any, List, Tuple
+from unittest import mock
+from DublinBikes.MachineLearning import model_registry
+from DublinBikes.MachineLearning.model_registry import ModelRegistry, load_station_model
+
+
+class TestModelRegistry(unittest.TestCase):
+    """
+    Test the in-memory LRU registry of station models.
+    A fake loader is used so that the tests do not depend on the pickle files.
+    """
+
+
+
+    def setUp(self) -> None:
+        """
+        Create a registry with room for three models of 100 bytes each.
+        """
+        self.loaded_keys: List[int] = []
+        self.registry = ModelRegistry(max_bytes=300, loader=self._fake_loader)
+
+
+
+    def _fake_loader(self, key: int) -> Tuple[Any, int]:
+        """
+        Return a dummy model of 100 bytes and record which key was loaded.
+        """
+        self.loaded_keys.append(key)
+        return {"model": key}, 100
+
+
+
+    def test_model_loaded_only_once(self) -> None:
+        """
+        Verify that repeated requests for the same model only load it once.
+        """
+        first = self.registry.get(1)
+        second = self.registry.get(1)
+        self.assertIs(first, second, "The cached model should be returned on the second call.")
+        self.assertEqual(self.loaded_keys, [1], "The model should be loaded only once.")
+
+
+
+    def test_hit_and_miss_counters(self) -> None:
+        """
+        Verify that hits and misses are counted.
+        """
+        self.registry.get(1)
+        self.registry.get(1)
+        self.registry.get(2)
+        stats = self.registry.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["models_cached"], 2)
+        self.assertEqual(stats["bytes_cached"], 200)
+
+
+
+    def test_least_recently_used_model_evicted(self) -> None:
+        """
+        Verify that the least recently used model is evicted when the memory budget is exceeded.
+        """
+        self.registry.get(1)
+        self.registry.get(2)
+        self.registry.get(3)
+        self.registry.get(1)  # 2 is now the least recently used model.
+        self.registry.get(4)
+
+        stats = self.registry.stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["models_cached"], 3)
+
+        self.registry.get(1)
+        self.registry.get(2)
+        self.assertEqual(self.loaded_keys, [1, 2, 3, 4, 2], "Only the evicted model should be reloaded.")
+
+
+
+    def test_model_larger_than_budget_is_kept(self) -> None:
+        """
+        Verify that a model bigger than the whole budget is still cached on its own.
+        """
+        registry = ModelRegistry(max_bytes=50, loader=self._fake_loader)
+        registry.get(1)
+        registry.get(1)
+        self.assertEqual(self.loaded_keys, [1])
+        registry.get(2)
+        self.assertEqual(registry.stats()["models_cached"], 1)
+
+
+
+    def test_compact_models_of_another_version_not_used(self) -> None:
+        """
+        Verify that the pickle model is loaded when the compact models file was exported from
+        another model version than the active one.
+        """
+        compact_file = mock.Mock(model_version="20250101-000000-000000")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model_path = os.path.join(tmp_dir, "model_station_1.pkl")
+            with open(model_path, "wb") as f:
+                pickle.dump({"model": 1}, f)
+            with mock.patch.object(model_registry, "MODEL_FORMAT", "compact"), \
+                    mock.patch.object(model_registry, "get_compact_model_file", return_value=compact_file), \
+                    mock.patch.object(model_registry, "get_active_model_version", return_value="20250102-000000-000000"), \
+                    mock.patch.object(model_registry, "get_model_path", return_value=model_path):
+                model, _ = load_station_model(1)
+        self.assertEqual(model, {"model": 1})
+        compact_file.get_forest.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+import unittest
+from unittest import mock
+import numpy as np
+from DublinBikes.FlaskApp import app
+from DublinBikes.MachineLearning import predict_availability
+from DublinBikes.MachineLearning.predict_availability import (
+    build_feature_matrix,
+    batch_prediction,
+    get_prediction_cache_stats,
+    predict_all_stations,
+    predict_station_curve,
+    prediction,
+)
+
+
+class TestPredictAvailability(unittest.TestCase):
+    """
+    Test the feature construction and the batch prediction of station availability.
+    These tests use the pickle model of station 10 (Dame Street).
+    """
+
+    STATION_ID = 10
+    BIKE_STANDS = 30
+
+
+
+    def test_feature_matrix_values(self) -> None:
+        """
+        Verify the features built for a Wednesday at 18:00.
+        """
+        features = build_feature_matrix(["2025-04-02 18:00"], [12.5], [80])
+        self.assertEqual(features.shape, (1, 10))
+        np.testing.assert_allclose(features[0, :4], [-1, 0, 12.5, 80], atol=1e-12)
+        # Only the Wednesday dummy (Tuesday is the first dummy column) is set.
+        np.testing.assert_array_equal(features[0, 4:], [0, 1, 0, 0, 0, 0])
+
+
+
+    def test_feature_matrix_monday_baseline(self) -> None:
+        """
+        Verify that Monday has no day-of-week dummy set.
+        """
+        features = build_feature_matrix(["2025-03-31 09:15"], [10], [70])
+        np.testing.assert_array_equal(features[0, 4:], [0] * 6)
+
+
+
+    def test_feature_matrix_invalid_timestamp(self) -> None:
+        """
+        Verify that a missing timestamp is rejected.
+        """
+        with self.assertRaises(ValueError):
+            build_feature_matrix([None], [10], [70])
+
+
+
+    def test_batch_matches_single_prediction(self) -> None:
+        """
+        Verify that the batch prediction returns the same values as the single ride prediction.
+        """
+        timestamps = ["2025-04-01 08:30", "2025-04-02 17:45", "2025-04-05 13:00"]
+        queries = [
+            {"station_id": self.STATION_ID, "timestamp": ts, "temperature": 11, "humidity": 75}
+            for ts in timestamps
+        ]
+        results = batch_prediction(queries, {self.STATION_ID: self.BIKE_STANDS})
+        self.assertEqual(len(results), len(queries))
+
+        station = {"bike_stands": self.BIKE_STANDS}
+        with app.app_context():
+            for query, result in zip(queries, results):
+                data = dict(query, origin_station_id=self.STATION_ID, destination_station_id=self.STATION_ID)
+                single = prediction(data, station, station).get_json()["prediction"]
+                self.assertEqual(result["timestamp"], query["timestamp"])
+                self.assertEqual(result["available_bikes"], single["origin_station_id"])
+                self.assertEqual(result["available_bike_stands"], single["destination_station_id"])
+
+
+
+    def test_batch_rejects_invalid_query(self) -> None:
+        """
+        Verify that a query without temperature is rejected.
+        """
+        queries = [{"station_id": self.STATION_ID, "timestamp": "2025-04-01 08:30", "humidity": 75}]
+        with self.assertRaises(ValueError):
+            batch_prediction(queries, {self.STATION_ID: self.BIKE_STANDS})
+
+
+
+    def test_all_stations_match_single_prediction(self) -> None:
+        """
+        Verify that the prediction of all the stations matches the ride prediction of a station,
+        and that stations without model (46) are returned without values.
+        """
+        results = predict_all_stations("2025-04-02 17:45", 11, 75, {self.STATION_ID: self.BIKE_STANDS, 46: 20})
+        self.assertEqual([result["station_id"] for result in results], [self.STATION_ID, 46])
+        self.assertIsNone(results[1]["available_bikes"])
+
+        station = {"bike_stands": self.BIKE_STANDS}
+        data = {
+            "timestamp": "2025-04-02 17:45", "temperature": 11, "humidity": 75,
+            "origin_station_id": self.STATION_ID, "destination_station_id": self.STATION_ID,
+        }
+        with app.app_context():
+            single = prediction(data, station, station).get_json()["prediction"]
+        self.assertEqual(results[0]["available_bikes"], single["origin_station_id"])
+        self.assertEqual(results[0]["available_bike_stands"], single["destination_station_id"])
+
+
+
+    def test_ride_prediction_cache(self) -> None:
+        """
+        Verify that a ride prediction with nearly identical inputs is answered from the cache.
+        """
+        station = {"bike_stands": self.BIKE_STANDS}
+        data = {
+            "timestamp": "2025-04-03 09:00", "temperature": 11, "humidity": 75,
+            "origin_station_id": self.STATION_ID, "destination_station_id": self.STATION_ID,
+        }
+        with app.app_context():
+            first = prediction(data, station, station).get_json()["prediction"]
+            hits = get_prediction_cache_stats()["hits"]
+            # Same 15-minute slot, weather within the rounding steps.
+            similar = dict(data, timestamp="2025-04-03 09:07", temperature=11.3, humidity=76)
+            second = prediction(similar, station, station).get_json()["prediction"]
+        self.assertEqual(first, second)
+        self.assertEqual(get_prediction_cache_stats()["hits"], hits + 2)
+
+
+
+    def test_ride_prediction_uses_real_inputs(self) -> None:
+        """
+        Verify that only the cache key is rounded: a miss evaluates the model on the real inputs.
+        """
+        station = {"bike_stands": self.BIKE_STANDS}
+        data = {
+            "timestamp": "2025-04-05 09:07", "temperature": 11.3, "humidity": 76,
+            "origin_station_id": self.STATION_ID, "destination_station_id": self.STATION_ID,
+        }
+        with app.app_context():
+            with mock.patch.object(predict_availability, "predict_bikes", return_value=np.array([5.0])) as predict:
+                prediction(data, station, station)
+        _, timestamps, temperatures, humidities, features = predict.call_args.args
+        self.assertEqual(str(timestamps[0]), "2025-04-05 09:07:00")
+        self.assertEqual((temperatures[0], humidities[0]), (11.3, 76))
+        np.testing.assert_allclose(features, build_feature_matrix(["2025-04-05 09:07"], [11.3], [76]))
+
+
+
+    def test_ride_prediction_cache_follows_model_version(self) -> None:
+        """
+        Verify that the cached ride predictions are not used once a new model version is active.
+        """
+        station = {"bike_stands": self.BIKE_STANDS}
+        data = {
+            "timestamp": "2025-04-04 09:00", "temperature": 11, "humidity": 75,
+            "origin_station_id": self.STATION_ID, "destination_station_id": self.STATION_ID,
+        }
+        with app.app_context():
+            with mock.patch.object(predict_availability, "get_prediction_model_version", return_value=("station", "v1")):
+                prediction(data, station, station)
+            misses = get_prediction_cache_stats()["misses"]
+            with mock.patch.object(predict_availability, "get_prediction_model_version", return_value=("station", "v2")):
+                prediction(data, station, station)
+        # The origin is predicted again with the new models, the destination is then read from the cache.
+        self.assertEqual(get_prediction_cache_stats()["misses"], misses + 1)
+
+
+
+    def test_curve_interpolates_weather(self) -> None:
+        """
+        Verify the slots of the curve and that the weather is interpolated between forecast entries.
+        """
+        weather = [
+            {"timestamp_weatherinfo": "2025-04-02 18:00:00", "temp": 10, "humidity": 80},
+            {"timestamp_weatherinfo": "2025-04-02 21:00:00", "temp": 7, "humidity": 90},
+        ]
+        curve = predict_station_curve(self.STATION_ID, "2025-04-02 17:52", 24, 15, weather, self.BIKE_STANDS)
+        self.assertEqual(len(curve), 24 * 4)
+        self.assertEqual(curve[0]["timestamp"], "2025-04-02T18:00:00")
+        self.assertEqual(curve[-1]["timestamp"], "2025-04-03T17:45:00")
+
+        # 19:30 is halfway between the two forecast entries.
+        query = {"station_id": self.STATION_ID, "timestamp": "2025-04-02 19:30", "temperature": 8.5, "humidity": 85}
+        expected = batch_prediction([query], {self.STATION_ID: self.BIKE_STANDS})[0]
+        self.assertEqual(curve[6]["timestamp"], "2025-04-02T19:30:00")
+        self.assertEqual(curve[6]["available_bikes"], expected["available_bikes"])
+
+
+if __name__ == '__main__':
+    unittest.main()
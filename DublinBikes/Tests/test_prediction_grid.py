@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from DublinBikes.MachineLearning import prediction_grid
+from DublinBikes.MachineLearning.prediction_grid import (
+    PredictionGrid,
+    build_prediction_grid,
+    get_prediction_grid,
+    save_prediction_grid,
+)
+
+
+class TestPredictionGrid(unittest.TestCase):
+    """
+    Test the precomputed prediction grid and its lookups.
+    A fake model is used: it "predicts" the temperature feature plus the weekday one-hot columns,
+    so that the value found in the grid tells which bin and which day were used.
+    """
+
+
+
+    @staticmethod
+    def _fake_predict(station_id: int, features: np.ndarray) -> np.ndarray:
+        """
+        Return the temperature feature plus 100 times the weekday number (0 for Monday).
+        """
+        weekday = features[:, 4:] @ np.arange(1, 7)
+        return (features[:, 2] + 100 * weekday + station_id).astype(int)
+
+
+
+    def setUp(self) -> None:
+        """
+        Build a grid for two stations with the fake model.
+        """
+        result = build_prediction_grid([3, 5], self._fake_predict)
+        self.grid = PredictionGrid(result["grid"], result["metadata"])
+
+
+
+    def test_lookup_within_range(self) -> None:
+        """
+        Verify that a query within the grid range returns the value of the nearest bin.
+        """
+        timestamps = pd.DatetimeIndex(["2025-04-02 14:32"])  # Wednesday
+        values, found = self.grid.lookup(5, timestamps, [12.4], [71])
+        self.assertTrue(found[0])
+        self.assertEqual(values[0], 12 + 200 + 5)
+
+
+
+    def test_lookup_out_of_range(self) -> None:
+        """
+        Verify that weather values outside the grid range, and unknown stations, are not found.
+        """
+        timestamps = pd.DatetimeIndex(["2025-04-02 14:30", "2025-04-02 14:30"])
+        _, found = self.grid.lookup(5, timestamps, [45, 10], [70, 5])
+        self.assertFalse(found.any(), "Out of range weather should not be found in the grid.")
+        _, found = self.grid.lookup(4, timestamps, [10, 10], [70, 70])
+        self.assertFalse(found.any(), "Unknown stations should not be found in the grid.")
+
+
+
+    def test_lookup_wraps_to_next_week(self) -> None:
+        """
+        Verify that Sunday just before midnight is rounded to the Monday 00:00 slot.
+        """
+        timestamps = pd.DatetimeIndex(["2025-04-06 23:55"])  # Sunday
+        values, found = self.grid.lookup(3, timestamps, [10], [70])
+        self.assertTrue(found[0])
+        self.assertEqual(values[0], 10 + 3, "The value of Monday (weekday 0) should be returned.")
+
+
+
+    def test_lookup_stations(self) -> None:
+        """
+        Verify that several stations are looked up at once, unknown stations being not found.
+        """
+        values, found = self.grid.lookup_stations([5, 4, 3], pd.Timestamp("2025-04-02 14:30"), 12, 70)
+        np.testing.assert_array_equal(found, [True, False, True])
+        self.assertEqual(values[0], 12 + 200 + 5)
+        self.assertEqual(values[2], 12 + 200 + 3)
+
+
+
+
+    def test_grid_of_other_models_not_used(self) -> None:
+        """
+        Verify that the saved grid records its model version and is only returned for that version.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = (os.path.join(tmp_dir, "grid.npy"), os.path.join(tmp_dir, "grid.json"))
+            with mock.patch.object(prediction_grid, "get_grid_paths", return_value=paths), \
+                    mock.patch.object(prediction_grid, "_grid", None):
+                result = build_prediction_grid([3], self._fake_predict, "station:20250101-000000-000000")
+                save_prediction_grid(result["grid"], result["metadata"])
+                grid = get_prediction_grid("station:20250101-000000-000000")
+                self.assertEqual(grid.model_version, "station:20250101-000000-000000")
+                self.assertIsNone(get_prediction_grid("station:20250102-000000-000000"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+import os
+import socket
+import stat
+import tempfile
+import threading
+import time
+import unittest
+import numpy as np
+from DublinBikes.MachineLearning.prediction_server import (
+    PredictionClient,
+    PredictionServer,
+    PredictionServerUnavailable,
+    get_prediction_server_authkey,
+)
+from DublinBikes.Utils.params import PREDICTION_SERVER_AUTHKEY
+
+
+class TestPredictionServer(unittest.TestCase):
+    """
+    Test the prediction server and its client over a temporary Unix socket.
+    A fake model is used: it predicts the first feature multiplied by the station id (and is stuck
+    for a second for the station 998).
+    """
+
+    AUTHKEY = b"test-key"
+
+
+
+    @staticmethod
+    def _fake_predict(station_id: int, features: np.ndarray) -> np.ndarray:
+        """
+        Return the first feature multiplied by the station id, or fail for unknown stations.
+        """
+        if station_id == 999:
+            raise FileNotFoundError("No model for station 999")
+        if station_id == 998:
+            time.sleep(1)
+        return (features[:, 0] * station_id).astype(int)
+
+
+
+    def setUp(self) -> None:
+        """
+        Start a prediction server in a background thread.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.address = os.path.join(self.tmp_dir.name, "server", "predictions.sock")
+        self.server = PredictionServer(self.address, self.AUTHKEY, self._fake_predict)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.client = PredictionClient(self.address, self.AUTHKEY)
+
+
+
+    def tearDown(self) -> None:
+        """
+        Stop the server and remove the socket.
+        """
+        self.server.close()
+        self.thread.join(timeout=5)
+        self.tmp_dir.cleanup()
+
+
+
+    def test_concurrent_predictions(self) -> None:
+        """
+        Verify that concurrent requests from several threads all get their own predictions.
+        """
+        results = {}
+
+        def request(i: int) -> None:
+            features = np.full((3, 10), i, dtype=float)
+            results[i] = self.client.predict(1 + i % 3, features)
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for i in range(20):
+            np.testing.assert_array_equal(results[i], [i * (1 + i % 3)] * 3)
+        stats = self.client.stats()
+        self.assertEqual(stats["requests"], 20)
+        self.assertLessEqual(stats["model_evaluations"], 20)
+
+
+
+    def test_server_error_is_raised_by_client(self) -> None:
+        """
+        Verify that an error raised while predicting is raised again by the client.
+        """
+        with self.assertRaises(FileNotFoundError):
+            self.client.predict(999, np.zeros((1, 10)))
+        # The connection is still usable after an error.
+        np.testing.assert_array_equal(self.client.predict(2, np.ones((1, 10))), [2])
+
+
+
+    def test_server_unavailable(self) -> None:
+        """
+        Verify that a client without server raises PredictionServerUnavailable.
+        """
+        client = PredictionClient(os.path.join(self.tmp_dir.name, "missing.sock"), self.AUTHKEY)
+        with self.assertRaises(PredictionServerUnavailable):
+            client.predict(1, np.zeros((1, 10)))
+
+
+
+    def test_stuck_server_times_out(self) -> None:
+        """
+        Verify that a client does not wait for a stuck server longer than its timeout, and that its
+        next request gets its own reply.
+        """
+        client = PredictionClient(self.address, self.AUTHKEY, timeout=0.2)
+        start = time.monotonic()
+        with self.assertRaises(PredictionServerUnavailable):
+            client.predict(998, np.zeros((1, 10)))
+        self.assertLess(time.monotonic() - start, 0.9)
+        client.timeout = 5
+        np.testing.assert_array_equal(client.predict(2, np.ones((1, 10))), [2])
+
+
+
+    def test_silent_client_does_not_block_others(self) -> None:
+        """
+        Verify that a client that never completes the handshake does not prevent the other clients
+        from connecting, and is disconnected after the handshake timeout.
+        """
+        address = os.path.join(self.tmp_dir.name, "handshake", "predictions.sock")
+        server = PredictionServer(address, self.AUTHKEY, self._fake_predict, handshake_timeout=0.5)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            with socket.socket(socket.AF_UNIX) as silent:
+                silent.connect(address)
+                client = PredictionClient(address, self.AUTHKEY, timeout=2)
+                np.testing.assert_array_equal(client.predict(3, np.ones((1, 10))), [3])
+
+                silent.settimeout(5)
+                start = time.monotonic()
+                while silent.recv(1024):  # The challenge of the server, then the end of the connection.
+                    pass
+                self.assertLess(time.monotonic() - start, 2)
+        finally:
+            server.close()
+            thread.join(timeout=5)
+
+
+
+    def test_socket_folder_is_private(self) -> None:
+        """
+        Verify that the socket is created in a folder accessible by its owner only.
+        """
+        mode = stat.S_IMODE(os.stat(os.path.dirname(self.address)).st_mode)
+        self.assertEqual(mode, 0o700)
+
+
+
+    @unittest.skipIf(PREDICTION_SERVER_AUTHKEY, "The key is given by the environment")
+    def test_generated_authkey(self) -> None:
+        """
+        Verify that a random key is generated once into a file readable by its owner only.
+        """
+        key_file = os.path.join(self.tmp_dir.name, "prediction_server.key")
+        key = get_prediction_server_authkey(key_file)
+        self.assertGreaterEqual(len(key), 32)
+        self.assertEqual(stat.S_IMODE(os.stat(key_file).st_mode), 0o600)
+        self.assertEqual(get_prediction_server_authkey(key_file), key)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from DublinBikes.Utils.pubsub import PubSub
+
+
+class TestPubSub(unittest.TestCase):
+    """
+    Test the in-process publish/subscribe channel.
+    """
+
+
+
+    def test_events_delivered_to_all_subscribers(self) -> None:
+        """
+        Verify that every subscriber receives the published events, in order.
+        """
+        channel = PubSub(max_subscribers=10, queue_size=5)
+        first, second = channel.subscribe(), channel.subscribe()
+        self.assertEqual(channel.publish("a"), 2)
+        channel.publish("b")
+        self.assertEqual([channel.get(first, 0.1), channel.get(first, 0.1)], ["a", "b"])
+        self.assertEqual(channel.get(second, 0.1), "a")
+        self.assertIsNone(channel.get(first, 0.01), "No event left: get() returns None after the timeout.")
+
+
+
+    def test_slow_subscriber_drops_events(self) -> None:
+        """
+        Verify that a full queue drops the new events of its subscriber only.
+        """
+        channel = PubSub(max_subscribers=10, queue_size=1)
+        slow, fast = channel.subscribe(), channel.subscribe()
+        channel.publish("a")
+        self.assertEqual(channel.get(fast, 0.1), "a")
+        self.assertEqual(channel.publish("b"), 1)
+        self.assertEqual(channel.get(slow, 0.1), "a")
+        self.assertEqual(channel.get(fast, 0.1), "b")
+        self.assertEqual(channel.stats(), {"subscribers": 2, "dropped": 1})
+
+
+
+    def test_subscriber_limit(self) -> None:
+        """
+        Verify that subscribing fails above max_subscribers, and succeeds again after an unsubscribe.
+        """
+        channel = PubSub(max_subscribers=1, queue_size=1)
+        subscriber_id = channel.subscribe()
+        self.assertIsNone(channel.subscribe())
+        channel.unsubscribe(subscriber_id)
+        self.assertIsNotNone(channel.subscribe())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,21 @@ import unittest
 from typing import Any, Dict, List
 from sqlite3 import Connection
 from datetime import datetime
-from DublinBikes.DataFrontend.data_realtime_bikes import get_current_bikes_data
+import threading
+import json
+from datetime import timedelta
+from DublinBikes.DataFrontend.data_realtime_bikes import (
+    clear_bikes_snapshot,
+    get_bikes_delta,
+    get_bikes_payload,
+    get_bikes_snapshot,
+    get_current_bikes_data,
+    parse_bikes_fields,
+    refresh_bikes_data,
+    save_bikes_data_to_cache_db,
+    set_bikes_snapshot,
+)
+from DublinBikes.Utils.single_flight import get_single_flight
 from DublinBikes.SqlCode.sql_utils import get_sql_engine
 
 
@@ -24,6 +38,7 @@ class TestRealtimeBikes(unittest.TestCase):
             conn.commit()
         finally:
             conn.close()
+        clear_bikes_snapshot()
             
         # Call the function once and store the result
         # It will be API data, as the cache is cleared.
@@ -102,5 +117,200 @@ class TestRealtimeBikes(unittest.TestCase):
             self.fail(f"'time_requested' field is neither a string nor a datetime object: {type(time_value)}")
 
 
+
+class TestBikesSnapshot(unittest.TestCase):
+    """
+    Test the in-memory snapshot of the bikes data, without calling the bikes API: a fake fetch
+    of two stations is inserted in the cache database.
+    """
+
+
+
+    def setUp(self) -> None:
+        """
+        Replace the cached fetches with a fake fetch made now.
+        """
+        self.tearDown()
+        conn: Connection = get_sql_engine()
+        try:
+            cursor = conn.cursor()
+            now = datetime.now()
+            for station_id in (1, 2):
+                cursor.execute(
+                    "INSERT INTO FetchedStationData (station_id, bike_stands, name, position_lat, position_lng) "
+                    "VALUES (?, 20, ?, 53.35, -6.26)",
+                    (station_id, f"Station {station_id}"),
+                )
+                cursor.execute(
+                    "INSERT INTO FetchedBikesData (time_requested, station_id, available_bikes, "
+                    "available_bike_stands, status, last_update) VALUES (?, ?, 5, 15, 'OPEN', ?)",
+                    (now, station_id, now),
+                )
+            conn.commit()
+        finally:
+            conn.close()
+
+
+
+    def tearDown(self) -> None:
+        """
+        Clear the cache tables and the snapshot.
+        """
+        conn: Connection = get_sql_engine()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM FetchedBikesData;")
+            cursor.execute("DELETE FROM FetchedStationData;")
+            conn.commit()
+        finally:
+            conn.close()
+        clear_bikes_snapshot()
+
+
+
+    def test_snapshot_served_from_memory(self) -> None:
+        """
+        Verify that once read from the database, the data is served from memory.
+        """
+        first_call = get_current_bikes_data()
+        self.assertEqual([station["station_id"] for station in first_call], [1, 2])
+        self.assertIsInstance(first_call[0]["time_requested"], datetime)
+
+        # Without the database rows, the data can only come from the snapshot.
+        conn: Connection = get_sql_engine()
+        try:
+            conn.execute("DELETE FROM FetchedBikesData;")
+            conn.commit()
+        finally:
+            conn.close()
+        self.assertIs(get_current_bikes_data(), first_call)
+
+
+
+
+    def test_snapshot_joins_static_station_data(self) -> None:
+        """
+        Verify that the static station data is returned with the dynamic data of the fetch.
+        """
+        station = get_current_bikes_data()[0]
+        self.assertEqual(station["name"], "Station 1")
+        self.assertEqual(station["bike_stands"], 20)
+        self.assertEqual(station["available_bikes"], 5)
+        self.assertEqual(station["position"], {"lat": 53.35, "lng": -6.26})
+
+
+
+    def test_save_writes_static_data_once(self) -> None:
+        """
+        Verify that saving several fetches keeps one static row per station and one dynamic row
+        per station and fetch, and that a change of the static data is saved.
+        """
+        self.tearDown()
+        api_station = {
+            "number": 7, "available_bikes": 3, "available_bike_stands": 17, "status": "OPEN",
+            "last_update": 1743600000000, "address": "Dame Street", "banking": False, "bonus": False,
+            "bike_stands": 20, "name": "DAME STREET", "position": {"lat": 53.34, "lng": -6.26},
+        }
+        saved = save_bikes_data_to_cache_db([api_station])
+        save_bikes_data_to_cache_db([dict(api_station, bike_stands=25)])
+        self.assertEqual(saved[0]["name"], "DAME STREET")
+
+        conn: Connection = get_sql_engine()
+        try:
+            cursor = conn.cursor()
+            stations = cursor.execute("SELECT station_id, bike_stands FROM FetchedStationData;").fetchall()
+            fetches = cursor.execute("SELECT COUNT(*) FROM FetchedBikesData;").fetchone()[0]
+        finally:
+            conn.close()
+        self.assertEqual([tuple(row) for row in stations], [(7, 25)])
+        self.assertEqual(fetches, 2)
+
+
+
+    def test_stale_snapshot_served_during_refresh(self) -> None:
+        """
+        Verify that an expired snapshot is still served while a refresh of the bikes is running.
+        """
+        stale = [{"time_requested": datetime.now() - timedelta(minutes=6), "station_id": 1}]
+        set_bikes_snapshot(stale)
+        release = threading.Event()
+        refresh = threading.Thread(target=lambda: get_single_flight().do("bikes", release.wait))
+        refresh.start()
+        try:
+            while not get_single_flight().in_flight("bikes"):
+                pass
+            self.assertIs(get_current_bikes_data(), stale)
+        finally:
+            release.set()
+            refresh.join()
+
+
+
+    def test_refresh_reuses_data_of_other_process(self) -> None:
+        """
+        Verify that the background refresh of an old snapshot uses the fetch cached by another
+        process (the rows inserted in setUp) instead of calling the API.
+        """
+        old = [{"time_requested": datetime.now() - timedelta(minutes=4, seconds=30), "station_id": 1}]
+        set_bikes_snapshot(old)
+        self.assertTrue(refresh_bikes_data())
+        self.assertEqual([station["station_id"] for station in get_bikes_snapshot()], [1, 2])
+        # The snapshot is now recent: nothing to refresh.
+        self.assertFalse(refresh_bikes_data())
+
+
+
+    def test_delta_since_previous_snapshot(self) -> None:
+        """
+        Verify that the delta since a previous snapshot only holds the stations whose bikes, stands
+        or status changed, and that an unknown snapshot requires the full list.
+        """
+        first = get_current_bikes_data()
+        first_id = get_bikes_payload(first).etag
+        later = datetime.now() + timedelta(seconds=1)
+        second = [
+            dict(first[0], time_requested=later, available_bikes=4, available_bike_stands=16),
+            dict(first[1], time_requested=later),
+        ]
+        set_bikes_snapshot(second)
+
+        delta = get_bikes_delta(second, first_id)
+        self.assertEqual(delta["snapshot_id"], get_bikes_payload(second).etag)
+        self.assertEqual([station["station_id"] for station in delta["changed"]], [1])
+        self.assertEqual(delta["changed"][0]["available_bikes"], 4)
+        self.assertNotIn("name", delta["changed"][0])
+        self.assertEqual(delta["removed"], [])
+
+        self.assertEqual(get_bikes_delta(second, delta["snapshot_id"])["changed"], [])
+        self.assertIsNone(get_bikes_delta(second, "unknown"))
+
+        projected = get_bikes_delta(second, first_id, parse_bikes_fields("available_bikes"))
+        self.assertEqual(projected["changed"], [{"station_id": 1, "available_bikes": 4}])
+
+
+
+    def test_columnar_and_projected_payloads(self) -> None:
+        """
+        Verify the columnar format and the field projections built from the snapshot, and that
+        each variant is serialized once per snapshot.
+        """
+        stations = get_current_bikes_data()
+        fields = parse_bikes_fields("available_bikes, station_id,position")
+        self.assertEqual(fields, ("station_id", "available_bikes", "position"))
+
+        columnar = json.loads(get_bikes_payload(stations, "columnar", fields).body)
+        self.assertEqual(columnar, {
+            "station_id": [1, 2], "available_bikes": [5, 5],
+            "position_lat": [53.35, 53.35], "position_lng": [-6.26, -6.26],
+        })
+        rows = json.loads(get_bikes_payload(stations, "rows", fields).body)
+        self.assertEqual(rows[0], {"station_id": 1, "available_bikes": 5, "position": {"lat": 53.35, "lng": -6.26}})
+        self.assertEqual(len(json.loads(get_bikes_payload(stations, "columnar").body)["name"]), 2)
+
+        self.assertIs(get_bikes_payload(stations, "columnar", fields), get_bikes_payload(stations, "columnar", fields))
+        with self.assertRaises(ValueError):
+            parse_bikes_fields("station_id,unknown")
+
+
 if __name__ == '__main__':
     unittest.main()
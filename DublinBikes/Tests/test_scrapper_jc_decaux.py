@@ -0,0 +1,90 @@
+import json
+import unittest
+from DublinBikes.SqlCode.sql_utils import get_sql_engine
+from DublinBikes.DataMining.scrapper_jc_decaux import AvailabilityChangeTracker, save_availability_data_to_db
+
+
+class TestAvailabilityChanges(unittest.TestCase):
+    """
+    Test that the scraper only inserts the stations whose last_update changed.
+    Fake API data is used for two test stations (9101 and 9102), deleted after each test.
+    """
+
+    TEST_STATION_IDS = (9101, 9102)
+
+
+
+    def setUp(self) -> None:
+        """
+        Open a connection and create an empty change tracker.
+        """
+        self.conn = get_sql_engine()
+        self.delete_test_records()
+        self.tracker = AvailabilityChangeTracker()
+
+
+
+    def tearDown(self) -> None:
+        """
+        Delete the test records and close the connection.
+        """
+        self.delete_test_records()
+        self.conn.close()
+
+
+
+    def delete_test_records(self) -> None:
+        """
+        Delete the availability records of the test stations.
+        """
+        self.conn.execute("DELETE FROM availability WHERE station_id IN (?, ?);", self.TEST_STATION_IDS)
+        self.conn.commit()
+
+
+
+    def api_data(self, last_updates: dict) -> str:
+        """
+        Build the API response of the test stations with the given last_update (in ms).
+        """
+        return json.dumps([
+            {"number": station_id, "last_update": last_update, "available_bikes": 4,
+             "available_bike_stands": 16, "status": "OPEN"}
+            for station_id, last_update in last_updates.items()
+        ])
+
+
+
+    def count_rows(self) -> int:
+        """
+        Count the availability records of the test stations.
+        """
+        query = "SELECT COUNT(*) FROM availability WHERE station_id IN (?, ?);"
+        return self.conn.execute(query, self.TEST_STATION_IDS).fetchone()[0]
+
+
+
+    def test_unchanged_stations_skipped(self) -> None:
+        """
+        Verify that a second poll only inserts the station with a new report.
+        """
+        save_availability_data_to_db(self.api_data({9101: 1743600000000, 9102: 1743600000000}), self.conn, self.tracker)
+        inserted = save_availability_data_to_db(self.api_data({9101: 1743600300000, 9102: 1743600000000}), self.conn, self.tracker)
+        self.assertEqual(inserted, 1)
+        self.assertEqual(self.count_rows(), 3)
+        self.assertEqual(self.tracker.stats(), {"rows_received": 4, "rows_inserted": 3, "rows_skipped": 1})
+
+
+
+    def test_state_loaded_from_database(self) -> None:
+        """
+        Verify that a new tracker (restarted scraper) skips the observations already saved.
+        """
+        data = self.api_data({9101: 1743600000000, 9102: 1743600000000})
+        save_availability_data_to_db(data, self.conn, self.tracker)
+        restarted = AvailabilityChangeTracker()
+        self.assertEqual(save_availability_data_to_db(data, self.conn, restarted), 0)
+        self.assertEqual(restarted.stats()["rows_skipped"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import fcntl
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from DublinBikes.Utils.single_flight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    """
+    Test the coalescing of concurrent upstream fetches.
+    The fetch functions are fakes that count their calls instead of calling the APIs.
+    """
+
+
+
+    def setUp(self) -> None:
+        """
+        Create a single-flight layer with its lock files in a temporary folder.
+        """
+        self.lock_folder = tempfile.mkdtemp()
+        self.single_flight = SingleFlight(self.lock_folder, lock_timeout=5)
+        self.fetch_count = 0
+
+
+
+    def tearDown(self) -> None:
+        """
+        Delete the lock files.
+        """
+        shutil.rmtree(self.lock_folder, ignore_errors=True)
+
+
+
+    def slow_fetch(self) -> list:
+        """
+        Fake upstream fetch taking 200 ms.
+        """
+        self.fetch_count += 1
+        time.sleep(0.2)
+        return ["fetched"]
+
+
+
+    def test_concurrent_callers_share_one_fetch(self) -> None:
+        """
+        Verify that concurrent callers for the same resource trigger a single fetch.
+        """
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.single_flight.do("bikes", self.slow_fetch)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.fetch_count, 1)
+        self.assertEqual(results, [["fetched"]] * 8)
+
+
+
+    def test_error_shared_with_waiters(self) -> None:
+        """
+        Verify that the error of the fetch is raised to the waiting callers too.
+        """
+        def failing_fetch():
+            time.sleep(0.2)
+            raise ConnectionError("API down")
+
+        errors = []
+
+        def call():
+            try:
+                self.single_flight.do("weather", failing_fetch)
+            except ConnectionError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 4)
+
+
+
+    def test_fetch_of_other_process_reused(self) -> None:
+        """
+        Verify that a caller waits for the lock file held by another process, and then uses the
+        cached result instead of fetching again.
+        """
+        cache = []
+        with open(os.path.join(self.lock_folder, "dublinbikes_bikes.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            results = []
+            thread = threading.Thread(
+                target=lambda: results.append(self.single_flight.do("bikes", self.slow_fetch, lambda: list(cache)))
+            )
+            thread.start()
+            time.sleep(0.2)
+            self.assertEqual(results, [], "The caller should wait for the lock.")
+            # The other process stores its fetch in the cache and releases the lock.
+            cache.append("cached")
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        thread.join()
+        self.assertEqual(results, [["cached"]])
+        self.assertEqual(self.fetch_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,213 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+from DublinBikes.SqlCode.sql_utils import get_connection, close_connections
+from DublinBikes.SqlCode.user_db import update_user_profile
+from DublinBikes.SqlCode.migrations import MIGRATIONS, get_schema_version, migrate_database
+
+
+class TestConnectionPool(unittest.TestCase):
+    """
+    Test the connection pool of sql_utils, shared by the threads of the process.
+    The transactions are checked on a temporary table, only visible to the pooled connection that the
+    test thread gets back after each block.
+    """
+
+
+
+    def setUp(self) -> None:
+        """
+        Create an empty temporary table on a new pooled connection.
+        """
+        close_connections()
+        with get_connection() as conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS pool_test (value INTEGER);")
+            conn.execute("DELETE FROM pool_test;")
+
+
+
+    def tearDown(self) -> None:
+        """
+        Close the pooled connections (the temporary table is dropped with its connection).
+        """
+        close_connections()
+
+
+
+    def count_rows(self) -> int:
+        """
+        Count the rows of the temporary table.
+        """
+        with get_connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM pool_test;").fetchone()[0]
+
+
+
+    def test_connection_shared_by_threads(self) -> None:
+        """
+        Verify that nested calls share the connection, that the pragmas are set, that a new thread
+        per request (as the Flask development server) reuses the pooled connection, and that
+        concurrent threads get different connections.
+        """
+        with get_connection() as first, get_connection() as second:
+            self.assertIs(first, second)
+            self.assertEqual(first.execute("PRAGMA journal_mode;").fetchone()[0], "wal")
+            self.assertEqual(first.execute("PRAGMA synchronous;").fetchone()[0], 1)  # NORMAL
+            self.assertEqual(first.execute("PRAGMA temp_store;").fetchone()[0], 2)  # MEMORY
+
+        used = []
+        def use_connection():
+            with get_connection() as conn:
+                conn.execute("SELECT 1;")
+                used.append(conn)
+        for _ in range(20):
+            thread = threading.Thread(target=use_connection)
+            thread.start()
+            thread.join()
+        self.assertEqual({id(conn) for conn in used}, {id(first)})
+
+        concurrent = []
+        barrier = threading.Barrier(2)
+        def hold_connection():
+            with get_connection() as conn:
+                concurrent.append(conn)
+                barrier.wait()
+        threads = [threading.Thread(target=hold_connection) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIsNot(concurrent[0], concurrent[1])
+
+
+
+    def test_commit_and_rollback(self) -> None:
+        """
+        Verify that the transaction is committed on exit, rolled back on error, and that nested
+        calls are committed or rolled back with the outermost one.
+        """
+        with get_connection() as conn:
+            conn.execute("INSERT INTO pool_test VALUES (1);")
+        self.assertEqual(self.count_rows(), 1)
+
+        with self.assertRaises(RuntimeError):
+            with get_connection() as conn:
+                conn.execute("INSERT INTO pool_test VALUES (2);")
+                with get_connection() as nested:
+                    nested.execute("INSERT INTO pool_test VALUES (3);")
+                raise RuntimeError("rollback")
+        self.assertEqual(self.count_rows(), 1)
+
+
+
+    def test_nested_data_function_does_not_commit(self) -> None:
+        """
+        Verify that a data function called inside a connection block does not commit the
+        transaction of the caller.
+        """
+        with self.assertRaises(RuntimeError):
+            with get_connection() as conn:
+                conn.execute("INSERT INTO pool_test VALUES (4);")
+                update_user_profile("nobody@example.com", "nobody", "No", "Body", "password", 1)
+                raise RuntimeError("rollback")
+        self.assertEqual(self.count_rows(), 0)
+
+
+
+class TestMigrations(unittest.TestCase):
+    """
+    Test the schema migrations on a new database in a temporary folder.
+    """
+
+
+
+    def setUp(self) -> None:
+        """
+        Open a connection to an empty database.
+        """
+        self.folder = tempfile.mkdtemp()
+        self.conn = sqlite3.connect(os.path.join(self.folder, "db.sqlite3"))
+
+
+
+    def tearDown(self) -> None:
+        """
+        Close the connection and delete the database.
+        """
+        self.conn.close()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+
+
+    def query_plan(self, query: str, params: tuple) -> str:
+        """
+        Return the query plan of a query as a single string.
+        """
+        return " ".join(row[3] for row in self.conn.execute(f"EXPLAIN QUERY PLAN {query}", params))
+
+
+
+    def test_migrations_applied_once(self) -> None:
+        """
+        Verify that a new database is migrated to the last version, and that migrating it again
+        does nothing.
+        """
+        self.assertEqual(get_schema_version(self.conn), 0)
+        self.assertEqual(migrate_database(self.conn), MIGRATIONS[-1][0])
+        tables = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table';")}
+        self.assertTrue({"user", "availability", "FetchedBikesData", "FetchedWeatherData", "ForecastFetches"} <= tables)
+        self.assertEqual(migrate_database(self.conn), MIGRATIONS[-1][0])
+
+
+
+    def test_hot_queries_use_indexes(self) -> None:
+        """
+        Verify that the history and cache queries search an index instead of scanning the tables.
+        """
+        migrate_database(self.conn)
+        plan = self.query_plan(
+            "SELECT * FROM FetchedBikesData WHERE station_id = ? ORDER BY last_update DESC LIMIT 1", (1,)
+        )
+        self.assertIn("idx_fetched_bikes_station_update", plan)
+        plan = self.query_plan(
+            "SELECT last_update, available_bikes, available_bike_stands FROM availability "
+            "WHERE station_id = ? AND last_update >= ? AND last_update < ?", (1, "2025-03-03", "2025-03-04")
+        )
+        self.assertIn("COVERING INDEX idx_availability_station_update", plan)
+        plan = self.query_plan(
+            "SELECT * FROM FetchedWeatherData WHERE forecast_type = ? AND timestamp_requested >= ? "
+            "ORDER BY timestamp_requested DESC LIMIT 1", ("current", "2025-03-03")
+        )
+        self.assertIn("idx_fetched_weather_type_requested", plan)
+        self.assertNotIn("SCAN FetchedWeatherData", plan)
+        plan = self.query_plan(
+            "SELECT * FROM ForecastFetches WHERE forecast_type = ? AND valid_until > ? "
+            "ORDER BY fetch_id DESC LIMIT 1", ("hourly", "2025-03-03")
+        )
+        self.assertIn("idx_forecast_fetches_type_valid", plan)
+
+
+
+    def test_forecast_copies_removed(self) -> None:
+        """
+        Verify that the migration to the forecast fetches deletes the forecast rows of
+        FetchedWeatherData and keeps the current weather.
+        """
+        migrate_database(self.conn)
+        self.conn.execute("PRAGMA user_version = 2;")
+        for forecast_type in ("current", "hourly"):
+            self.conn.execute(
+                "INSERT INTO FetchedWeatherData (timestamp_requested, timestamp_weatherinfo, forecast_type) "
+                "VALUES ('2025-03-03 10:00:00', ?, ?);", (f"2025-03-03 {len(forecast_type)}:00:00", forecast_type)
+            )
+        self.conn.commit()
+        self.assertEqual(migrate_database(self.conn), MIGRATIONS[-1][0])
+        forecast_types = [row[0] for row in self.conn.execute("SELECT forecast_type FROM FetchedWeatherData;")]
+        self.assertEqual(forecast_types, ["current"])
+
+
+if __name__ == '__main__':
+    unittest.main()
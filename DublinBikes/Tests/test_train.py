@@ -0,0 +1,166 @@
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import numpy as np
+import pandas as pd
+from DublinBikes.SqlCode.sql_utils import get_sql_engine
+from DublinBikes.MachineLearning.model_registry import read_model_version_pointer
+from DublinBikes.MachineLearning.predict_availability import build_feature_matrix
+from DublinBikes.MachineLearning import train
+from DublinBikes.MachineLearning.train import read_skipped_watermarks, run_training
+
+
+class TestTrain(unittest.TestCase):
+    """
+    Test the incremental retraining of the station models.
+    Synthetic availability and weather records are inserted for a test station in 2001, so that
+    they do not mix with the scraped data, and deleted after each test.
+    """
+
+    TEST_STATION_ID = 9001
+    START = pd.Timestamp("2001-01-01")
+
+
+
+    def setUp(self) -> None:
+        """
+        Insert one week of records for the test station, every 30 minutes, and create empty
+        folders for the model versions and the base models.
+        """
+        self.tearDown()
+        times = self.START + pd.to_timedelta(np.arange(7 * 48) * 30, unit="min")
+        self.insert_records(times)
+        self.versions_folder = tempfile.mkdtemp()
+        self.base_folder = tempfile.mkdtemp()
+
+
+
+    def tearDown(self) -> None:
+        """
+        Delete the test records and folders.
+        """
+        conn = get_sql_engine()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM availability WHERE station_id = ?", (self.TEST_STATION_ID,))
+            cursor.execute("DELETE FROM current WHERE dt < '2002-01-01'")
+            conn.commit()
+        finally:
+            conn.close()
+        for folder in ("versions_folder", "base_folder"):
+            if hasattr(self, folder):
+                shutil.rmtree(getattr(self, folder), ignore_errors=True)
+
+
+
+    def insert_records(self, times) -> None:
+        """
+        Insert availability records with more bikes during the day, and the weather at the same times.
+        """
+        conn = get_sql_engine()
+        try:
+            cursor = conn.cursor()
+            for t in times:
+                bikes = 20 if 8 <= t.hour < 20 else 5
+                cursor.execute(
+                    "INSERT INTO availability (station_id, last_update, available_bikes, available_bike_stands, status) "
+                    "VALUES (?, ?, ?, ?, 'OPEN')",
+                    (self.TEST_STATION_ID, str(t), bikes, 30 - bikes),
+                )
+                cursor.execute("INSERT INTO current (dt, temp, humidity) VALUES (?, 10, 80)", (str(t),))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+
+    def train(self) -> str:
+        """
+        Run the training of the test station with two worker processes.
+        """
+        return run_training(
+            workers=2, station_ids=[self.TEST_STATION_ID], min_observations=100,
+            versions_folder=self.versions_folder, base_folder=self.base_folder,
+        )
+
+
+
+    def test_train_and_activate_version(self) -> None:
+        """
+        Verify that the trained model is written in a new version, activated and usable for predictions.
+        """
+        version = self.train()
+        self.assertIsNotNone(version)
+        self.assertEqual(read_model_version_pointer(self.versions_folder), version)
+
+        version_folder = os.path.join(self.versions_folder, version)
+        with open(os.path.join(version_folder, "manifest.json")) as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest["trained"], [self.TEST_STATION_ID])
+        self.assertIn(str(self.TEST_STATION_ID), manifest["watermarks"])
+
+        with open(os.path.join(version_folder, f"model_station_{self.TEST_STATION_ID}.pkl"), "rb") as f:
+            model = pickle.load(f)
+        features = build_feature_matrix(["2001-01-02 12:00", "2001-01-02 03:00"], [10, 10], [80, 80])
+        predictions = model.predict(pd.DataFrame(features, columns=model.feature_names_in_))
+        np.testing.assert_allclose(predictions, [20, 5], atol=1)
+
+
+
+    def test_only_changed_stations_are_retrained(self) -> None:
+        """
+        Verify that no version is created when the data did not change, and that new records
+        trigger a new version.
+        """
+        first_version = self.train()
+        self.assertIsNone(self.train())
+
+        self.insert_records([self.START + pd.Timedelta(days=8)])
+        second_version = self.train()
+        self.assertIsNotNone(second_version)
+        self.assertNotEqual(second_version, first_version)
+        self.assertEqual(read_model_version_pointer(self.versions_folder), second_version)
+
+
+
+    def test_station_with_few_observations_is_skipped(self) -> None:
+        """
+        Verify that a station without enough observations is not trained, that two runs in a row
+        create no version, and that the second run does not try to train it again.
+        """
+        # The workers run in threads so that the calls to train_station_model can be counted.
+        with mock.patch.object(train, "ProcessPoolExecutor", ThreadPoolExecutor), \
+                mock.patch.object(train, "train_station_model", wraps=train.train_station_model) as train_station:
+            for _ in range(2):
+                version = run_training(
+                    workers=1, station_ids=[self.TEST_STATION_ID], min_observations=10000,
+                    versions_folder=self.versions_folder, base_folder=self.base_folder,
+                )
+                self.assertIsNone(version)
+        self.assertEqual(train_station.call_count, 1)
+        self.assertIsNone(read_model_version_pointer(self.versions_folder))
+        self.assertEqual(list(read_skipped_watermarks(self.versions_folder)), [str(self.TEST_STATION_ID)])
+
+
+
+    def test_active_version_kept_when_nothing_trained(self) -> None:
+        """
+        Verify that a run whose changed stations are all skipped keeps the active version.
+        """
+        first_version = self.train()
+        self.insert_records([self.START + pd.Timedelta(days=8)])
+        self.assertIsNone(run_training(
+            workers=1, station_ids=[self.TEST_STATION_ID], min_observations=10000,
+            versions_folder=self.versions_folder, base_folder=self.base_folder,
+        ))
+        self.assertEqual(read_model_version_pointer(self.versions_folder), first_version)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
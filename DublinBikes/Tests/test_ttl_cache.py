@@ -0,0 +1,63 @@
+import unittest
+from DublinBikes.Utils.ttl_cache import TTLCache
+
+
+class TestTTLCache(unittest.TestCase):
+    """
+    Test the expiration, the LRU eviction and the counters of the TTL cache.
+    A fake clock is used so that the tests do not have to wait for the entries to expire.
+    """
+
+
+
+    def setUp(self) -> None:
+        """
+        Create a cache of three entries living 60 seconds.
+        """
+        self.now = 0.0
+        self.cache = TTLCache(max_entries=3, ttl_seconds=60, clock=lambda: self.now)
+
+
+
+    def test_entries_expire(self) -> None:
+        """
+        Verify that an entry is returned until its time to live has elapsed.
+        """
+        self.cache.set("a", 1)
+        self.now = 59
+        self.assertEqual(self.cache.get("a"), 1)
+        self.now = 60
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.stats()["expirations"], 1)
+
+
+
+    def test_least_recently_used_evicted(self) -> None:
+        """
+        Verify that the least recently used entry is evicted when the cache is full.
+        """
+        for key in ("a", "b", "c"):
+            self.cache.set(key, key)
+        self.cache.get("a")
+        self.cache.set("d", "d")
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), "a")
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+
+
+    def test_hit_rate(self) -> None:
+        """
+        Verify that hits and misses are counted.
+        """
+        self.cache.get("a")
+        self.cache.set("a", 1)
+        self.cache.get("a")
+        self.cache.get("a")
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (2, 1, 1))
+        self.assertAlmostEqual(stats["hit_rate"], 2 / 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
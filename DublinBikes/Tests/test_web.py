@@ -1,6 +1,20 @@
+import os
+import subprocess
+import sys
 import unittest
+import datetime
+import gzip
 import json
+from flask import jsonify
 from DublinBikes.FlaskApp import app
+from DublinBikes.DataFrontend.data_realtime_bikes import clear_bikes_snapshot, get_bikes_events, set_bikes_snapshot
+from DublinBikes.DataFrontend.data_realtime_weather import (
+    FORECAST_COLUMNS,
+    _set_forecast_timeline,
+    build_forecast_timeline,
+    clear_forecast_timelines,
+)
+from DublinBikes.DataFrontend.data_refresher import should_start_refresher
 from DublinBikes.SqlCode.sql_utils import get_sql_engine
 
 class TestFlaskRoutes(unittest.TestCase):
@@ -94,6 +108,100 @@ class TestFlaskRoutes(unittest.TestCase):
     
     
     
+    def test_api_forecast_all_invalid_time(self) -> None:
+        """
+        Test that the stations forecast API returns a 400 error if 'at' is missing or invalid.
+        """
+        response = self.client.get("/api/forecast_all")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/api/forecast_all?at=tomorrow")
+        self.assertEqual(response.status_code, 400)
+        data = json.loads(response.data)
+        self.assertIn("error", data, "Response should contain an error message when 'at' is invalid.")
+
+    
+    
+    
+    def test_api_forecast_all_outside_forecast(self) -> None:
+        """
+        Test that the stations forecast API returns a 400 error for a time after the forecast.
+        """
+        now = datetime.datetime.now().replace(minute=0, second=0, microsecond=0)
+        row = dict.fromkeys(FORECAST_COLUMNS, 10)
+        row["timestamp_weatherinfo"] = now.isoformat(" ")
+        fetch = {"fetch_id": 2 ** 62, "forecast_type": "hourly", "fetched_at": now, "valid_until": now + datetime.timedelta(hours=2)}
+        _set_forecast_timeline(build_forecast_timeline(fetch, [row]))
+        self.addCleanup(clear_forecast_timelines)
+
+        at = (now + datetime.timedelta(days=30)).isoformat()
+        response = self.client.get(f"/api/forecast_all?at={at}")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error", json.loads(response.data))
+
+    
+    
+    
+    def test_app_import_does_not_load_ml_libraries(self) -> None:
+        """
+        Test that importing the Flask app does not load scikit-learn (the models are only loaded by
+        the prediction routes).
+        """
+        code = "import sys; import DublinBikes.FlaskApp; print('sklearn' in sys.modules)"
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+        self.assertEqual(output.stdout.strip(), "False")
+
+    
+    
+    
+    def test_background_refresher_start(self) -> None:
+        """
+        Test that the background refresher starts in the serving processes (gunicorn workers, flask
+        run, the reloader's child process) but not in the tests nor in the reloader's parent process.
+        """
+        previous = os.environ.pop("WERKZEUG_RUN_MAIN", None)
+        try:
+            self.assertTrue(should_start_refresher(debug=False, testing=False))
+            self.assertFalse(should_start_refresher(debug=False, testing=True))
+            self.assertFalse(should_start_refresher(debug=True, testing=False))
+            os.environ["WERKZEUG_RUN_MAIN"] = "true"
+            self.assertTrue(should_start_refresher(debug=True, testing=False))
+        finally:
+            os.environ.pop("WERKZEUG_RUN_MAIN", None)
+            if previous is not None:
+                os.environ["WERKZEUG_RUN_MAIN"] = previous
+
+    
+    
+    
+    def test_api_ride_prediction_without_weather_invalid_time(self) -> None:
+        """
+        Test that a ride prediction without weather returns a 400 error if its timestamp is invalid
+        (the weather cannot be filled in).
+        """
+        response = self.client.post(
+            "/api/ride_prediction",
+            json={"timestamp": "N/A", "origin_station_id": 10, "destination_station_id": 11},
+        )
+        self.assertEqual(response.status_code, 400)
+        data = json.loads(response.data)
+        self.assertIn("error", data, "Response should contain an error message when the timestamp is invalid.")
+
+    
+    
+    
+    def test_api_forecast_curve_invalid_hours(self) -> None:
+        """
+        Test that the station forecast curve API returns a 400 error for an invalid number of hours.
+        """
+        response = self.client.get("/api/station/10/forecast_curve?hours=0")
+        self.assertEqual(response.status_code, 400)
+        data = json.loads(response.data)
+        self.assertIn("error", data, "Response should contain an error message when hours is invalid.")
+
+    
+    
+    
     def test_api_current_bikes(self) -> None:
         """
         Test that the current bikes API returns a JSON list.
@@ -106,6 +214,93 @@ class TestFlaskRoutes(unittest.TestCase):
     
     
     
+    def test_api_current_bikes_etag(self) -> None:
+        """
+        Test that the current bikes are served pre-serialized (identical to jsonify), gzip compressed
+        when accepted, and that a request with the ETag of the data receives a 304 without body.
+        """
+        now = datetime.datetime.now()
+        stations = [{
+            "time_requested": now, "station_id": 1, "available_bikes": 3, "available_bike_stands": 17,
+            "status": "OPEN", "last_update": now, "address": "Test", "banking": 0, "bonus": 0,
+            "bike_stands": 20, "name": "TEST", "position": {"lat": 53.35, "lng": -6.26},
+        }]
+        set_bikes_snapshot(stations)
+        self.addCleanup(clear_bikes_snapshot)
+
+        response = self.client.get("/api/current_bikes")
+        self.assertEqual(response.status_code, 200)
+        with app.app_context():
+            self.assertEqual(response.data, jsonify(stations).get_data())
+        etag = response.headers["ETag"]
+        self.assertEqual(response.headers["Cache-Control"], "no-cache")
+
+        response = self.client.get("/api/current_bikes", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(response.data)), json.loads(self.client.get("/api/current_bikes").data))
+
+        response = self.client.get("/api/current_bikes", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+        self.assertEqual(response.headers["ETag"], etag)
+
+        snapshot_id = response.headers["X-Snapshot-Id"]
+        response = self.client.get(f"/api/current_bikes?since={snapshot_id}")
+        self.assertEqual(json.loads(response.data)["changed"], [], "No station changed since the current snapshot.")
+        self.assertNotEqual(response.headers["ETag"], etag, "A delta has its own ETag.")
+        response = self.client.get(f"/api/current_bikes?since={snapshot_id}", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200, "The ETag of the full list does not match a delta.")
+        response = self.client.get(f"/api/current_bikes?since={snapshot_id}&format=columnar")
+        self.assertEqual(response.status_code, 400)
+
+    
+    
+    
+    def test_api_current_bikes_invalid_format(self) -> None:
+        """
+        Test that an unknown format or field of the current bikes API returns a 400 error.
+        """
+        response = self.client.get("/api/current_bikes?format=xml")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/api/current_bikes?fields=station_id,colour")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("colour", json.loads(response.data)["error"])
+
+    
+    
+    
+    def test_stream_bikes(self) -> None:
+        """
+        Test that the bikes stream starts with the current snapshot id and pushes the changed
+        stations when a new snapshot is stored.
+        """
+        now = datetime.datetime.now()
+        stations = [
+            {"time_requested": now, "station_id": station_id, "available_bikes": 3, "available_bike_stands": 17,
+             "status": "OPEN", "last_update": now}
+            for station_id in (1, 2)
+        ]
+        set_bikes_snapshot(stations)
+        self.addCleanup(clear_bikes_snapshot)
+
+        response = self.client.get("/api/stream/bikes")
+        self.assertEqual(response.mimetype, "text/event-stream")
+        chunks = response.iter_encoded()
+        self.assertIn("event: snapshot", next(chunks).decode())
+
+        later = now + datetime.timedelta(minutes=5)
+        set_bikes_snapshot([dict(stations[0], time_requested=later, available_bikes=2), dict(stations[1], time_requested=later)])
+        delta_event = next(chunks).decode()
+        self.assertIn("event: delta", delta_event)
+        delta = json.loads(delta_event.split("data: ", 1)[1])
+        self.assertEqual([station["station_id"] for station in delta["changed"]], [1])
+
+        response.close()
+        self.assertEqual(get_bikes_events().stats()["subscribers"], 0, "Closing the stream unsubscribes the client.")
+
+    
+    
+    
     def test_register_route_get(self) -> None:
         """
         Test that the registration page (GET /register) loads correctly.
@@ -1,4 +1,6 @@
+import getpass
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -30,4 +32,118 @@ LOCAL_PASSWORD = os.environ.get("LOCAL_PASSWORD")
 LOCAL_DB = "dbbikes"
 LOCAL_URI = "127.0.0.1"
 
+# SQLite connections (see SqlCode/sql_utils.py): the threads of a process share a pool of at most
+# SQLITE_POOL_SIZE idle connections, each one tuned once with these pragmas (WAL journal,
+# synchronous=NORMAL, memory-mapped I/O, page cache, temporary tables in memory).
+# SQLITE_BUSY_TIMEOUT_SECONDS is the wait for a lock held by another writer.
+SQLITE_POOL_SIZE = 8
+SQLITE_MMAP_SIZE_BYTES = 256 * 1024 * 1024
+SQLITE_CACHE_SIZE_KB = 20000
+SQLITE_BUSY_TIMEOUT_SECONDS = 10
 
+
+# Real-time bikes: a fetch of the bikes API is reused (from memory, then from the cache database)
+# for BIKES_CACHE_MINUTES.
+BIKES_CACHE_MINUTES = 5
+
+# Bikes deltas (/api/current_bikes?since=<snapshot_id>): the availability of the last
+# BIKES_SNAPSHOT_HISTORY snapshots is kept in memory to compute the changes since one of them.
+BIKES_SNAPSHOT_HISTORY = 12
+
+# Bikes event stream (/api/stream/bikes): each new snapshot is pushed to at most
+# BIKES_STREAM_MAX_CLIENTS clients per worker (each one holds a server thread). A client that does
+# not read its events misses the new ones after BIKES_STREAM_QUEUE_SIZE of them. A comment is sent
+# every BIKES_STREAM_KEEPALIVE_SECONDS so that the proxies do not close idle streams.
+BIKES_STREAM_MAX_CLIENTS = 50
+BIKES_STREAM_QUEUE_SIZE = 5
+BIKES_STREAM_KEEPALIVE_SECONDS = 15
+
+# Current weather: a fetch of the weather API is reused (from the cache database) for WEATHER_CACHE_MINUTES.
+WEATHER_CACHE_MINUTES = 15
+
+# Forecast weather: each fetch of a forecast (hourly, daily) is valid for FORECAST_TIMELINE_MINUTES,
+# during which every target time is answered from it (kept in memory as a timeline, and in the cache
+# database for the other processes). It is then fetched again from the API. The background refresher
+# fetches the hourly forecast once it is FORECAST_REFRESH_MINUTES old, before it expires, so that
+# the forecast lookups and the ride predictions never wait for the API.
+FORECAST_TIMELINE_MINUTES = 60
+FORECAST_REFRESH_MINUTES = 55
+
+# Background refresher (see DataFrontend/data_refresher.py, started by the before_request hook of
+# FlaskApp/__init__.py on the first request of each serving process): the bikes and the
+# current weather are fetched again once they are BIKES_REFRESH_MINUTES / WEATHER_REFRESH_MINUTES
+# old, shortly before they expire, so that the user requests do not wait for the APIs. While a
+# refresh is running, the requests are served the previous (slightly stale) data.
+BACKGROUND_REFRESH_ENABLED = True
+BIKES_REFRESH_MINUTES = 4
+WEATHER_REFRESH_MINUTES = 13
+
+# Upstream fetches (see Utils/single_flight.py): only one fetch of the bikes or weather API is in
+# flight at a time. The processes coordinate through lock files in FETCH_LOCK_FOLDER, and wait at
+# most FETCH_LOCK_TIMEOUT_SECONDS for the fetch of another process.
+FETCH_LOCK_FOLDER = tempfile.gettempdir()
+FETCH_LOCK_TIMEOUT_SECONDS = 30
+
+
+# Machine Learning
+# Memory budget for the deserialized station models kept in memory (see model_registry.py)
+MODEL_CACHE_MAX_MB = 300
+
+# Format of the station models used for predictions:
+#   "pickle"  --> scikit-learn pickle files in MachineLearning/pickle_models
+#   "compact" --> memory-mapped arrays exported with MachineLearning/compact_forest.py
+#                 (stations missing from the compact file fall back to their pickle file)
+MODEL_FORMAT = "pickle"
+
+# Model used for the predictions:
+#   "per_station" --> one model per station (MachineLearning/pickle_models/model_station_{id}.pkl)
+#   "global"      --> one model for all the stations (pickle_models/model_global.pkl, see global_model.py)
+PREDICTION_MODEL_TYPE = "per_station"
+
+# Precomputed prediction grid (see prediction_grid.py): answer ride predictions with an array lookup
+# when the grid exists and the weather is within its range, otherwise fall back to live inference.
+PREDICTION_GRID_ENABLED = True
+PREDICTION_GRID_SLOT_MINUTES = 15
+PREDICTION_GRID_TEMPERATURES = (-4, 30, 2)  # (first, last, step) in Celsius
+PREDICTION_GRID_HUMIDITIES = (30, 100, 10)  # (first, last, step) in percent
+
+# Ride prediction cache (see predict_availability.prediction): the predicted bikes of each station are
+# kept in memory under the quantized inputs (time slot, temperature and humidity steps) for
+# PREDICTION_CACHE_TTL_MINUTES, up to PREDICTION_CACHE_MAX_ENTRIES entries (least recently used evicted).
+# The model is evaluated on the real inputs: a hit returns the prediction of the first request of its bucket.
+PREDICTION_CACHE_ENABLED = True
+PREDICTION_CACHE_SLOT_MINUTES = 15
+PREDICTION_CACHE_TEMPERATURE_STEP = 1  # Celsius
+PREDICTION_CACHE_HUMIDITY_STEP = 5  # percent
+PREDICTION_CACHE_TTL_MINUTES = 60
+PREDICTION_CACHE_MAX_ENTRIES = 20000
+
+# Forecast of all the stations (/api/forecast_all): requested times are rounded down to slots of
+# FORECAST_ALL_SLOT_MINUTES and each slot is kept in memory for FORECAST_ALL_CACHE_MINUTES.
+FORECAST_ALL_SLOT_MINUTES = 15
+FORECAST_ALL_CACHE_MINUTES = 60
+
+# Availability curve of a station (/api/station/<id>/forecast_curve): one point every
+# FORECAST_CURVE_SLOT_MINUTES, for up to FORECAST_CURVE_MAX_HOURS hours.
+FORECAST_CURVE_SLOT_MINUTES = 15
+FORECAST_CURVE_MAX_HOURS = 72
+
+# Dedicated prediction process (see prediction_server.py): when enabled, the web workers send the
+# model evaluations to the prediction server over a Unix socket instead of loading the models
+# themselves (they still fall back to local inference if the server is not running, or does not
+# reply within PREDICTION_SERVER_TIMEOUT_SECONDS). The socket is created in a private folder (mode
+# 0700) of the user running the server and the web workers. The clients authenticate with the
+# PREDICTION_SERVER_AUTHKEY environment variable or, if it is not set, with a random key generated
+# once into MachineLearning/prediction_server.key (mode 0600).
+PREDICTION_SERVER_ENABLED = False
+PREDICTION_SERVER_FOLDER = os.path.join(tempfile.gettempdir(), f"dublinbikes-predictions-{getpass.getuser()}")
+PREDICTION_SERVER_SOCKET = os.path.join(PREDICTION_SERVER_FOLDER, "predictions.sock")
+PREDICTION_SERVER_AUTHKEY = os.environ.get("PREDICTION_SERVER_AUTHKEY")
+PREDICTION_SERVER_TIMEOUT_SECONDS = 5
+
+# Retraining of the station models (see MachineLearning/train.py): number of worker processes
+# (None --> one per CPU), minimum number of observations to train a station model, and number of
+# model versions kept in MachineLearning/model_versions.
+MODEL_TRAINING_WORKERS = None
+MODEL_TRAINING_MIN_OBSERVATIONS = 500
+MODEL_VERSIONS_KEEP = 3
@@ -0,0 +1,121 @@
+import queue
+import threading
+from typing import Any, Dict, Optional
+
+"""
+Module: pubsub
+--------------
+This module provides a minimal in-process publish/subscribe channel.
+
+Each subscriber receives the published events in its own bounded queue, so that a slow subscriber
+(e.g., a client of the bikes event stream on a slow connection) never blocks the publisher: when its
+queue is full, the new events are dropped for that subscriber only. The events must carry enough
+information for a subscriber to detect the ones it missed (e.g., the id of the previous snapshot).
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PubSub:
+    """
+    Thread-safe in-process channel delivering every published event to all the subscribers.
+    """
+
+    def __init__(self, max_subscribers: int, queue_size: int):
+        """
+        Parameters:
+            max_subscribers (int): The maximum number of simultaneous subscribers.
+            queue_size (int): The number of events kept for a subscriber that did not read them yet.
+        """
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, queue.Queue] = {}
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._dropped = 0
+
+    def subscribe(self) -> Optional[int]:
+        """
+        Register a new subscriber.
+
+        Returns:
+            Optional[int]: The id of the subscriber, or None if there are already max_subscribers.
+        """
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscriber_id = self._next_id
+            self._next_id += 1
+            self._subscribers[subscriber_id] = queue.Queue(maxsize=self.queue_size)
+            return subscriber_id
+
+    def unsubscribe(self, subscriber_id: int) -> None:
+        """
+        Remove a subscriber and its pending events.
+
+        Parameters:
+            subscriber_id (int): The id returned by subscribe().
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._subscribers.pop(subscriber_id, None)
+
+    def publish(self, event: Any) -> int:
+        """
+        Deliver an event to all the subscribers, without waiting for them.
+
+        Parameters:
+            event (Any): The event to deliver.
+
+        Returns:
+            int: The number of subscribers that received the event.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        delivered = 0
+        for events in subscribers:
+            try:
+                events.put_nowait(event)
+                delivered += 1
+            except queue.Full:
+                pass
+        if delivered < len(subscribers):
+            with self._lock:
+                self._dropped += len(subscribers) - delivered
+            logger.warning(f"Event dropped for {len(subscribers) - delivered} slow subscribers")
+        return delivered
+
+    def get(self, subscriber_id: int, timeout: float) -> Any:
+        """
+        Wait for the next event of a subscriber.
+
+        Parameters:
+            subscriber_id (int): The id returned by subscribe().
+            timeout (float): The maximum time to wait, in seconds.
+
+        Returns:
+            Any: The next event, or None if no event was published before the timeout.
+
+        Raises:
+            KeyError: If the subscriber is not registered.
+        """
+        with self._lock:
+            events = self._subscribers[subscriber_id]
+        try:
+            return events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the number of subscribers and of events dropped for slow subscribers.
+
+        Returns:
+            Dict[str, int]: subscribers and dropped.
+        """
+        with self._lock:
+            return {"subscribers": len(self._subscribers), "dropped": self._dropped}
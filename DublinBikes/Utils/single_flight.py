@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from DublinBikes.Utils.params import FETCH_LOCK_FOLDER, FETCH_LOCK_TIMEOUT_SECONDS
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the threads of the same process are coalesced.
+    fcntl = None
+
+"""
+Module: single_flight
+---------------------
+This module makes sure that only one fetch of an upstream resource (e.g., the bikes API or the
+current weather API) is in flight at a time, and that the callers waiting for it share its result.
+
+Within a process, the first thread asking for a resource becomes the leader and runs the fetch;
+the other threads asking for the same resource wait for the leader and receive its result (or its
+error). Across processes, the leaders take an exclusive lock on a lock file per resource. After
+acquiring the lock, the leader first calls the recheck function, which reads the cache database:
+if another process fetched the resource in the meantime, its cached result is used instead of
+calling the upstream API again.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """
+    A fetch in flight, shared by the leader and the waiting threads.
+    """
+
+    def __init__(self):
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+
+class SingleFlight:
+    """
+    Coalesce the concurrent fetches of the same resource across threads and processes.
+    """
+
+    def __init__(self, lock_folder: str, lock_timeout: float):
+        """
+        Parameters:
+            lock_folder (str): The folder of the lock files (one per resource).
+            lock_timeout (float): The maximum time to wait for the lock of another process, in
+                                  seconds. After it, the fetch is made without the lock.
+        """
+        self.lock_folder = lock_folder
+        self.lock_timeout = lock_timeout
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fetch_fn: Callable[[], Any], recheck_fn: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Fetch a resource, or wait for the fetch already in flight for it.
+
+        Parameters:
+            key (str): The name of the resource (also used in the name of its lock file).
+            fetch_fn (Callable): Function fetching the resource from upstream.
+            recheck_fn (Callable): Function reading the resource from the cache, called once the
+                                   lock is held. Its result is used when it is not empty.
+
+        Returns:
+            Any: The result of recheck_fn or of fetch_fn, shared by all the concurrent callers.
+
+        Raises:
+            Exception: Any error raised by fetch_fn or recheck_fn.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            with self._process_lock(key):
+                result = recheck_fn() if recheck_fn is not None else None
+                if result:
+                    logger.info(f"{key} was fetched by another process")
+                else:
+                    result = fetch_fn()
+            call.result = result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self, key: str) -> bool:
+        """
+        Tell whether a fetch of a resource is running in this process.
+
+        Parameters:
+            key (str): The name of the resource.
+
+        Returns:
+            bool: True if a thread of this process is fetching the resource.
+        """
+        with self._lock:
+            return key in self._calls
+
+    @contextmanager
+    def _process_lock(self, key: str):
+        """
+        Hold the lock file of a resource, waiting at most lock_timeout seconds for it.
+        """
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.lock_folder, f"dublinbikes_{key}.lock"), "a") as lock_file:
+            deadline = time.monotonic() + self.lock_timeout
+            locked = False
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        logger.warning(f"Lock of {key} held for more than {self.lock_timeout}s, fetching anyway")
+                        break
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                if locked:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+_single_flight = SingleFlight(FETCH_LOCK_FOLDER, FETCH_LOCK_TIMEOUT_SECONDS)
+
+
+def get_single_flight() -> SingleFlight:
+    """
+    Return the single-flight layer of the upstream fetches configured in params.py.
+
+    Returns:
+        SingleFlight: The instance shared by all the threads of the process.
+    """
+    return _single_flight
@@ -18,4 +18,6 @@ if __name__ == "__main__":
     )
     args = parser.parse_args()
 
+    # The background refresher of the bikes and weather data is started by the app itself (see
+    # DublinBikes/FlaskApp/__init__.py), in the reloader's child process.
     app.run(host=args.host, port=args.port, debug=True)